@@ -0,0 +1,73 @@
+"""
+Бронирование машин под заказ: расписание точки в памяти (src/services/capacity.py)
+против сборки загрузки из всех броней на каждый заказ — то, что пришлось бы делать,
+читая capacity_reservations при каждом бронировании (сам запрос к БД сюда не входит).
+
+Точка синтетическая, заказы бронируются подряд, пока не кончится горизонт. БД не нужна.
+
+    python -m benchmarks.capacity_booking [заказов]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from src.models import LaundryPoint
+from src.services.capacity import PointSchedule
+from src.services.pricing import Bag
+from src.settings import CapacitySettings
+
+settings = CapacitySettings()
+
+
+def in_memory(point: LaundryPoint, epoch: datetime, orders_bags: list[list[Bag]]) -> list:
+    schedule = PointSchedule(point, epoch, settings, 0)
+    plans = []
+    for bags in orders_bags:
+        plan = schedule.plan(bags, epoch)
+        if plan is None:
+            break
+        schedule.apply(plan.stages)
+        plans.append(plan)
+    return plans
+
+
+def rebuilt(point: LaundryPoint, epoch: datetime, orders_bags: list[list[Bag]]) -> list:
+    reservations = []
+    plans = []
+    for bags in orders_bags:
+        schedule = PointSchedule(point, epoch, settings, 0)
+        schedule.apply(reservations)
+        plan = schedule.plan(bags, epoch)
+        if plan is None:
+            break
+        reservations.extend(plan.stages)
+        plans.append(plan)
+    return plans
+
+
+def measure(name: str, book, *args) -> tuple[float, list]:
+    started = time.perf_counter()
+    plans = book(*args)
+    per_order = (time.perf_counter() - started) / max(len(plans), 1)
+    print(f"{name:<10} {per_order * 1e6:9.1f} мкс на заказ")
+    return per_order, plans
+
+
+def main(orders: int) -> None:
+    random.seed(1)
+    point = LaundryPoint(id=1, name="bench", lat=0, lon=0, radius_m=1000, machines=40, dryers=40, ironers=8)
+    epoch = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    orders_bags = [[Bag(mask=random.choice((0, 1))) for _ in range(random.randint(1, 4))] for _ in range(orders)]
+
+    memory, plans = measure("в памяти", in_memory, point, epoch, orders_bags)
+    rebuild, expected = measure("сборка", rebuilt, point, epoch, orders_bags)
+    assert plans == expected, "расписания разошлись"
+
+    slots = settings.HORIZON_DAYS * 24 * 60 // settings.SLOT_MINUTES
+    print(f"Слотов на ресурс: {slots}, заказов поместилось: {len(plans)} из {orders}")
+    print(f"ускорение: {rebuild / memory:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
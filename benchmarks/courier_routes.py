@@ -0,0 +1,62 @@
+"""
+Планировщик рейсов курьеров (src/services/courier_routes.py) на синтетическом дне из src/devtools.
+
+Сравнение с тем, как заказы разбираются сейчас — по одному в порядке поступления,
+рейсами по тем же BAGS_PER_RUN пакетов. БД и Kaiten не нужны.
+
+    python -m benchmarks.courier_routes [заказов ...]
+"""
+import math
+import sys
+import time
+from datetime import datetime, timezone
+
+from src.devtools import ROUTE_POINT, synthetic_route_orders
+from src.services.courier_routes import CourierRoutePlanner, RouteOrder
+from src.services.service_area import METERS_PER_DEGREE
+from src.settings import RouteSettings
+
+settings = RouteSettings()
+
+
+def one_by_one_km(orders: list[RouteOrder]) -> float:
+    """Путь при разборе заказов по очереди: каждый заказ — отдельная остановка."""
+    scale_x = METERS_PER_DEGREE * math.cos(math.radians(ROUTE_POINT.lat)) * settings.DETOUR
+    scale_y = METERS_PER_DEGREE * settings.DETOUR
+
+    def leg(a: tuple[float, float], b: tuple[float, float]) -> float:
+        return math.hypot((a[1] - b[1]) * scale_x, (a[0] - b[0]) * scale_y)
+
+    depot = (ROUTE_POINT.lat, ROUTE_POINT.lon)
+    total, current, load = 0.0, depot, 0
+    for order in orders:
+        if load + order.bags > settings.BAGS_PER_RUN:
+            total += leg(current, depot)
+            current, load = depot, 0
+        total += leg(current, (order.lat, order.lon))
+        current, load = (order.lat, order.lon), load + order.bags
+    return (total + leg(current, depot)) / 1000
+
+
+def main(counts: list[int]) -> None:
+    start_at = datetime.now(timezone.utc).replace(hour=6, minute=0, second=0, microsecond=0)
+    planner = CourierRoutePlanner(settings)
+
+    print(f"{'заказов':>8} {'адресов':>8} {'рейсов':>7} {'план, мс':>9} {'км':>8} {'по очереди, км':>15} {'опозданий':>10}")
+    for count in counts:
+        orders = synthetic_route_orders(count, start_at)
+
+        started = time.perf_counter()
+        plan = planner.plan(orders, ROUTE_POINT, start_at)
+        elapsed = time.perf_counter() - started
+
+        stops = sum(len(run.visits) for run in plan.runs)
+        planned_orders = sum(len(run.orders) for run in plan.runs)
+        assert planned_orders == count, "не все заказы попали в рейсы"
+        km = sum(run.distance_m for run in plan.runs) / 1000
+        print(f"{count:>8} {stops:>8} {len(plan.runs):>7} {elapsed * 1000:>9.1f} {km:>8.1f} "
+              f"{one_by_one_km(orders):>15.1f} {len(plan.late):>10}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 300, 500, 1000])
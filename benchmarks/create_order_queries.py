@@ -0,0 +1,159 @@
+"""
+Создание заказа: число запросов к БД и задержка, «как было» и Repository.create_order.
+
+«Как было» — прежняя последовательность без транзакции: fetch_related("street"),
+OrderStatus.get, Order.create, повторный Order.get + save с id карточки Kaiten
+и OrderStatusHistory.create. Сейчас id карточки сохраняет фоновый воркер outbox
+одним UPDATE, а в горячем пути остаются только вставки в одной транзакции
+(пакеты заказа — одной пачкой).
+
+По умолчанию — локальный Postgres из .env (схема из pg_init/01-schema.sql и миграций);
+"sqlite" вместо адреса — быстрый прогон без Postgres (задержки тогда не показательны).
+
+    python -m benchmarks.create_order_queries [повторов] [адрес БД|sqlite]
+"""
+import asyncio
+import logging
+import statistics
+import sys
+import time
+
+from tortoise import Tortoise
+
+from src.database import db_settings
+from src.enums import OrderStatusName, PaymentStatus, ServiceSlug
+from src.models import Client, Order, OrderStatus, OrderStatusHistory, Street
+from src.repositories import Repository
+from src.services.pricing import Bag, Pricing, services_to_mask
+from src.services.reference_cache import reference_cache
+
+SERVICES = {slug: slug == ServiceSlug.IRONING for slug in ServiceSlug}
+
+
+class RoundTrips(logging.Handler):
+    """Считает обращения к БД: SQL из лога Tortoise плюс BEGIN/COMMIT транзакций asyncpg."""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.count = 0
+        self._patched: list[tuple[type, str, object]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.msg == "%s: %s":
+            self.count += 1
+
+    def __enter__(self) -> "RoundTrips":
+        logger = logging.getLogger("tortoise.db_client")
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(self)
+        logger.propagate = False
+
+        try:
+            from asyncpg.transaction import Transaction
+        except ImportError:
+            return self
+        for name in ("start", "commit", "rollback"):
+            original = getattr(Transaction, name)
+            self._patched.append((Transaction, name, original))
+            setattr(Transaction, name, self._counting(original))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        logging.getLogger("tortoise.db_client").removeHandler(self)
+        for cls, name, original in self._patched:
+            setattr(cls, name, original)
+
+    def _counting(self, method):
+        async def wrapper(*args, **kwargs):
+            self.count += 1
+            return await method(*args, **kwargs)
+        return wrapper
+
+
+async def legacy_create_order(client: Client, chat_id: int, message_id: int) -> Order:
+    await client.fetch_related("street")
+    status_new = await OrderStatus.get(name=OrderStatusName.WAITING_FOR_CAPTURE)
+    order = await Order.create(
+        client=client,
+        status=status_new,
+        total_price_rub=Pricing.calculate_order_price(SERVICES),
+        payment_status=PaymentStatus.WAITING_FOR_CAPTURE,
+        telegram_chat_id=chat_id,
+        telegram_message_id=message_id,
+        street=client.street,
+        house=client.house,
+        entrance=client.entrance,
+        floor=client.floor,
+        apartment=client.apartment,
+        **SERVICES,
+    )
+    # add_card_to_order: карточка создана, id пишется в свежепрочитанный заказ
+    fresh = await Order.get(id=order.id)
+    fresh.kaiten_card_id = 1
+    await fresh.save(update_fields=["kaiten_card_id"])
+    await OrderStatusHistory.create(order=order, status=status_new, changed_by="system")
+    return order
+
+
+async def current_create_order(client: Client, chat_id: int, message_id: int) -> Order:
+    order, _ = await Repository.create_order(
+        client=client,
+        telegram_chat_id=chat_id,
+        telegram_message_id=message_id,
+        bags=[Bag(mask=services_to_mask(SERVICES))],
+        idempotency_key=f"bench:{chat_id}:{message_id}",
+    )
+    return order
+
+
+async def prepare(db_url: str) -> Client:
+    await Tortoise.init(db_url=db_url, modules={"models": ["src.models"]})
+    if db_url.startswith("sqlite"):
+        await Tortoise.generate_schemas()
+        for status in OrderStatusName:
+            await OrderStatus.get_or_create(name=status)
+
+    street, _ = await Street.get_or_create(name="Мытищинская")
+    client, _ = await Client.get_or_create(
+        telegram_id=999_000_001,
+        defaults={"phone": "+70000000000", "name": "bench", "street": street, "house": "1", "apartment": 1},
+    )
+    # как в работающем боте: клиент уже загружен, справочники в памяти (init_db)
+    await reference_cache.load()
+    return await Client.get(id=client.id)
+
+
+async def measure(name: str, create, client: Client, runs: int) -> None:
+    base = time.time_ns()
+    latencies = []
+    with RoundTrips() as trips:
+        for i in range(runs):
+            started = time.perf_counter()
+            await create(client, client.telegram_id, base + i)
+            latencies.append(time.perf_counter() - started)
+
+    print(
+        f"{name:<10} {trips.count / runs:4.1f} обращений к БД на заказ, "
+        f"p50 {statistics.median(latencies) * 1000:6.2f} мс, "
+        f"p99 {statistics.quantiles(latencies, n=100)[98] * 1000:6.2f} мс"
+    )
+
+
+async def main(runs: int, db_url: str) -> None:
+    client = await prepare(db_url)
+    try:
+        print(f"Заказов: {runs}, БД: {db_url.split('@')[-1]}")
+        await measure("как было", legacy_create_order, client, runs)
+        await measure("сейчас", current_create_order, client, runs)
+    finally:
+        # не оставляем мусор в рабочей базе
+        await Order.filter(client_id=client.id).delete()
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    db_url = sys.argv[2] if len(sys.argv) > 2 else db_settings.DATABASE_URL
+    if db_url == "sqlite":
+        db_url = "sqlite://:memory:"
+    asyncio.run(main(runs, db_url))
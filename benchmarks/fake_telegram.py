@@ -0,0 +1,191 @@
+"""
+Локальная заглушка Telegram Bot API для бенчмарков.
+
+Отвечает на основные методы правдоподобным JSON, умеет задержку ответа
+и записывает все вызовы. С global_rate / chat_rate ведёт себя как flood control
+Telegram: сверх лимита за последнюю секунду отвечает 429 с retry_after.
+Повторная правка сообщения тем же текстом — 400 «message is not modified».
+Бот направляется сюда через base_url:
+
+    Application.builder().token(TOKEN).base_url(fake.base_url)
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from src.api.server import ApiServer
+
+TOKEN = "123456:bench"
+
+
+class FakeTelegram:
+    def __init__(
+            self,
+            port: int = 18081,
+            delay: float = 0.0,
+            global_rate: int | None = None,
+            chat_rate: int | None = None,
+    ):
+        self.port = port
+        self.delay = delay
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.calls: Counter[str] = Counter()
+        self.requests: list[tuple[str, dict]] = []
+        self.throttled = 0
+        self._message_ids = itertools.count(1)
+        self._texts: dict[tuple[int, int], str] = {}
+        self._recent: deque[float] = deque()
+        self._recent_by_chat: dict[int, deque[float]] = {}
+        self._server: ApiServer | None = None
+
+        self.api = FastAPI()
+        self.api.add_api_route("/bot{token}/{method}", self._handle, methods=["GET", "POST"], response_model=None)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    def _over_limit(self, chat_id: int) -> bool:
+        """Скользящее окно в секунду: общий лимит и лимит на чат."""
+        now = time.monotonic()
+        chat = self._recent_by_chat.setdefault(chat_id, deque())
+        for window in (self._recent, chat):
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+        if (self.global_rate and len(self._recent) >= self.global_rate) \
+                or (self.chat_rate and len(chat) >= self.chat_rate):
+            return True
+        self._recent.append(now)
+        chat.append(now)
+        return False
+
+    async def _handle(self, token: str, method: str, request: Request) -> dict | JSONResponse:
+        # PTB шлёт параметры как application/x-www-form-urlencoded
+        form = dict(parse_qsl((await request.body()).decode()))
+        self.calls[method] += 1
+        self.requests.append((method, form))
+
+        if "chat_id" in form and (self.global_rate or self.chat_rate) and self._over_limit(int(form["chat_id"])):
+            self.throttled += 1
+            return JSONResponse(status_code=429, content={
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+
+        if method == "editMessageText":
+            key = (int(form.get("chat_id", 1)), int(form.get("message_id", 0)))
+            if self._texts.get(key) == form.get("text"):
+                return JSONResponse(status_code=400, content={
+                    "ok": False,
+                    "error_code": 400,
+                    "description": "Bad Request: message is not modified: specified new message content "
+                                   "and reply markup are exactly the same as a current content and reply markup "
+                                   "of the message",
+                })
+
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        result = self.result(method, form)
+        if method in ("sendMessage", "editMessageText"):
+            self._texts[(result["chat"]["id"], result["message_id"])] = result["text"]
+        return {"ok": True, "result": result}
+
+    def result(self, method: str, params: dict) -> object:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        if method in ("sendMessage", "editMessageText", "sendInvoice", "sendPhoto"):
+            chat_id = int(params.get("chat_id", 1))
+            return {
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+    async def start(self) -> None:
+        self._server = ApiServer(self.api, "127.0.0.1", self.port, log_level="warning")
+        await self._server.start()
+        while not self._server.server.started:
+            await asyncio.sleep(0.01)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            await self._server.stop()
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    """Апдейт с текстовым сообщением от пользователя в личном чате."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+        },
+    }
+
+
+def callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> dict:
+    """Апдейт с нажатием inline-кнопки."""
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": str(user_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "bench"},
+                "text": "…",
+            },
+        },
+    }
+
+
+def precheckout_update(update_id: int, user_id: int, payload: str, total_amount: int, currency: str = "RUB") -> dict:
+    """Апдейт pre_checkout_query: клиент нажал «Оплатить» в счёте."""
+    return {
+        "update_id": update_id,
+        "pre_checkout_query": {
+            "id": str(update_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "currency": currency,
+            "total_amount": total_amount,
+            "invoice_payload": payload,
+        },
+    }
+
+
+def successful_payment_update(update_id: int, user_id: int, payload: str, total_amount: int,
+                              currency: str = "RUB") -> dict:
+    """Сервисное сообщение об успешной оплате счёта."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "successful_payment": {
+                "currency": currency,
+                "total_amount": total_amount,
+                "invoice_payload": payload,
+                "telegram_payment_charge_id": f"tg-{update_id}",
+                "provider_payment_charge_id": f"yk-{update_id}",
+            },
+        },
+    }
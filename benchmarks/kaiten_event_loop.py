@@ -0,0 +1,92 @@
+"""
+Задержка хендлеров при одновременных заказах: синхронный Kaiten против AsyncKaiten.
+
+Kaiten подменяется httpx.MockTransport с искусственной задержкой ответа,
+сеть и .env не нужны.
+
+    python -m benchmarks.kaiten_event_loop [кол-во заказов] [задержка Kaiten, c]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from src.settings import KaitenSettings
+from src.services.kaiten_kanban import Kaiten, AsyncKaiten
+
+SETTINGS = KaitenSettings(API_KEY="bench", DOMAIN="bench", BOARD=1, SPACE=1)
+CARD = {"id": 1}
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags: list[float], interval: float = 0.01) -> None:
+    """Имитирует чужой диалог: насколько позже положенного он получает управление."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(client_factory, orders: int) -> tuple[list[float], list[float]]:
+    latencies: list[float] = []
+    lags: list[float] = []
+    stop = asyncio.Event()
+
+    kaiten = client_factory()
+
+    async def handler(submitted: float) -> None:
+        result = kaiten.create_card(title="bench")
+        if asyncio.iscoroutine(result):
+            await result
+        latencies.append(time.perf_counter() - submitted)
+
+    probe = asyncio.create_task(probe_loop_lag(stop, lags))
+    await asyncio.sleep(0.05)
+    submitted = time.perf_counter()
+    await asyncio.gather(*(handler(submitted) for _ in range(orders)))
+    stop.set()
+    await probe
+
+    close = kaiten.close()
+    if asyncio.iscoroutine(close):
+        await close
+
+    return latencies, lags
+
+
+async def main(orders: int, delay: float) -> None:
+    def sync_handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(delay)
+        return httpx.Response(200, json=CARD)
+
+    async def async_handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json=CARD)
+
+    variants = {
+        "Kaiten (sync)": lambda: Kaiten(settings=SETTINGS, transport=httpx.MockTransport(sync_handler)),
+        "AsyncKaiten": lambda: AsyncKaiten(settings=SETTINGS, transport=httpx.MockTransport(async_handler)),
+    }
+
+    print(f"Заказов: {orders}, задержка Kaiten: {delay * 1000:.0f} мс")
+    print(f"{'клиент':<16}{'p50 хендлера':>14}{'p99 хендлера':>14}{'макс. лаг loop':>16}")
+    for name, factory in variants.items():
+        latencies, lags = await run(factory, orders)
+        print(
+            f"{name:<16}"
+            f"{statistics.median(latencies) * 1000:>12.0f}мс"
+            f"{percentile(latencies, 0.99) * 1000:>12.0f}мс"
+            f"{max(lags, default=0) * 1000:>14.0f}мс"
+        )
+
+
+if __name__ == "__main__":
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    asyncio.run(main(orders, delay))
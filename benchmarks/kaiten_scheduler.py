@@ -0,0 +1,77 @@
+"""
+Пересменка: пачка переносов карточек (по несколько на карточку).
+Сравнение «по одному PATCH на перенос» и KaitenWriteScheduler.
+
+    python -m benchmarks.kaiten_scheduler [карточек] [переносов на карточку] [задержка, c] [лимит rps]
+"""
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+from src.enums import KaitenColumns
+from src.settings import KaitenSettings
+from src.services.kaiten_kanban import AsyncKaiten
+from src.services.kaiten_scheduler import KaitenWriteScheduler
+
+SETTINGS = KaitenSettings(API_KEY="bench", DOMAIN="bench", BOARD=1, SPACE=1)
+
+
+def make_kaiten(delay: float, counter: list[int]) -> AsyncKaiten:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        counter[0] += 1
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"id": 1, "tags": []})
+
+    return AsyncKaiten(settings=SETTINGS, transport=httpx.MockTransport(handler))
+
+
+async def naive(moves: list[tuple[int, KaitenColumns]], delay: float) -> tuple[float, int]:
+    counter = [0]
+    kaiten = make_kaiten(delay, counter)
+    started = time.perf_counter()
+    for card_id, column in moves:
+        await kaiten.change_card_status(card_id, column)
+    elapsed = time.perf_counter() - started
+    await kaiten.close()
+    return elapsed, counter[0]
+
+
+async def scheduled(moves: list[tuple[int, KaitenColumns]], delay: float, rate: float) -> tuple[float, int]:
+    counter = [0]
+    kaiten = make_kaiten(delay, counter)
+    scheduler = KaitenWriteScheduler(kaiten, rate=rate, burst=int(rate), parallelism=8)
+    scheduler.start()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(scheduler.submit_move(card_id, column) for card_id, column in moves))
+    elapsed = time.perf_counter() - started
+
+    m = scheduler.metrics()
+    print(f"  метрики: requests={m.requests_total}, coalesced={m.coalesced_total}, rps={m.rps:.1f}")
+    await scheduler.stop()
+    await kaiten.close()
+    return elapsed, counter[0]
+
+
+async def main(cards: int, per_card: int, delay: float, rate: float) -> None:
+    columns = list(KaitenColumns)
+    moves = [(card_id, random.choice(columns)) for _ in range(per_card) for card_id in range(1, cards + 1)]
+
+    print(f"Переносов: {len(moves)} ({cards} карточек × {per_card}), задержка {delay * 1000:.0f} мс, лимит {rate} rps")
+
+    elapsed, requests = await naive(moves, delay)
+    print(f"по одному:   {elapsed:6.2f} c, запросов {requests}")
+
+    elapsed, requests = await scheduled(moves, delay, rate)
+    print(f"планировщик: {elapsed:6.2f} c, запросов {requests}")
+
+
+if __name__ == "__main__":
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    per_card = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    rate = float(sys.argv[4]) if len(sys.argv) > 4 else 20.0
+    asyncio.run(main(cards, per_card, delay, rate))
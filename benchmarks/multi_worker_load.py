@@ -0,0 +1,215 @@
+"""
+Нагрузочный тест нескольких воркеров бота за одним вебхуком.
+
+Поднимает N процессов `python -m src.bot.main` (BOT_MODE=webhook, общая таблица
+telegram_updates), локальную заглушку Telegram и Kaiten, и гоняет виртуальных
+пользователей по полному сценарию /start → … → confirm → paid_yes.
+Апдейты раскидываются по воркерам случайно (как балансировщик), часть отправляется
+повторно (как повтор вебхука Telegram). Задержка шага — от отправки апдейта
+до последнего ответа бота на него.
+
+Нужен Postgres со схемой из pg_init/01-schema.sql и миграциями (настройки DB_* из .env).
+
+    python -m benchmarks.multi_worker_load [пользователей] [воркеры через запятую] [доля повторов]
+"""
+import asyncio
+import itertools
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+from fastapi import Request
+
+from src.api.telegram import WEBHOOK_PATH
+from benchmarks.fake_telegram import FakeTelegram, TOKEN, message_update, callback_update
+
+FAKE_PORT = 18082
+API_BASE_PORT = 18100
+CONFIRM_MESSAGE_ID = 1000
+
+# (апдейт, сколько сообщений бот отправит/отредактирует в ответ)
+FLOW = [
+    (lambda uid, user: message_update(uid, user, "/start"), 1),
+    (lambda uid, user: callback_update(uid, user, "order"), 1),
+    (lambda uid, user: contact_update(uid, user), 1),
+    (lambda uid, user: message_update(uid, user, "Нагрузочный Тест"), 1),
+    (lambda uid, user: callback_update(uid, user, "street_2"), 1),
+    (lambda uid, user: message_update(uid, user, "5"), 1),
+    (lambda uid, user: message_update(uid, user, "10"), 1),
+    (lambda uid, user: message_update(uid, user, "1"), 1),
+    (lambda uid, user: callback_update(uid, user, "bags_2"), 1),
+    (lambda uid, user: message_update(uid, user, "Глажка"), 1),
+    (lambda uid, user: message_update(uid, user, "Готово"), 1),
+    (lambda uid, user: message_update(uid, user, "Готово"), 2),
+    (lambda uid, user: callback_update(uid, user, "confirm", CONFIRM_MESSAGE_ID), 1),
+    (lambda uid, user: callback_update(uid, user, "paid_yes", CONFIRM_MESSAGE_ID), 1),
+]
+CHAT_METHODS = {"sendMessage", "editMessageText"}
+
+
+def contact_update(update_id: int, user_id: int) -> dict:
+    update = message_update(update_id, user_id, "")
+    del update["message"]["text"]
+    update["message"]["contact"] = {"phone_number": f"+7{user_id:010d}"[-12:], "first_name": "load", "user_id": user_id}
+    return update
+
+
+class LoadTelegram(FakeTelegram):
+    """Заглушка Telegram, которая считает ответы бота по чатам; заодно отвечает за Kaiten."""
+
+    def __init__(self, port: int):
+        super().__init__(port=port)
+        self.replies: dict[int, int] = defaultdict(int)
+        self.changed = asyncio.Condition()
+        self._card_ids = itertools.count(1)
+        self.api.add_api_route("/kaiten/{path:path}", self._kaiten, methods=["GET", "POST", "PATCH"])
+
+    def result(self, method: str, params: dict) -> object:
+        if method in CHAT_METHODS and "chat_id" in params:
+            self.replies[int(params["chat_id"])] += 1
+            asyncio.get_running_loop().create_task(self._notify())
+        return super().result(method, params)
+
+    async def _notify(self) -> None:
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def wait_replies(self, chat_id: int, count: int, timeout: float = 30.0) -> None:
+        async with self.changed:
+            await asyncio.wait_for(self.changed.wait_for(lambda: self.replies[chat_id] >= count), timeout)
+
+    async def _kaiten(self, path: str, request: Request) -> object:
+        if request.method == "GET":
+            return []
+        return {"id": next(self._card_ids), "tags": []}
+
+
+def start_workers(count: int) -> list[subprocess.Popen]:
+    workers = []
+    for index in range(count):
+        env = dict(
+            os.environ,
+            BOT_TOKEN=TOKEN,
+            BOT_MODE="webhook",
+            WEBHOOK_URL="http://127.0.0.1",
+            BOT_API_URL=f"http://127.0.0.1:{FAKE_PORT}/bot",
+            KAITEN_BASE_URL=f"http://127.0.0.1:{FAKE_PORT}/kaiten",
+            WORKER_COUNT=str(count),
+            WORKER_INDEX=str(index),
+            API_HOST="127.0.0.1",
+            API_PORT=str(API_BASE_PORT + index),
+        )
+        workers.append(subprocess.Popen(
+            [sys.executable, "-m", "src.bot.main"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        ))
+    return workers
+
+
+async def wait_ready(client: httpx.AsyncClient, ports: list[int], timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            try:
+                if (await client.get(f"http://127.0.0.1:{port}/health")).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"worker on port {port} did not start")
+            await asyncio.sleep(0.2)
+
+
+def stop_workers(workers: list[subprocess.Popen]) -> None:
+    for worker in workers:
+        worker.send_signal(signal.SIGTERM)
+    for worker in workers:
+        try:
+            worker.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+
+async def user_flow(
+        fake: LoadTelegram,
+        client: httpx.AsyncClient,
+        ports: list[int],
+        user_id: int,
+        update_ids: itertools.count,
+        retry_rate: float,
+        latencies: list[float],
+) -> None:
+    expected = 0
+    for make_update, replies in FLOW:
+        update = make_update(next(update_ids), user_id)
+        expected += replies
+
+        started = time.perf_counter()
+        await client.post(f"http://127.0.0.1:{random.choice(ports)}{WEBHOOK_PATH}", json=update)
+        if random.random() < retry_rate:
+            # Telegram не дождался ответа и прислал тот же апдейт, возможно, другому воркеру
+            await client.post(f"http://127.0.0.1:{random.choice(ports)}{WEBHOOK_PATH}", json=update)
+        await fake.wait_replies(user_id, expected)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(fake: LoadTelegram, workers: int, users: int, retry_rate: float) -> None:
+    ports = [API_BASE_PORT + i for i in range(workers)]
+    processes = start_workers(workers)
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            await wait_ready(client, ports)
+
+            # свежие id пользователей и апдейтов на каждый прогон
+            base = int(time.time() * 1000) % 10 ** 9 * 1000
+            user_ids = [base + i for i in range(users)]
+            update_ids = itertools.count(base)
+            latencies: list[float] = []
+
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                user_flow(fake, client, ports, user_id, update_ids, retry_rate, latencies)
+                for user_id in user_ids
+            ))
+            elapsed = time.perf_counter() - started
+
+            # дать дубликатам шанс (ошибочно) обработаться и посчитать лишние ответы
+            await asyncio.sleep(1.0)
+            per_user = sum(replies for _, replies in FLOW)
+            extra = sum(fake.replies[user_id] - per_user for user_id in user_ids)
+    finally:
+        # в отдельном потоке: заглушка Telegram должна отвечать, пока воркеры завершаются
+        await asyncio.to_thread(stop_workers, processes)
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    p50, p99 = percentiles[49], percentiles[98]
+    print(
+        f"воркеров {workers}: {len(latencies) / elapsed:7.1f} апд/с, "
+        f"p50 {p50 * 1000:6.1f} мс, p99 {p99 * 1000:6.1f} мс, лишних ответов {extra}"
+    )
+
+
+async def main(users: int, worker_counts: list[int], retry_rate: float) -> None:
+    fake = LoadTelegram(FAKE_PORT)
+    await fake.start()
+    try:
+        print(f"Пользователей: {users}, шагов на пользователя: {len(FLOW)}, повторов вебхука {retry_rate:.0%}")
+        for workers in worker_counts:
+            await run(fake, workers, users, retry_rate)
+    finally:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    worker_counts = [int(n) for n in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 2, 4]
+    retry_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    asyncio.run(main(users, worker_counts, retry_rate))
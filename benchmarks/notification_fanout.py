@@ -0,0 +1,98 @@
+"""
+Рассылка клиентам через NotificationDispatcher (src/bot/notifications.py) против
+«всё сразу через asyncio.gather». Telegram — локальная заглушка (benchmarks/fake_telegram.py)
+с flood control: 30 сообщений в секунду на бота и 1 в секунду на чат.
+
+Каждому чату уходит объявление; части чатов ещё и несколько быстрых правок
+статусного сообщения — их диспетчер склеивает в одну.
+
+    python -m benchmarks.notification_fanout [чатов]
+"""
+import asyncio
+import sys
+import time
+
+from telegram import Bot
+from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
+
+from benchmarks.fake_telegram import FakeTelegram, TOKEN
+from src.bot.notifications import Notification, NotificationDispatcher
+from src.bot.settings import NotificationSettings
+
+EDITS_PER_CHAT = 3
+STATUS_MESSAGE_ID = 10 ** 6  # в заглушке такого нет — правка проходит как новая
+
+
+def workload(chats: int) -> list[Notification]:
+    notifications = [Notification(chat_id=chat_id, text="Завтра курьеры работают до 20:00") for chat_id in range(1, chats + 1)]
+    for chat_id in range(1, chats + 1, 3):
+        notifications += [
+            Notification(chat_id=chat_id, text=f"Статус: шаг {step}", edit_message_id=STATUS_MESSAGE_ID)
+            for step in range(EDITS_PER_CHAT)
+        ]
+    return notifications
+
+
+def make_bot(fake: FakeTelegram, pool: int) -> Bot:
+    return Bot(TOKEN, base_url=fake.base_url, request=HTTPXRequest(connection_pool_size=pool))
+
+
+async def dispatched(chats: int, port: int) -> None:
+    fake = FakeTelegram(port=port, global_rate=30, chat_rate=1)
+    await fake.start()
+    settings = NotificationSettings()
+    try:
+        async with make_bot(fake, settings.PARALLELISM) as bot:
+            dispatcher = NotificationDispatcher(bot, settings)
+            dispatcher.start()
+            started = time.perf_counter()
+            dispatcher.submit_many(workload(chats))
+            await dispatcher.join()
+            elapsed = time.perf_counter() - started
+            await dispatcher.stop()
+    finally:
+        await fake.stop()
+
+    metrics = dispatcher.metrics()
+    delivered = metrics.sent_total + metrics.edited_total + metrics.unchanged_total
+    print(f"{'диспетчер':<10} доставлено {delivered:>5}, запросов {sum(fake.calls.values()) - 1:>5}, "
+          f"429: {fake.throttled:>4}, потеряно {metrics.failed_total:>4}, "
+          f"склеено правок {metrics.coalesced_total:>4}, {elapsed:6.1f} с, {delivered / elapsed:5.1f} в с")
+
+
+async def naive(chats: int, port: int) -> None:
+    fake = FakeTelegram(port=port, global_rate=30, chat_rate=1)
+    await fake.start()
+    try:
+        async with make_bot(fake, 64) as bot:
+            async def send(notification: Notification) -> bool:
+                try:
+                    if notification.edit_message_id:
+                        await bot.edit_message_text(notification.text, chat_id=notification.chat_id,
+                                                    message_id=notification.edit_message_id)
+                    else:
+                        await bot.send_message(notification.chat_id, notification.text)
+                    return True
+                except TelegramError:
+                    return False
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(send(notification) for notification in workload(chats)))
+            elapsed = time.perf_counter() - started
+    finally:
+        await fake.stop()
+
+    print(f"{'gather':<10} доставлено {sum(results):>5}, запросов {len(results):>5}, "
+          f"429: {fake.throttled:>4}, потеряно {len(results) - sum(results):>4}, "
+          f"{'':>19}{elapsed:6.1f} с")
+
+
+async def main(chats: int) -> None:
+    print(f"Чатов: {chats}, сообщений: {len(workload(chats))}")
+    await naive(chats, 18091)
+    await dispatched(chats, 18092)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
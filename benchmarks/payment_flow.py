@@ -0,0 +1,131 @@
+"""
+Оплата заказа целиком на локальных заглушках: Telegram — benchmarks/fake_telegram.py,
+БД — SQLite в памяти, ЮKassa — уведомления, отправленные прямо в FastAPI-приложение бота.
+
+Проверяет, что счёт выставляется на сумму заказа, pre_checkout_query отвечает
+из кэша (и сколько это занимает против 10 секунд Telegram), successful_payment
+переводит заказ в NEW, а повторные и запоздалые вебхуки ЮKassa ничего не меняют.
+
+    python -m benchmarks.payment_flow [pre_checkout_query]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from telegram import Update
+from telegram.ext import Application, MessageHandler, PreCheckoutQueryHandler, filters
+from tortoise import Tortoise
+
+from benchmarks.fake_telegram import FakeTelegram, TOKEN, precheckout_update, successful_payment_update
+from src.api.app import create_api
+from src.bot.handlers.payment import precheckout_handler, successful_payment
+from src.bot.handlers.send_invoice import send_order_invoice
+from src.enums import OrderStatusName, PaymentStatus
+from src.models import Client, Order, OrderStatus, OrderStatusHistory
+from src.repositories import Repository
+from src.services.payments import invoice_payload
+from src.services.reference_cache import reference_cache
+from src.settings import PaymentSettings
+
+USER_ID = 777
+
+
+async def create_order(total: int) -> Order:
+    client = await Client.get_or_create(telegram_id=USER_ID, defaults={"phone": "+7", "house": "1", "apartment": 1})
+    order = await Order.create(
+        client=client[0],
+        status_id=Repository.get_status_id(OrderStatusName.WAITING_FOR_CAPTURE),
+        payment_status=PaymentStatus.WAITING_FOR_CAPTURE,
+        house="1",
+        apartment=1,
+        total_price_rub=total,
+        telegram_chat_id=USER_ID,
+        telegram_message_id=1,
+    )
+    await OrderStatusHistory.create(order=order, status_id=order.status_id, changed_by="system")
+    return order
+
+
+def last_precheckout_answer(fake: FakeTelegram) -> dict:
+    return next(form for method, form in reversed(fake.requests) if method == "answerPreCheckoutQuery")
+
+
+async def main(queries: int) -> None:
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["src.models"]})
+    await Tortoise.generate_schemas()
+    fake = FakeTelegram(port=18097)
+    await fake.start()
+
+    app = Application.builder().token(TOKEN).base_url(fake.base_url).updater(None).build()
+    app.add_handler(PreCheckoutQueryHandler(precheckout_handler))
+    app.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment))
+    await app.initialize()
+
+    api = create_api(payment_settings=PaymentSettings(WEBHOOK_SECRET="local"))
+    yookassa = httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://bot")
+
+    try:
+        for status in OrderStatusName:
+            await OrderStatus.create(name=status)
+        await reference_cache.load()
+
+        # 1. Счёт
+        order = await create_order(total=990)
+        await send_order_invoice(app.bot, USER_ID, order)
+        print(f"Счёт: заказ #{order.id}, {order.total_price_rub} ₽, sendInvoice ушёл: {fake.calls['sendInvoice'] == 1}")
+
+        # 2. pre_checkout_query: только кэш
+        payload = invoice_payload(order.id)
+        timings = []
+        for update_id in range(1, queries + 1):
+            update = Update.de_json(precheckout_update(update_id, USER_ID, payload, 99000), app.bot)
+            started = time.perf_counter()
+            await app.process_update(update)
+            timings.append(time.perf_counter() - started)
+        ok = last_precheckout_answer(fake)["ok"] == "true"
+        print(f"pre_checkout_query ×{queries}: ok={ok}, медиана {statistics.median(timings) * 1000:.2f} мс, "
+              f"максимум {max(timings) * 1000:.2f} мс (лимит Telegram — 10 000 мс)")
+
+        await app.process_update(Update.de_json(precheckout_update(10 ** 6, USER_ID, payload, 100), app.bot))
+        print(f"Чужая сумма отклонена: {last_precheckout_answer(fake)['ok'] == 'false'}")
+
+        # 3. successful_payment
+        await app.process_update(Update.de_json(successful_payment_update(10 ** 6 + 1, USER_ID, payload, 99000), app.bot))
+        order = await Order.get(id=order.id)
+        print(f"После successful_payment: {Repository.get_status_name(order.status_id)}, "
+              f"оплата {order.payment_status}, payment_id {order.payment_id}")
+
+        # 4. ЮKassa присылает то же самое, и не один раз
+        notification = {
+            "type": "notification",
+            "event": "payment.succeeded",
+            "object": {"id": order.payment_id, "status": "succeeded", "amount": {"value": "990.00", "currency": "RUB"}},
+        }
+        answers = [(await yookassa.post("/payments/yookassa/local", json=notification)).json()["status"] for _ in range(3)]
+        late_cancel = dict(notification, event="payment.canceled")
+        answers.append((await yookassa.post("/payments/yookassa/local", json=late_cancel)).json()["status"])
+        history = await OrderStatusHistory.filter(order_id=order.id).count()
+        print(f"Вебхуки ЮKassa: {answers}, записей в истории: {history} (ожидается 2)")
+
+        # 5. Заказ, оплаченный вне Telegram: сначала вебхук
+        other = await create_order(total=450)
+        by_webhook = {
+            "type": "notification",
+            "event": "payment.succeeded",
+            "object": {"id": "yk-direct", "status": "succeeded", "amount": {"value": "450.00", "currency": "RUB"},
+                       "metadata": {"order_id": str(other.id)}},
+        }
+        first = (await yookassa.post("/payments/yookassa/local", json=by_webhook)).json()["status"]
+        other = await Order.get(id=other.id)
+        print(f"Оплата по вебхуку: {first}, заказ {Repository.get_status_name(other.status_id)}")
+    finally:
+        await yookassa.aclose()
+        await app.shutdown()
+        await fake.stop()
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
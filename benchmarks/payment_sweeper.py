@@ -0,0 +1,134 @@
+"""
+Сверка зависших оплат на SQLite в памяти: PaymentSweeper (src/services/payment_sweeper.py)
+против «в лоб» — выбрать все зависшие заказы и провести каждый через
+Repository.update_payment_status.
+
+Четверть заказов — брошенные счета без платежа, у остальных провайдер-заглушка
+отвечает поровну succeeded / canceled / pending. Печатает время, число запросов
+к провайдеру и пик памяти (tracemalloc) и проверяет, что итог в базе одинаковый.
+
+    python -m benchmarks.payment_sweeper [заказов]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from tortoise import Tortoise
+
+from src.enums import OrderStatusName, PaymentStatus
+from src.models import Client, KaitenOutbox, Order, OrderStatus, OrderStatusHistory
+from src.repositories import Repository
+from src.services.payment_sweeper import OPEN_PAYMENT_STATUSES, PaymentSweeper
+from src.services.reference_cache import reference_cache
+from src.settings import PaymentSettings
+
+OUTCOMES = [PaymentStatus.SUCCEEDED, PaymentStatus.CANCELED, PaymentStatus.WAITING_FOR_CAPTURE]
+
+
+class FakeProvider:
+    """Итог платежа зависит от номера в id; каждый вызов — как один круг к API."""
+
+    def __init__(self, latency: float = 0.002):
+        self.latency = latency
+        self.calls = 0
+
+    async def fetch_statuses(self, payment_ids: list[str]) -> dict[str, PaymentStatus]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {payment_id: OUTCOMES[int(payment_id.removeprefix("pay-")) % 3] for payment_id in payment_ids}
+
+    async def refund(self, payment_id: str, amount_rub: int) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+
+async def reset_db(orders: int) -> None:
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["src.models"]})
+    await Tortoise.generate_schemas()
+    for status in OrderStatusName:
+        await OrderStatus.create(name=status)
+    await reference_cache.load()
+
+    client = await Client.create(telegram_id=1, phone="+7", house="1", apartment=1)
+    waiting = Repository.get_status_id(OrderStatusName.WAITING_FOR_CAPTURE)
+    old = datetime.now(timezone.utc) - timedelta(days=2)
+    rows = [
+        Order(
+            client=client,
+            status_id=waiting,
+            payment_status=PaymentStatus.PENDING if i % 4 == 0 else PaymentStatus.WAITING_FOR_CAPTURE,
+            payment_id=None if i % 4 == 0 else f"pay-{i}",
+            house="1",
+            apartment=1,
+            total_price_rub=990,
+            telegram_chat_id=1,
+            telegram_message_id=i,
+            created_at=old + timedelta(seconds=i // 10),  # одинаковые created_at — проверка keyset по id
+        )
+        for i in range(orders)
+    ]
+    await Order.bulk_create(rows, batch_size=5000)
+
+
+async def naive(provider: FakeProvider) -> None:
+    settings = PaymentSettings()
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=settings.SWEEP_STALE_MINUTES)
+    abandoned_before = datetime.now(timezone.utc) - timedelta(hours=settings.INVOICE_TTL_HOURS)
+    stale = await Order.filter(payment_status__in=OPEN_PAYMENT_STATUSES, created_at__lt=cutoff)
+    for order in stale:
+        if order.payment_id is None:
+            if order.created_at >= abandoned_before:
+                continue
+            status = PaymentStatus.CANCELED
+        else:
+            status = (await provider.fetch_statuses([order.payment_id]))[order.payment_id]
+            if status not in (PaymentStatus.SUCCEEDED, PaymentStatus.CANCELED):
+                continue
+        await Repository.update_payment_status(order.id, status, changed_by="sweeper")
+
+
+async def summary() -> tuple:
+    return (
+        await Order.filter(payment_status=PaymentStatus.SUCCEEDED).count(),
+        await Order.filter(payment_status=PaymentStatus.CANCELED).count(),
+        await Order.filter(payment_status__in=OPEN_PAYMENT_STATUSES).count(),
+        await Order.filter(status_id=Repository.get_status_id(OrderStatusName.NEW)).count(),
+        await OrderStatusHistory.all().count(),
+        await KaitenOutbox.all().count(),
+    )
+
+
+async def measure(name: str, orders: int, sweep) -> tuple:
+    await reset_db(orders)
+    provider = FakeProvider()
+    tracemalloc.start()
+    started = time.perf_counter()
+    await sweep(provider)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = await summary()
+    print(f"{name:<10} {elapsed:>7.2f} с  запросов к провайдеру {provider.calls:>6}  пик памяти {peak / 2 ** 20:>6.1f} МБ  "
+          f"оплачено/отменено/ждут {result[0]}/{result[1]}/{result[2]}, история {result[4]}, outbox {result[5]}")
+    await Tortoise.close_connections()
+    return result
+
+
+async def main(orders: int) -> None:
+    print(f"Зависших заказов: {orders}")
+
+    async def sweeper(provider: FakeProvider) -> None:
+        stats = await PaymentSweeper(provider, PaymentSettings(SWEEP_BATCH=500)).sweep_once()
+        assert stats.scanned == orders, stats
+
+    swept = await measure("sweeper", orders, sweeper)
+    plain = await measure("в лоб", orders, naive)
+    print(f"Итог совпадает: {swept == plain}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,126 @@
+"""
+Накладные расходы persistence на один апдейт.
+
+Диалог с persistent ConversationHandler гоняется через Application.process_update:
+без persistence, с MemoryPersistence и с «сетевым» бэкендом, у которого каждая
+загрузка/запись стоит round-trip (имитация Postgres). Для сравнения — write-through,
+пишущий состояние на каждый апдейт. Telegram — локальная заглушка (нужна только для getMe).
+
+    python -m benchmarks.persistence_overhead [пользователей] [апдейтов на пользователя] [round-trip, c]
+"""
+import asyncio
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, ConversationHandler, MessageHandler, filters
+
+from src.bot.persistence import BufferedPersistence, MemoryPersistence
+from benchmarks.fake_telegram import FakeTelegram, TOKEN, message_update
+
+STEP = 1
+
+
+class RemotePersistence(MemoryPersistence):
+    """MemoryPersistence с задержкой на каждое обращение к «базе»."""
+
+    def __init__(self, round_trip: float, update_interval: float):
+        super().__init__(update_interval=update_interval)
+        self.round_trip = round_trip
+        self.loads = 0
+        self.writes = 0
+
+    async def _load_user(self, user_id: int) -> dict | None:
+        self.loads += 1
+        await asyncio.sleep(self.round_trip)
+        return await super()._load_user(user_id)
+
+    async def _write(self, users, conversations) -> None:
+        self.writes += 1
+        await asyncio.sleep(self.round_trip)
+        await super()._write(users, conversations)
+
+
+class WriteThroughPersistence(RemotePersistence):
+    """Наивный вариант: состояние пишется в базу после каждого апдейта, без буфера."""
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._loaded_users.add(user_id)
+        await self._write({user_id: data}, {})
+
+    async def update_conversation(self, name, key, new_state) -> None:
+        await self._write({}, {(name, self._encode_key(key)): new_state})
+
+
+async def step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    context.user_data["counter"] = context.user_data.get("counter", 0) + 1
+    context.user_data["last"] = update.message.text
+    return STEP
+
+
+async def run(fake: FakeTelegram, persistence: BufferedPersistence | None, users: int, per_user: int) -> float:
+    builder = Application.builder().token(TOKEN).base_url(fake.base_url).updater(None)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    app = builder.build()
+
+    app.add_handler(ConversationHandler(
+        entry_points=[MessageHandler(filters.TEXT, step)],
+        states={STEP: [MessageHandler(filters.TEXT, step)]},
+        fallbacks=[],
+        name="bench",
+        persistent=persistence is not None,
+    ))
+
+    updates = [
+        Update.de_json(message_update(update_id=seq * users + user, user_id=user, text=str(seq)), app.bot)
+        for seq in range(per_user)
+        for user in range(1, users + 1)
+    ]
+
+    async with app:
+        await app.start()
+        started = time.perf_counter()
+        write_through = isinstance(persistence, WriteThroughPersistence)
+        for update in updates:
+            await app.process_update(update)
+            if write_through:
+                await app.update_persistence()
+        # включаем в замер финальный сброс: без него буфер «бесплатен»
+        await app.update_persistence()
+        if persistence is not None:
+            await persistence.flush()
+        elapsed = time.perf_counter() - started
+        await app.stop()
+
+    return elapsed / len(updates)
+
+
+async def main(users: int, per_user: int, round_trip: float) -> None:
+    fake = FakeTelegram()
+    await fake.start()
+    try:
+        print(f"Пользователей: {users}, апдейтов: {users * per_user}, round-trip базы {round_trip * 1000:.1f} мс")
+        baseline = await run(fake, None, users, per_user)
+        print(f"{'без persistence':<22} {baseline * 1e6:9.1f} мкс/апдейт")
+
+        variants = (
+            ("memory", MemoryPersistence(update_interval=5.0)),
+            ("remote, буфер", RemotePersistence(round_trip, update_interval=5.0)),
+            ("remote, write-through", WriteThroughPersistence(round_trip, update_interval=5.0)),
+        )
+        for name, persistence in variants:
+            per_update = await run(fake, persistence, users, per_user)
+            line = f"{name:<22} {per_update * 1e6:9.1f} мкс/апдейт, +{(per_update - baseline) * 1e6:.1f} мкс"
+            if isinstance(persistence, RemotePersistence):
+                line += f", загрузок {persistence.loads}, записей {persistence.writes}"
+            print(line)
+    finally:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    round_trip = float(sys.argv[3]) if len(sys.argv) > 3 else 0.001
+    asyncio.run(main(users, per_user, round_trip))
@@ -0,0 +1,74 @@
+"""
+Пиковая память при сохранении фото из Telegram: потоковая загрузка
+(src/services/photo_storage.py) против скачивания файла целиком в память
+(File.download_as_bytearray) и записи одним куском. Telegram подменён MockTransport,
+хранилище — временный каталог. Сеть и БД не нужны.
+
+    python -m benchmarks.photo_streaming [МБ]
+"""
+import asyncio
+import hashlib
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+from telegram import File
+
+from src.services.photo_storage import FileSystemStorage, TelegramPhotoUploader, content_key
+from src.settings import PhotoStorageSettings
+
+settings = PhotoStorageSettings()
+
+
+def telegram(size: int) -> httpx.MockTransport:
+    """Отдаёт файл кусками, как настоящий сервер, не держа его целиком."""
+    block = b"\xff" * settings.CHUNK_SIZE
+
+    async def body():
+        left = size
+        while left > 0:
+            yield block[:min(left, len(block))]
+            left -= len(block)
+
+    return httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+
+
+async def streaming(root: Path, file: File, size: int) -> None:
+    uploader = TelegramPhotoUploader(FileSystemStorage(root, size), settings.CHUNK_SIZE, transport=telegram(size))
+    await uploader.save(file)
+    await uploader.close()
+
+
+async def buffered(root: Path, file: File, size: int) -> None:
+    async with httpx.AsyncClient(transport=telegram(size)) as client:
+        data = (await client.get(file.file_path)).content
+    target = root / content_key(hashlib.sha256(data).hexdigest(), "image/jpeg")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(data)
+
+
+async def measure(name: str, save, file: File, size: int) -> None:
+    with tempfile.TemporaryDirectory() as root:
+        tracemalloc.start()
+        started = time.perf_counter()
+        await save(Path(root), file, size)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{name:<10} пик памяти {peak / 2 ** 20:7.2f} МБ, {elapsed * 1000:7.1f} мс")
+
+
+async def main(megabytes: int) -> None:
+    size = megabytes * 2 ** 20
+    file = File(file_id="bench", file_unique_id="bench", file_size=size,
+                file_path="https://api.telegram.org/file/bot/photos/bench.jpg")
+    print(f"Файл {megabytes} МБ, кусок {settings.CHUNK_SIZE // 1024} КБ")
+    await measure("поток", streaming, file, size)
+    await measure("целиком", buffered, file, size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,136 @@
+"""
+Погашение одного промокода сотнями клиентов одновременно.
+
+«Наивно» — прочитать used_count, сравнить с лимитом и сохранить +1: под конкуренцией
+лимит перерасходуется, а счётчик теряет инкременты. «Сейчас» — PromoCodes.redeem:
+запись погашения плюс условный UPDATE used_count = used_count + 1 where used_count < limit.
+Заодно — сколько запросов к БД стоит проверка кода с кэшем и отрицательным кэшем.
+
+По умолчанию — локальный Postgres из .env (схема из pg_init/01-schema.sql и миграций);
+"sqlite" вместо адреса — прогон без Postgres (там транзакции идут по одной, гонок не будет).
+
+    python -m benchmarks.promo_contention [клиентов] [лимит] [адрес БД|sqlite]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+from benchmarks.create_order_queries import RoundTrips
+from src.database import db_settings
+from src.models import Client, PromoCode, PromoCodeUse, Street
+from src.services.promo import Promo, PromoCodeError, PromoCodes, address_house_key
+
+TELEGRAM_ID_BASE = 999_100_000
+
+
+async def prepare(db_url: str, users: int) -> list[Client]:
+    await Tortoise.init(db_url=db_url, modules={"models": ["src.models"]})
+    if db_url.startswith("sqlite"):
+        await Tortoise.generate_schemas()
+
+    street, _ = await Street.get_or_create(name="Мытищинская")
+    await Client.bulk_create([
+        Client(
+            telegram_id=TELEGRAM_ID_BASE + i, phone=f"+7{i:010d}", name="bench",
+            street=street, house="1", apartment=i,
+        )
+        for i in range(users)
+    ])
+    return await Client.filter(telegram_id__gte=TELEGRAM_ID_BASE).order_by("id")
+
+
+async def naive_redeem(promo: Promo, client: Client) -> bool:
+    async with in_transaction():
+        code = await PromoCode.get(id=promo.id)
+        if code.usage_limit is not None and code.used_count >= code.usage_limit:
+            return False
+        await PromoCodeUse.create(
+            promo_code_id=promo.id, client_id=client.id, street_id=client.street_id,
+            house_key=address_house_key(client.house), apartment=client.apartment,
+        )
+        code.used_count += 1
+        await code.save(update_fields=["used_count"])
+    return True
+
+
+async def current_redeem(codes: PromoCodes, promo: Promo, client: Client) -> bool:
+    try:
+        async with in_transaction():
+            await codes.redeem(
+                promo, client_id=client.id, order_id=None, street_id=client.street_id,
+                house=client.house, apartment=client.apartment,
+            )
+    except PromoCodeError:
+        return False
+    return True
+
+
+async def contend(name: str, redeem, clients: list[Client], limit: int) -> None:
+    code = await PromoCode.create(code=f"BENCH{time.time_ns()}", usage_limit=limit)
+    promo = Promo.from_model(code)
+    latencies = []
+
+    async def one(client: Client) -> bool:
+        started = time.perf_counter()
+        try:
+            return await redeem(promo, client)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(client) for client in clients), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    await code.refresh_from_db()
+    uses = await PromoCodeUse.filter(promo_code_id=code.id).count()
+    errors = sum(isinstance(result, Exception) for result in results)
+    print(
+        f"{name:<8} погашено {uses:4d} из лимита {limit} (перерасход {max(0, uses - limit)}), "
+        f"used_count {code.used_count:4d}, ошибок {errors}; "
+        f"{len(clients) / elapsed:6.0f} попыток/с, p50 {statistics.median(latencies) * 1000:6.2f} мс, "
+        f"p99 {statistics.quantiles(latencies, n=100)[98] * 1000:6.2f} мс"
+    )
+
+
+async def validation_queries(code: str, attempts: int) -> None:
+    codes = PromoCodes()
+    for label, value in (("известный", code), ("несуществующий", "NO-SUCH-CODE")):
+        with RoundTrips() as trips:
+            for _ in range(attempts):
+                try:
+                    await codes.get(value)
+                except PromoCodeError:
+                    pass
+        print(f"проверка кода ({label}): {trips.count} запросов к БД на {attempts} проверок")
+
+
+async def main(users: int, limit: int, db_url: str) -> None:
+    clients = await prepare(db_url, users)
+    codes = PromoCodes()
+    try:
+        print(f"Клиентов: {users}, лимит кода: {limit}, БД: {db_url.split('@')[-1]}")
+        await contend("наивно", naive_redeem, clients, limit)
+        await contend("сейчас", lambda promo, client: current_redeem(codes, promo, client), clients, limit)
+
+        code = await PromoCode.filter(code__startswith="BENCH").first()
+        await validation_queries(code.code, users)
+    finally:
+        # не оставляем мусор в рабочей базе
+        bench_codes = await PromoCode.filter(code__startswith="BENCH").values_list("id", flat=True)
+        await PromoCodeUse.filter(promo_code_id__in=bench_codes).delete()
+        await PromoCode.filter(id__in=bench_codes).delete()
+        await Client.filter(telegram_id__gte=TELEGRAM_ID_BASE).delete()
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    db_url = sys.argv[3] if len(sys.argv) > 3 else db_settings.DATABASE_URL
+    if db_url == "sqlite":
+        db_url = "sqlite://:memory:"
+    asyncio.run(main(users, limit, db_url))
@@ -0,0 +1,67 @@
+"""
+Проверка «в чьей зоне дом»: сеточный индекс из src/services/service_area.py против перебора всех точек.
+
+Точки и дома синтетические, разбросаны по квадрату ~20×20 км. БД не нужна.
+
+    python -m benchmarks.service_area_lookup [точек] [домов]
+"""
+import math
+import random
+import sys
+import time
+
+from src.services.service_area import GridIndex, Point, distance_m
+
+CENTER_LAT, CENTER_LON = 55.91, 37.73
+SPREAD_DEG = 0.09
+
+
+def linear_nearest(points: list[Point], lat: float, lon: float) -> Point | None:
+    best, best_distance = None, math.inf
+    for point in points:
+        distance = distance_m(lat, lon, point.lat, point.lon)
+        if distance <= point.radius_m and distance < best_distance:
+            best, best_distance = point, distance
+    return best
+
+
+def measure(name: str, lookup, addresses: list[tuple[float, float]]) -> tuple[float, list]:
+    started = time.perf_counter()
+    found = [lookup(lat, lon) for lat, lon in addresses]
+    per_lookup = (time.perf_counter() - started) / len(addresses)
+    print(f"{name:<8} {per_lookup * 1e6:8.2f} мкс на адрес, в зоне: {sum(point is not None for point in found)}")
+    return per_lookup, found
+
+
+def main(points_count: int, buildings: int) -> None:
+    random.seed(1)
+    points = [
+        Point(
+            id=i, name=f"point-{i}",
+            lat=CENTER_LAT + random.uniform(-SPREAD_DEG, SPREAD_DEG),
+            lon=CENTER_LON + random.uniform(-SPREAD_DEG, SPREAD_DEG),
+            radius_m=random.randint(400, 1200),
+        )
+        for i in range(points_count)
+    ]
+    addresses = [
+        (CENTER_LAT + random.uniform(-SPREAD_DEG, SPREAD_DEG), CENTER_LON + random.uniform(-SPREAD_DEG, SPREAD_DEG))
+        for _ in range(buildings)
+    ]
+
+    started = time.perf_counter()
+    grid = GridIndex.build(points)
+    print(f"Точек: {points_count}, адресов: {buildings}; индекс построен за {(time.perf_counter() - started) * 1000:.1f} мс, "
+          f"ячеек: {len(grid.cells)}")
+
+    linear, expected = measure("перебор", lambda lat, lon: linear_nearest(points, lat, lon), addresses)
+    indexed, found = measure("сетка", grid.nearest, addresses)
+    assert found == expected, "сетка и перебор разошлись"
+    print(f"ускорение: {linear / indexed:.1f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50_000,
+    )
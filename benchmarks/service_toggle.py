@@ -0,0 +1,77 @@
+"""
+Процессорное время хендлера переключения доп. услуги (order.select_services).
+
+«Как было» — прежняя логика: обратная карта названий, пересчёт текста цен
+и новая клавиатура на каждое нажатие. «Сейчас» — сам select_services
+по готовым таблицам из src/bot/service_menu.py. Telegram не вызывается:
+reply_text — пустая корутина, замеряется только работа хендлера.
+
+    python -m benchmarks.service_toggle [нажатий]
+"""
+import asyncio
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from src.bot.handlers.order import select_services
+from src.bot.keyboards import services_keyboard
+from src.bot.service_menu import service_menu
+from src.bot.states import OrderStates
+from src.enums import ServiceCyrillic, ServiceCyrillicSlugMap, ServiceSlug
+from src.services.pricing import Pricing
+
+
+async def legacy_select_services(update, context) -> int:
+    text = update.message.text.strip()
+    services = context.user_data.get("services", {service: False for service in ServiceSlug})
+
+    if text in ServiceCyrillic:
+        services[ServiceCyrillicSlugMap[text]] = not services[ServiceCyrillicSlugMap[text]]
+        context.user_data['services'] = services
+
+        slug_cyrillic_map = {v: k for k, v in ServiceCyrillicSlugMap.items()}
+        current_services_text = ''.join([
+            f' — {slug_cyrillic_map[name]}: {Pricing.get_price(name)}\n' for name, picked in services.items() if picked
+        ])
+        services_price = f"{current_services_text}\n\nПродолжайте выбор или нажмите «Готово»"
+        await update.message.reply_text(services_price, reply_markup=services_keyboard(services))
+
+    return OrderStates.SELECT_SERVICES
+
+
+async def reply_text(*args, **kwargs) -> None:
+    pass
+
+
+def make_update(text: str) -> SimpleNamespace:
+    return SimpleNamespace(message=SimpleNamespace(text=text, reply_text=reply_text))
+
+
+async def measure(handler, presses: list[str]) -> float:
+    context = SimpleNamespace(user_data={})
+    updates = [make_update(text) for text in presses]
+
+    started = time.process_time()
+    for update in updates:
+        await handler(update, context)
+    return (time.process_time() - started) / len(presses)
+
+
+async def main(count: int) -> None:
+    random.seed(1)
+    presses = [random.choice(list(ServiceCyrillic)).value for _ in range(count)]
+
+    started = time.process_time()
+    service_menu()
+    build = time.process_time() - started
+
+    print(f"Нажатий: {count}; сборка таблиц на версию прайса: {build * 1000:.2f} мс")
+    legacy = await measure(legacy_select_services, presses)
+    current = await measure(select_services, presses)
+    print(f"как было  {legacy * 1e6:7.1f} мкс CPU на нажатие")
+    print(f"сейчас    {current * 1e6:7.1f} мкс CPU на нажатие ({legacy / current:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
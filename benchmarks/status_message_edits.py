@@ -0,0 +1,107 @@
+"""
+Сколько запросов к Bot API уходит на статусные сообщения: правка на каждое изменение
+против StatusMessageQueue (src/bot/status_messages.py) — debounce и пропуск правок
+с тем же текстом. Telegram — локальная заглушка (benchmarks/fake_telegram.py).
+
+Каждый заказ получает «пачку» переносов, как при разборе доски в Kaiten:
+несколько статусов подряд за доли секунды, затем повтор последнего
+(например, тот же перенос пришёл и от работника, и из Kaiten).
+
+    python -m benchmarks.status_message_edits [заказов] [переносов в пачке]
+"""
+import asyncio
+import sys
+import time
+
+from telegram.error import TelegramError
+
+from benchmarks.fake_telegram import FakeTelegram
+from benchmarks.notification_fanout import make_bot
+from src.bot.notifications import NotificationDispatcher
+from src.bot.settings import NotificationSettings
+from src.bot.status_messages import StatusMessageQueue, render_status
+from src.enums import OrderStatusName
+from src.services.status_sync import StatusChange
+
+DEBOUNCE = 0.5
+FLOW = [
+    OrderStatusName.PICKED_UP,
+    OrderStatusName.WASHING,
+    OrderStatusName.DRYING,
+    OrderStatusName.IRONING,
+    OrderStatusName.PACKING,
+]
+
+
+def bursts(orders: int, moves: int) -> list[list[StatusChange]]:
+    """Пачки изменений по волнам: в каждой волне — следующий статус всех заказов."""
+    waves = []
+    for step in range(moves):
+        status = FLOW[min(step, len(FLOW) - 1)]
+        waves.append([StatusChange(order_id, status, order_id, 1) for order_id in range(1, orders + 1)])
+    # повтор последнего статуса
+    waves.append(list(waves[-1]))
+    return waves
+
+
+async def direct(fake: FakeTelegram, waves: list[list[StatusChange]]) -> int:
+    async with make_bot(fake, 64) as bot:
+        for wave in waves:
+            async def edit(change: StatusChange) -> None:
+                try:
+                    await bot.edit_message_text(render_status(change), chat_id=change.telegram_chat_id,
+                                                message_id=change.telegram_message_id)
+                except TelegramError:
+                    pass
+            await asyncio.gather(*(edit(change) for change in wave))
+            await asyncio.sleep(0.05)
+    return fake.calls["editMessageText"]
+
+
+async def queued(fake: FakeTelegram, waves: list[list[StatusChange]]) -> tuple[int, StatusMessageQueue]:
+    settings = NotificationSettings(GLOBAL_RATE=10_000, GLOBAL_BURST=1000, CHAT_RATE=100, CHAT_BURST=10, PARALLELISM=64)
+    async with make_bot(fake, settings.PARALLELISM) as bot:
+        dispatcher = NotificationDispatcher(bot, settings)
+        dispatcher.start()
+        messages = StatusMessageQueue(dispatcher, debounce=DEBOUNCE)
+        for wave in waves:
+            await messages.put_many(wave)
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(DEBOUNCE * 2)
+        # ещё раз тот же статус, уже после debounce — текст не изменился, правки нет
+        await messages.put_many(waves[-1])
+        await asyncio.sleep(DEBOUNCE * 2)
+        await dispatcher.join()
+        await dispatcher.stop()
+    return fake.calls["editMessageText"], messages
+
+
+async def main(orders: int, moves: int) -> None:
+    waves = bursts(orders, moves)
+    changes = sum(len(wave) for wave in waves) + orders
+    print(f"Заказов: {orders}, изменений статуса: {changes}")
+
+    fake = FakeTelegram(port=18093)
+    await fake.start()
+    try:
+        started = time.perf_counter()
+        calls = await direct(fake, waves + [waves[-1]])
+        print(f"{'напрямую':<12} editMessageText: {calls:>6}  ({time.perf_counter() - started:.1f} с)")
+    finally:
+        await fake.stop()
+
+    fake = FakeTelegram(port=18094)
+    await fake.start()
+    try:
+        started = time.perf_counter()
+        calls, messages = await queued(fake, waves)
+        metrics = messages.metrics()
+        print(f"{'с debounce':<12} editMessageText: {calls:>6}  ({time.perf_counter() - started:.1f} с), "
+              f"склеено {metrics.debounced_total}, без изменений {metrics.unchanged_total}")
+    finally:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [500, 4][len(args):])))
@@ -0,0 +1,82 @@
+"""
+Пропускная способность вебхука: апдейты в секунду при последовательной обработке
+и с PerUserUpdateProcessor. Telegram — локальная заглушка (benchmarks/fake_telegram.py),
+«медленный» хендлер имитирует поход в БД/Kaiten и отвечает пользователю.
+
+    python -m benchmarks.webhook_throughput [пользователей] [апдейтов на пользователя] [задержка хендлера, c]
+"""
+import asyncio
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+from telegram import Update
+from telegram.ext import Application, ContextTypes, MessageHandler, SimpleUpdateProcessor, filters
+
+from src.api.app import create_api
+from src.api.telegram import WEBHOOK_PATH
+from src.bot.update_processor import PerUserUpdateProcessor
+from benchmarks.fake_telegram import FakeTelegram, TOKEN, message_update
+
+
+async def run(fake: FakeTelegram, processor, users: int, per_user: int, delay: float) -> tuple[float, bool]:
+    seen: dict[int, list[int]] = defaultdict(list)
+
+    async def slow_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        await asyncio.sleep(delay)
+        seen[update.effective_user.id].append(int(update.message.text))
+        await update.message.reply_text("ok")
+
+    app = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(fake.base_url)
+        .updater(None)
+        .concurrent_updates(processor)
+        .build()
+    )
+    app.add_handler(MessageHandler(filters.TEXT, slow_handler))
+
+    api = create_api(telegram_app=app)
+    updates = [
+        message_update(update_id=seq * users + user, user_id=user, text=str(seq))
+        for seq in range(per_user)
+        for user in range(1, users + 1)
+    ]
+
+    async with app:
+        await app.start()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(api), base_url="http://bench") as client:
+            started = time.perf_counter()
+            for update in updates:
+                response = await client.post(WEBHOOK_PATH, json=update)
+                response.raise_for_status()
+            await app.update_queue.join()
+            elapsed = time.perf_counter() - started
+        await app.stop()
+
+    ordered = all(seq == sorted(seq) for seq in seen.values())
+    return len(updates) / elapsed, ordered
+
+
+async def main(users: int, per_user: int, delay: float) -> None:
+    fake = FakeTelegram(delay=0.005)
+    await fake.start()
+    try:
+        print(f"Пользователей: {users}, апдейтов: {users * per_user}, задержка хендлера {delay * 1000:.0f} мс")
+        for name, processor in (
+            ("последовательно", SimpleUpdateProcessor(1)),
+            ("PerUser(64)", PerUserUpdateProcessor(64)),
+        ):
+            rate, ordered = await run(fake, processor, users, per_user, delay)
+            print(f"{name:<16} {rate:8.1f} апд/с, порядок внутри пользователя сохранён: {ordered}")
+    finally:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    asyncio.run(main(users, per_user, delay))
@@ -0,0 +1,21 @@
+-- migrations/0001_kaiten_outbox.sql
+-- Очередь операций над Kaiten: пишется вместе с заказом, разбирается воркером
+create table if not exists kaiten_outbox (
+    id bigserial primary key,
+    order_id bigint not null references orders(id) on delete cascade,
+    operation text not null check (operation in ('create_card', 'move_column', 'add_tag')),
+    payload jsonb not null default '{}',
+    idempotency_key text unique not null,
+
+    status text not null default 'pending' check (status in ('pending', 'done', 'failed')),
+    attempts int not null default 0,
+    next_attempt_at timestamptz not null default now(),
+    last_error text,
+
+    created_at timestamptz default now(),
+    processed_at timestamptz
+);
+
+create index if not exists kaiten_outbox_pending_idx
+    on kaiten_outbox (next_attempt_at, id)
+    where status = 'pending';
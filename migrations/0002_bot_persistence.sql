@@ -0,0 +1,15 @@
+-- migrations/0002_bot_persistence.sql
+-- Состояние диалогов бота (src/bot/persistence.py): переживает рестарт и общее для реплик
+create table if not exists bot_user_data (
+    user_id bigint primary key,
+    data jsonb not null default '{}',
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists bot_conversations (
+    name text not null,
+    key text not null,  -- JSON-список ключа ConversationHandler, например [chat_id, user_id]
+    state int not null,
+    updated_at timestamptz not null default now(),
+    primary key (name, key)
+);
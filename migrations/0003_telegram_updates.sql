@@ -0,0 +1,23 @@
+-- migrations/0003_telegram_updates.sql
+-- Входящие апдейты Telegram для нескольких воркеров бота (src/bot/update_inbox.py)
+create table if not exists telegram_updates (
+    update_id bigint primary key,  -- повтор вебхука с тем же id отбрасывается
+    user_id bigint not null,
+    payload jsonb not null,
+
+    status text not null default 'pending' check (status in ('pending', 'processing', 'done')),
+    received_at timestamptz not null default now(),
+    locked_at timestamptz,
+    processed_at timestamptz
+);
+
+create index if not exists telegram_updates_open_idx
+    on telegram_updates (update_id)
+    where status <> 'done';
+
+create index if not exists telegram_updates_done_idx
+    on telegram_updates (processed_at)
+    where status = 'done';
+
+-- Повторный callback (двойное нажатие, повтор после сбоя воркера) не создаёт второй заказ
+alter table orders add column if not exists idempotency_key text unique;
@@ -0,0 +1,18 @@
+-- migrations/0004_reference_notify.sql
+-- Изменения справочников рассылаются процессам бота (src/services/reference_cache.py)
+create or replace function notify_reference_changed() returns trigger as $$
+begin
+    perform pg_notify('reference_changed', tg_table_name);
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists order_statuses_notify on order_statuses;
+create trigger order_statuses_notify
+    after insert or update or delete or truncate on order_statuses
+    for each statement execute function notify_reference_changed();
+
+drop trigger if exists streets_notify on streets;
+create trigger streets_notify
+    after insert or update or delete or truncate on streets
+    for each statement execute function notify_reference_changed();
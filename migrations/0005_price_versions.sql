@@ -0,0 +1,42 @@
+-- migrations/0005_price_versions.sql
+-- Версии прайса: каждое изменение services сохраняет снимок активного каталога
+-- и рассылает NOTIFY price_changed (src/services/pricing.py)
+create table if not exists price_versions (
+    version serial primary key,
+    catalogue jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+create or replace function snapshot_price_version() returns trigger as $$
+declare
+    new_version int;
+begin
+    insert into price_versions (catalogue)
+    select coalesce(
+        jsonb_agg(jsonb_build_object('slug', slug, 'name', name, 'price_rub', price_rub) order by id),
+        '[]'::jsonb
+    )
+    from services
+    where is_active
+    returning version into new_version;
+
+    perform pg_notify('price_changed', new_version::text);
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists services_price_version on services;
+create trigger services_price_version
+    after insert or update or delete or truncate on services
+    for each statement execute function snapshot_price_version();
+
+-- первая версия из текущего каталога
+insert into price_versions (catalogue)
+select coalesce(
+    jsonb_agg(jsonb_build_object('slug', slug, 'name', name, 'price_rub', price_rub) order by id),
+    '[]'::jsonb
+)
+from services
+where is_active and not exists (select 1 from price_versions);
+
+alter table orders add column if not exists price_version int references price_versions(version);
@@ -0,0 +1,30 @@
+-- migrations/0006_order_items.sql
+-- Пакеты заказа: у каждого свой вес и свои доп. опции.
+-- В orders остаются денормализованные итоги (bags_count, weight_kg, флаги — объединение опций),
+-- поэтому списки заказов пакеты не джойнят.
+create table if not exists order_items (
+    id bigserial primary key,
+    order_id bigint not null references orders(id) on delete cascade,
+    position int not null,
+
+    weight_kg int not null default 3 check (weight_kg > 0),
+    ironing boolean not null default false,
+    conditioner boolean not null default false,
+    vacuum_pack boolean not null default false,
+    uv boolean not null default false,
+    wash_bag boolean not null default false,
+
+    price_rub int not null,
+
+    unique (order_id, position)
+);
+
+alter table orders add column if not exists bags_count int not null default 1;
+
+-- старые заказы — один пакет с опциями заказа
+insert into order_items (order_id, position, weight_kg, ironing, conditioner, vacuum_pack, uv, wash_bag, price_rub)
+select o.id, 1, coalesce(o.weight_kg, 3),
+       coalesce(o.ironing, false), coalesce(o.conditioner, false), coalesce(o.vacuum_pack, false),
+       coalesce(o.uv, false), coalesce(o.wash_bag, false), o.total_price_rub
+from orders o
+where not exists (select 1 from order_items i where i.order_id = o.id);
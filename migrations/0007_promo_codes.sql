@@ -0,0 +1,90 @@
+-- migrations/0007_promo_codes.sql
+-- Промокоды (src/services/promo.py): погашение привязано к адресу, а не к телефону
+
+-- promo_code_uses: суррогатный ключ (для ORM) и адрес погашения
+alter table promo_code_uses add column if not exists id bigserial;
+alter table promo_code_uses add column if not exists street_id int references streets(id);
+alter table promo_code_uses add column if not exists house_key text;
+alter table promo_code_uses add column if not exists apartment int;
+
+update promo_code_uses u
+set street_id = o.street_id,
+    house_key = lower(regexp_replace(o.house, '\s', '', 'g')),
+    apartment = o.apartment
+from orders o
+where u.order_id = o.id and u.house_key is null;
+
+do $$
+begin
+    if exists (
+        select 1 from pg_constraint
+        where conrelid = 'promo_code_uses'::regclass and contype = 'p' and conname = 'promo_code_uses_pkey'
+          and array_length(conkey, 1) = 2
+    ) then
+        alter table promo_code_uses drop constraint promo_code_uses_pkey;
+        alter table promo_code_uses add primary key (id);
+    end if;
+end;
+$$;
+
+-- один код — один раз на клиента и один раз на квартиру;
+-- nulls not distinct (PG 15+): адрес без улицы тоже погашается один раз
+create unique index if not exists promo_code_uses_client_uniq
+    on promo_code_uses (promo_code_id, client_id);
+create unique index if not exists promo_code_uses_address_uniq
+    on promo_code_uses (promo_code_id, street_id, house_key, apartment) nulls not distinct;
+-- «какие скидки уже получал этот адрес»
+create index if not exists promo_code_uses_address_idx
+    on promo_code_uses (street_id, house_key, apartment);
+
+alter table orders add column if not exists promo_code_id int references promo_codes(id);
+alter table orders add column if not exists discount_rub int not null default 0;
+
+-- Коды храним в верхнем регистре: поиск идёт по уникальному индексу без upper().
+-- Коды, которые отличаются только регистром, после upper() совпали бы. Остаётся один —
+-- уже записанный в верхнем регистре, иначе самый старый. Неиспользованные дубли удаляем,
+-- погашенные переименовываем в КОД#id и закрываем: история погашений не теряется
+create temporary view promo_code_dups as
+select id
+from (
+    select id, row_number() over (partition by upper(code) order by code = upper(code) desc, id) as rank
+    from promo_codes
+) ranked
+where rank > 1;
+
+delete from promo_codes p
+using promo_code_dups d
+where p.id = d.id
+  and not exists (select 1 from promo_code_uses u where u.promo_code_id = p.id)
+  and not exists (select 1 from orders o where o.promo_code_id = p.id);
+
+update promo_codes p
+set code = upper(p.code) || '#' || p.id,
+    valid_until = least(p.valid_until, now())
+from promo_code_dups d
+where p.id = d.id;
+
+drop view promo_code_dups;
+
+update promo_codes set code = upper(code) where code <> upper(code);
+
+-- Кэш кодов в процессах бота сбрасывается по NOTIFY; погашения (used_count) его не трогают
+create or replace function notify_promo_changed() returns trigger as $$
+begin
+    if tg_op = 'DELETE' then
+        perform pg_notify('promo_changed', old.code);
+    else
+        perform pg_notify('promo_changed', new.code);
+        if tg_op = 'UPDATE' and old.code <> new.code then
+            perform pg_notify('promo_changed', old.code);
+        end if;
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists promo_codes_notify on promo_codes;
+create trigger promo_codes_notify
+    after insert or delete or update of code, discount_rub, discount_percent, usage_limit, valid_until
+    on promo_codes
+    for each row execute function notify_promo_changed();
@@ -0,0 +1,41 @@
+-- migrations/0008_geodata.sql
+-- Зона обслуживания (src/services/service_area.py): точки стирки с радиусом и дома с координатами.
+-- Данные загружаются из файлов: python -m src.geo_import
+create table if not exists laundry_points (
+    id serial primary key,
+    name text not null unique,
+    lat double precision not null,
+    lon double precision not null,
+    radius_m int not null check (radius_m > 0),
+    is_active boolean not null default true
+);
+
+create table if not exists buildings (
+    id bigserial primary key,
+    street_id int not null references streets(id),
+    house text not null,  -- нормализованный номер дома
+    lat double precision not null,
+    lon double precision not null,
+    unique (street_id, house)
+);
+
+alter table clients add column if not exists laundry_point_id int references laundry_points(id);
+alter table orders add column if not exists laundry_point_id int references laundry_points(id);
+
+-- Процессы бота держат зону в памяти и перечитывают её по NOTIFY
+create or replace function notify_geodata_changed() returns trigger as $$
+begin
+    perform pg_notify('geodata_changed', tg_table_name);
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists laundry_points_notify on laundry_points;
+create trigger laundry_points_notify
+    after insert or update or delete or truncate on laundry_points
+    for each statement execute function notify_geodata_changed();
+
+drop trigger if exists buildings_notify on buildings;
+create trigger buildings_notify
+    after insert or update or delete or truncate on buildings
+    for each statement execute function notify_geodata_changed();
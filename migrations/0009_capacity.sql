@@ -0,0 +1,46 @@
+-- migrations/0009_capacity.sql
+-- Мощности точек стирки и брони под заказы (src/services/capacity.py)
+alter table laundry_points add column if not exists machines int not null default 4;
+alter table laundry_points add column if not exists dryers int not null default 4;
+alter table laundry_points add column if not exists ironers int not null default 1;
+alter table laundry_points add column if not exists wash_minutes int not null default 60;
+alter table laundry_points add column if not exists dry_minutes int not null default 90;
+alter table laundry_points add column if not exists iron_minutes int not null default 20;
+-- 0 минут — этапа на точке нет (например, без сушки); стирка есть всегда
+alter table laundry_points drop constraint if exists laundry_points_stage_minutes_check;
+alter table laundry_points add constraint laundry_points_stage_minutes_check
+    check (wash_minutes > 0 and dry_minutes >= 0 and iron_minutes >= 0);
+-- часы работы, местное время (CAPACITY_TIMEZONE)
+alter table laundry_points add column if not exists opens_hour smallint not null default 8;
+alter table laundry_points add column if not exists closes_hour smallint not null default 22;
+-- счётчик бронирований: UPDATE строки точки сериализует бронирования между процессами
+alter table laundry_points add column if not exists capacity_version int not null default 0;
+
+create table if not exists capacity_reservations (
+    id bigserial primary key,
+    laundry_point_id int not null references laundry_points(id),
+    order_id bigint not null references orders(id) on delete cascade,
+    resource text not null,  -- machines | dryers | ironers
+    units int not null check (units > 0),
+    start_at timestamptz not null,
+    end_at timestamptz not null check (end_at > start_at)
+);
+
+-- загрузка броней точки на горизонт планирования и снятие брони заказа
+create index if not exists capacity_reservations_point_end_idx
+    on capacity_reservations (laundry_point_id, end_at);
+create index if not exists capacity_reservations_order_idx
+    on capacity_reservations (order_id);
+
+-- Бронирование меняет только capacity_version: зону и расписания из-за этого не перечитываем
+drop trigger if exists laundry_points_notify on laundry_points;
+create trigger laundry_points_notify
+    after insert or delete or truncate on laundry_points
+    for each statement execute function notify_geodata_changed();
+
+drop trigger if exists laundry_points_update_notify on laundry_points;
+create trigger laundry_points_update_notify
+    after update on laundry_points
+    for each row
+    when ((old.*) is distinct from (new.*) and old.capacity_version = new.capacity_version)
+    execute function notify_geodata_changed();
@@ -0,0 +1,23 @@
+-- migrations/0010_workers.sql
+-- Работники (курьеры, точка стирки) отмечают статусы через бота, фото — в хранилище по sha256
+create table if not exists workers (
+    id serial primary key,
+    telegram_id bigint not null unique,
+    name text not null,
+    is_active boolean not null default true,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists order_photos (
+    id bigserial primary key,
+    order_id bigint not null references orders(id) on delete cascade,
+    history_id bigint references order_status_history(id) on delete set null,
+    worker_id int references workers(id),
+    storage_key text not null,  -- ab/cd/<sha256>.jpg
+    sha256 char(64) not null,
+    size_bytes bigint not null,
+    content_type text not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists order_photos_order_idx on order_photos (order_id);
@@ -0,0 +1,10 @@
+-- migrations/0011_late_payments.sql
+-- Деньги за уже отменённый заказ (оплата пришла после отмены): refund_pending, пока
+-- сверщик оплат (src/services/payment_sweeper.py) не вернёт их через провайдера, затем refunded
+alter table orders drop constraint if exists orders_payment_status_check;
+alter table orders add constraint orders_payment_status_check
+    check (payment_status in ('pending', 'waiting_for_capture', 'succeeded', 'canceled', 'refund_pending', 'refunded'));
+
+create index if not exists orders_refund_pending_idx
+    on orders (id)
+    where payment_status = 'refund_pending';
@@ -0,0 +1,18 @@
+-- migrations/0012_invoice_notify.sql
+-- Неоплаченные счета Telegram живут в памяти каждого процесса бота (src/services/payments.py).
+-- Когда оплата заказа завершилась или отменена — в любом процессе, вебхуком или сверщиком
+-- оплат, — счёт убирается из кэшей всех процессов по NOTIFY с id заказа.
+create or replace function notify_invoice_closed() returns trigger as $$
+begin
+    perform pg_notify('invoice_closed', new.id::text);
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists orders_invoice_closed_notify on orders;
+create trigger orders_invoice_closed_notify
+    after update of payment_status on orders
+    for each row
+    when (old.payment_status in ('pending', 'waiting_for_capture')
+          and new.payment_status not in ('pending', 'waiting_for_capture'))
+    execute function notify_invoice_closed();
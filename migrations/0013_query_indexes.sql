@@ -0,0 +1,46 @@
+-- migrate: no-transaction
+-- migrations/0013_query_indexes.sql
+-- Индексы под запросы, которые реально делает бот (src/repositories.py, src/services/*, src/devtools.py).
+-- До них каждый такой запрос, каскадное удаление заказа и проверка FK при удалении клиента
+-- читали таблицы целиком.
+--
+-- concurrently — чтобы не блокировать запись в orders на время построения, поэтому без транзакции.
+-- Если построение прервалось, Postgres оставляет индекс невалидным и `if not exists` его пропустит:
+--   select indexrelid::regclass from pg_index where not indisvalid
+-- такой индекс удалить (drop index concurrently ...) и запустить миграции ещё раз.
+
+-- история и заказы клиента; FK без индекса — полный проход orders на каждого удаляемого клиента
+create index concurrently if not exists orders_client_idx on orders (client_id);
+
+-- списки по статусам (/work, рейсы курьеров) упорядочены по id
+create index concurrently if not exists orders_status_idx on orders (status_id, id);
+
+-- выборки по периоду и keyset-проходы
+create index concurrently if not exists orders_created_at_idx on orders (created_at, id);
+
+-- синхронизация с Kaiten ищет заказы по карточкам; у заказа без карточки искать нечего
+create index concurrently if not exists orders_kaiten_card_idx on orders (kaiten_card_id)
+    where kaiten_card_id is not null;
+
+-- вебхук ЮKassa находит заказ по платежу
+create index concurrently if not exists orders_payment_idx on orders (payment_id)
+    where payment_id is not null;
+
+-- сверка зависших оплат (src/services/payment_sweeper.py) идёт по незавершённым оплатам
+-- в порядке (created_at, id); в частичном индексе только они — несколько сотен строк
+create index concurrently if not exists orders_open_payment_idx on orders (created_at, id)
+    where payment_status in ('pending', 'waiting_for_capture');
+
+-- история заказа и каскадное удаление
+create index concurrently if not exists order_status_history_order_idx on order_status_history (order_id, id);
+
+-- каскадное удаление заказа и проверка FK promo_code_uses.order_id
+create index concurrently if not exists kaiten_outbox_order_idx on kaiten_outbox (order_id);
+create index concurrently if not exists promo_code_uses_order_idx on promo_code_uses (order_id)
+    where order_id is not null;
+
+-- devtools ищет тестовые данные по метке в комментарии: like '%[TEST]%' и like '[TEST]%'.
+-- B-tree такой like не ускоряет, триграммы — да
+create extension if not exists pg_trgm;
+create index concurrently if not exists orders_comment_trgm_idx on orders using gin (comment gin_trgm_ops);
+create index concurrently if not exists clients_comment_trgm_idx on clients using gin (comment gin_trgm_ops);
@@ -0,0 +1,11 @@
+-- migrations/0014_promo_release_notify.sql
+-- Отмена заказа возвращает погашение промокода (PromoCodes.release_many): used_count
+-- уменьшается, и исчерпанный код снова действует. Процессы бота помнят исчерпанные коды —
+-- уменьшение счётчика рассылает тот же NOTIFY promo_changed, что и правка кода.
+-- Погашения (увеличение used_count) по-прежнему ничего не рассылают.
+drop trigger if exists promo_codes_release_notify on promo_codes;
+create trigger promo_codes_release_notify
+    after update of used_count on promo_codes
+    for each row
+    when (new.used_count < old.used_count)
+    execute function notify_promo_changed();
@@ -0,0 +1,66 @@
+# src/announce.py
+"""
+Объявление клиентам (например, «завтра на Ленина, 5 не работает лифт — курьер задержится»).
+
+    python -m src.announce all ТЕКСТ
+    python -m src.announce street "НАЗВАНИЕ УЛИЦЫ" ТЕКСТ
+
+Отправка — через NotificationDispatcher в пределах лимитов Bot API (NOTIFY_*),
+так что запускать можно рядом с работающим ботом: лимиты у них общие на токен,
+поэтому на время рассылки стоит уменьшить NOTIFY_GLOBAL_RATE.
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from src.bot.notifications import Notification, NotificationDispatcher
+from src.bot.settings import NotificationSettings, tg_settings
+from src.database import init_db, close_db
+from src.repositories import Repository
+from src.services.reference_cache import reference_cache
+
+
+async def main() -> None:
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if (command == "all" and len(sys.argv) < 3) or (command == "street" and len(sys.argv) < 4) \
+            or command not in ("all", "street"):
+        print(__doc__)
+        return
+
+    await init_db()
+    try:
+        street_id = reference_cache.street(sys.argv[2]).id if command == "street" else None
+        text = " ".join(sys.argv[3 if command == "street" else 2:])
+        chat_ids = await Repository.get_client_chat_ids(street_id)
+    finally:
+        await close_db()
+
+    print(f"Получателей: {len(chat_ids)}")
+    settings = NotificationSettings()
+    bot = Bot(
+        tg_settings.BOT_TOKEN,
+        request=HTTPXRequest(connection_pool_size=settings.PARALLELISM),
+        **({"base_url": tg_settings.BOT_API_URL} if tg_settings.BOT_API_URL else {}),
+    )
+    async with bot:
+        dispatcher = NotificationDispatcher(bot, settings)
+        dispatcher.start()
+        started = time.perf_counter()
+        try:
+            dispatcher.submit_many([Notification(chat_id=chat_id, text=text) for chat_id in chat_ids])
+            await dispatcher.join()
+        finally:
+            await dispatcher.stop()
+
+    metrics = dispatcher.metrics()
+    print(f"Отправлено: {metrics.sent_total}, не доставлено: {metrics.failed_total}, "
+          f"429: {metrics.throttled_total}, за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+from fastapi import FastAPI
+from telegram.ext import Application
+
+from src.api import kaiten, payments, telegram
+from src.bot.status_messages import StatusMessageQueue
+from src.bot.update_inbox import UpdateInbox
+from src.services.kaiten_mirror import KaitenBoardMirror
+from src.settings import PaymentSettings
+
+
+def create_api(
+        kaiten_mirror: KaitenBoardMirror | None = None,
+        telegram_app: Application | None = None,
+        telegram_secret: str | None = None,
+        update_inbox: UpdateInbox | None = None,
+        status_messages: StatusMessageQueue | None = None,
+        payment_settings: PaymentSettings | None = None,
+) -> FastAPI:
+    """
+    HTTP-часть бота. Живёт в том же процессе и event loop, что и Telegram-бот,
+    поэтому сервисы передаются сюда готовыми объектами через app.state.
+    """
+    api = FastAPI(title="stirki", docs_url=None, redoc_url=None)
+
+    if kaiten_mirror is not None:
+        api.state.kaiten_mirror = kaiten_mirror
+        api.include_router(kaiten.router)
+
+    if telegram_app is not None:
+        api.state.telegram_app = telegram_app
+        api.state.telegram_secret = telegram_secret
+        api.state.update_inbox = update_inbox
+        api.include_router(telegram.router)
+
+    payment_settings = payment_settings or PaymentSettings()
+    if payment_settings.WEBHOOK_SECRET:
+        api.state.payment_settings = payment_settings
+        api.state.status_messages = status_messages
+        api.include_router(payments.router)
+
+    @api.get("/health")
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    return api
@@ -0,0 +1,43 @@
+import hmac
+import logging
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request
+
+from src.services.kaiten_mirror import KaitenBoardMirror
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/kaiten", tags=["kaiten"])
+
+
+def _extract_card(payload: dict[str, Any]) -> dict[str, Any] | None:
+    """Kaiten кладёт карточку то в data.card, то прямо в data — принимаем оба варианта."""
+    data = payload.get("data", payload)
+    card = data.get("card", data) if isinstance(data, dict) else None
+    if isinstance(card, dict) and "id" in card:
+        return card
+    return None
+
+
+@router.post("/webhook/{secret}")
+async def kaiten_webhook(secret: str, request: Request) -> dict[str, str]:
+    mirror: KaitenBoardMirror = request.app.state.kaiten_mirror
+
+    expected = mirror.kaiten.settings.WEBHOOK_SECRET
+    # сравнение за постоянное время: по задержке ответа секрет не подобрать
+    if not expected or not hmac.compare_digest(secret.encode(), expected.encode()):
+        raise HTTPException(status_code=404)
+
+    payload = await request.json()
+    card = _extract_card(payload)
+    if card is None:
+        return {"status": "ignored"}
+
+    event = str(payload.get("event", ""))
+    if event.endswith("delete") or event.endswith("remove"):
+        mirror.remove_card(int(card["id"]))
+    else:
+        mirror.apply_card(card)
+
+    return {"status": "ok"}
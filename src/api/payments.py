@@ -0,0 +1,88 @@
+import hmac
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request
+
+from src.enums import PaymentStatus
+from src.models import Order
+from src.repositories import Repository
+from src.services.payments import invoice_cache
+from src.services.status_sync import StatusChange
+from src.settings import PaymentSettings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/payments", tags=["payments"])
+
+# события ЮKassa → статус оплаты заказа; остальные (refund.* и т.п.) пока не обрабатываются
+YOOKASSA_EVENTS = {
+    "payment.waiting_for_capture": PaymentStatus.WAITING_FOR_CAPTURE,
+    "payment.succeeded": PaymentStatus.SUCCEEDED,
+    "payment.canceled": PaymentStatus.CANCELED,
+}
+
+
+async def _find_order(payment: dict[str, Any]) -> tuple[int, int] | None:
+    """(id заказа, сумма в копейках): по metadata.order_id, иначе по id платежа (оплата через Telegram)."""
+    metadata = payment.get("metadata") or {}
+    query = Order.filter(id=int(metadata["order_id"])) if str(metadata.get("order_id", "")).isdigit() \
+        else Order.filter(payment_id=str(payment.get("id")))
+    row = await query.first().values_list("id", "total_price_rub")
+    return (row[0], row[1] * 100) if row else None
+
+
+def _amount_kopecks(payment: dict[str, Any]) -> int | None:
+    try:
+        return int(Decimal(str(payment["amount"]["value"])) * 100)
+    except (KeyError, TypeError, InvalidOperation):
+        return None
+
+
+@router.post("/yookassa/{secret}")
+async def yookassa_webhook(secret: str, request: Request) -> dict[str, str]:
+    """
+    Уведомления ЮKassa. Отвечаем 200 на всё, что разобрали, даже на повторы — иначе ЮKassa
+    будет слать то же уведомление сутки. Повторы безопасны: Repository.update_payment_status
+    меняет статус только из незавершённого, а оплату отменённого заказа ставит на возврат.
+
+    Платёж, заказ которого не нашёлся, — 503: при оплате счётом Telegram id платежа
+    записывает successful_payment, и уведомление может его обогнать. ЮKassa повторит
+    уведомление позже, когда заказ уже будет знать свой платёж.
+    """
+    settings: PaymentSettings = request.app.state.payment_settings
+    # сравнение за постоянное время: по задержке ответа секрет не подобрать
+    if not settings.WEBHOOK_SECRET or not hmac.compare_digest(secret.encode(), settings.WEBHOOK_SECRET.encode()):
+        raise HTTPException(status_code=404)
+
+    payload = await request.json()
+    status = YOOKASSA_EVENTS.get(str(payload.get("event", "")))
+    payment = payload.get("object")
+    if status is None or not isinstance(payment, dict):
+        return {"status": "ignored"}
+
+    found = await _find_order(payment)
+    if found is None:
+        logger.warning(f"YooKassa: payment {payment.get('id')} for unknown order, asking to retry")
+        raise HTTPException(status_code=503, detail="order not found yet")
+    order_id, expected = found
+
+    if status == PaymentStatus.SUCCEEDED and _amount_kopecks(payment) != expected:
+        logger.error(f"YooKassa: payment {payment.get('id')} amount {payment.get('amount')} "
+                     f"does not match order {order_id} ({expected} kopecks)")
+        return {"status": "amount_mismatch"}
+
+    if status != PaymentStatus.WAITING_FOR_CAPTURE:
+        invoice_cache.discard(order_id)
+
+    order = await Repository.update_payment_status(order_id, status, payment_id=str(payment.get("id")), changed_by="yookassa")
+    if order is None:
+        return {"status": "duplicate"}
+
+    messages = request.app.state.status_messages
+    if messages is not None and status != PaymentStatus.WAITING_FOR_CAPTURE:
+        await messages.put_many([StatusChange(
+            order.id, Repository.get_status_name(order.status_id), order.telegram_chat_id, order.telegram_message_id,
+        )])
+    return {"status": "ok"}
@@ -0,0 +1,32 @@
+import asyncio
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI
+
+
+class _EmbeddedServer(uvicorn.Server):
+    """uvicorn внутри чужого event loop: сигналы остаются за Telegram Application."""
+
+    def install_signal_handlers(self) -> None:
+        pass
+
+    @contextmanager
+    def capture_signals(self):
+        yield
+
+
+class ApiServer:
+    def __init__(self, api: FastAPI, host: str, port: int, log_level: str = "info"):
+        self.server = _EmbeddedServer(uvicorn.Config(api, host=host, port=port, log_level=log_level))
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self.server.serve(), name="api-server")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self.server.should_exit = True
+        await self._task
+        self._task = None
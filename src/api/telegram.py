@@ -0,0 +1,35 @@
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from telegram import Update
+from telegram.ext import Application
+
+router = APIRouter(prefix="/telegram", tags=["telegram"])
+
+WEBHOOK_PATH = "/telegram/webhook"
+
+
+@router.post("/webhook")
+async def telegram_webhook(
+        request: Request,
+        x_telegram_bot_api_secret_token: str | None = Header(default=None),
+) -> dict[str, str]:
+    application: Application = request.app.state.telegram_app
+
+    expected = request.app.state.telegram_secret
+    if expected and not hmac.compare_digest((x_telegram_bot_api_secret_token or "").encode(), expected.encode()):
+        raise HTTPException(status_code=403)
+
+    data = await request.json()
+
+    # Несколько воркеров: апдейт уходит в общую таблицу, обработает владелец пользователя
+    inbox = request.app.state.update_inbox
+    if inbox is not None:
+        await inbox.put(data)
+        return {"status": "ok"}
+
+    # Только кладём в очередь: Telegram получает 200 сразу,
+    # а обработку параллелит PerUserUpdateProcessor
+    update = Update.de_json(data, application.bot)
+    await application.update_queue.put(update)
+    return {"status": "ok"}
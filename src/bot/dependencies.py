@@ -0,0 +1,242 @@
+from telegram.ext import Application, ContextTypes
+
+from src.settings import ApiSettings
+from src.bot.settings import NotificationSettings, tg_settings
+from src.api.app import create_api
+from src.api.server import ApiServer
+from src.bot.update_inbox import UpdateInbox
+from src.services.kaiten_kanban import AsyncKaiten
+from src.services.kaiten_mirror import KaitenBoardMirror
+from src.services.status_sync import StatusSyncEngine
+from src.bot.status_messages import StatusMessageQueue
+from src.bot.notifications import Notification, NotificationDispatcher
+from src.services.kaiten_outbox import KaitenOutboxWorker
+from src.services.kaiten_scheduler import KaitenWriteScheduler
+from src.services.photo_storage import TelegramPhotoUploader, build_photo_uploader
+from src.services.payment_sweeper import PaymentSweeper, build_payment_provider
+
+# Ключи общих зависимостей в application.bot_data.
+# Заполняются в src/bot/main.on_startup и живут всё время работы бота.
+KAITEN_KEY = "kaiten"
+KAITEN_SCHEDULER_KEY = "kaiten_scheduler"
+OUTBOX_WORKER_KEY = "kaiten_outbox_worker"
+KAITEN_MIRROR_KEY = "kaiten_mirror"
+STATUS_SYNC_KEY = "status_sync"
+STATUS_MESSAGES_KEY = "status_messages"
+API_SERVER_KEY = "api_server"
+UPDATE_INBOX_KEY = "update_inbox"
+PHOTO_UPLOADER_KEY = "photo_uploader"
+NOTIFICATIONS_KEY = "notifications"
+PAYMENT_SWEEPER_KEY = "payment_sweeper"
+
+
+def get_kaiten(context: ContextTypes.DEFAULT_TYPE) -> AsyncKaiten:
+    return context.bot_data[KAITEN_KEY]
+
+
+async def setup_kaiten(app: Application) -> AsyncKaiten:
+    kaiten = AsyncKaiten()
+    app.bot_data[KAITEN_KEY] = kaiten
+    return kaiten
+
+
+async def close_kaiten(app: Application) -> None:
+    kaiten: AsyncKaiten | None = app.bot_data.pop(KAITEN_KEY, None)
+    if kaiten is not None:
+        await kaiten.close()
+
+
+def get_kaiten_scheduler(context: ContextTypes.DEFAULT_TYPE) -> KaitenWriteScheduler:
+    return context.bot_data[KAITEN_SCHEDULER_KEY]
+
+
+async def setup_outbox_worker(app: Application) -> KaitenOutboxWorker | None:
+    if not tg_settings.RUNS_BACKGROUND_JOBS:
+        return None
+
+    kaiten: AsyncKaiten = app.bot_data[KAITEN_KEY]
+
+    scheduler = KaitenWriteScheduler(
+        kaiten,
+        rate=kaiten.settings.RATE_LIMIT,
+        burst=kaiten.settings.RATE_BURST,
+        parallelism=kaiten.settings.PARALLELISM,
+    )
+    scheduler.start()
+    app.bot_data[KAITEN_SCHEDULER_KEY] = scheduler
+
+    worker = KaitenOutboxWorker(
+        kaiten,
+        scheduler,
+        batch_size=kaiten.settings.OUTBOX_BATCH_SIZE,
+        poll_interval=kaiten.settings.OUTBOX_POLL_INTERVAL,
+        max_attempts=kaiten.settings.OUTBOX_MAX_ATTEMPTS,
+        lease=kaiten.settings.OUTBOX_LEASE,
+    )
+    worker.start()
+    app.bot_data[OUTBOX_WORKER_KEY] = worker
+    return worker
+
+
+async def close_outbox_worker(app: Application) -> None:
+    worker: KaitenOutboxWorker | None = app.bot_data.pop(OUTBOX_WORKER_KEY, None)
+    if worker is not None:
+        await worker.stop()
+
+    scheduler: KaitenWriteScheduler | None = app.bot_data.pop(KAITEN_SCHEDULER_KEY, None)
+    if scheduler is not None:
+        await scheduler.stop()
+
+
+def get_notifications(context: ContextTypes.DEFAULT_TYPE) -> NotificationDispatcher:
+    return context.bot_data[NOTIFICATIONS_KEY]
+
+
+async def setup_notifications(app: Application) -> NotificationDispatcher:
+    dispatcher = NotificationDispatcher(app.bot, NotificationSettings().per_worker(tg_settings.WORKER_COUNT))
+    dispatcher.start()
+    app.bot_data[NOTIFICATIONS_KEY] = dispatcher
+    return dispatcher
+
+
+async def close_notifications(app: Application) -> None:
+    dispatcher: NotificationDispatcher | None = app.bot_data.pop(NOTIFICATIONS_KEY, None)
+    if dispatcher is not None:
+        await dispatcher.stop()
+
+
+async def setup_status_sync(app: Application) -> StatusSyncEngine | None:
+    # очередь статусных сообщений нужна каждому воркеру: её пополняют обработчики
+    messages = StatusMessageQueue(app.bot_data[NOTIFICATIONS_KEY])
+    app.bot_data[STATUS_MESSAGES_KEY] = messages
+
+    # переносы на доске разбирает один воркер, рядом со своим outbox-планировщиком
+    if not tg_settings.RUNS_BACKGROUND_JOBS:
+        return None
+
+    scheduler: KaitenWriteScheduler = app.bot_data[KAITEN_SCHEDULER_KEY]
+    engine = StatusSyncEngine(scheduler.recent_moves, notify=messages.put_many)
+    engine.start()
+    app.bot_data[STATUS_SYNC_KEY] = engine
+    return engine
+
+
+async def close_status_sync(app: Application) -> None:
+    engine: StatusSyncEngine | None = app.bot_data.pop(STATUS_SYNC_KEY, None)
+    if engine is not None:
+        await engine.stop()
+
+    messages: StatusMessageQueue | None = app.bot_data.pop(STATUS_MESSAGES_KEY, None)
+    if messages is not None:
+        messages.stop()
+
+
+def get_status_messages(context: ContextTypes.DEFAULT_TYPE) -> StatusMessageQueue | None:
+    return context.bot_data.get(STATUS_MESSAGES_KEY)
+
+
+def get_kaiten_mirror(context: ContextTypes.DEFAULT_TYPE) -> KaitenBoardMirror:
+    return context.bot_data[KAITEN_MIRROR_KEY]
+
+
+async def setup_kaiten_mirror(app: Application) -> KaitenBoardMirror | None:
+    if not tg_settings.RUNS_BACKGROUND_JOBS:
+        return None
+
+    kaiten: AsyncKaiten = app.bot_data[KAITEN_KEY]
+    mirror = KaitenBoardMirror(kaiten, poll_interval=kaiten.settings.MIRROR_POLL_INTERVAL)
+
+    # Подписываемся до старта: начальный опрос подтянет переносы, сделанные, пока бот лежал
+    engine: StatusSyncEngine | None = app.bot_data.get(STATUS_SYNC_KEY)
+    if engine is not None:
+        mirror.subscribe(engine.on_card_changed)
+
+    await mirror.start()
+    app.bot_data[KAITEN_MIRROR_KEY] = mirror
+    return mirror
+
+
+async def close_kaiten_mirror(app: Application) -> None:
+    mirror: KaitenBoardMirror | None = app.bot_data.pop(KAITEN_MIRROR_KEY, None)
+    if mirror is not None:
+        await mirror.stop()
+
+
+async def setup_api(app: Application) -> ApiServer | None:
+    settings = ApiSettings()
+    webhook = tg_settings.BOT_MODE == "webhook"
+    if not settings.ENABLED and not webhook:
+        return None
+
+    api = create_api(
+        kaiten_mirror=app.bot_data.get(KAITEN_MIRROR_KEY),
+        telegram_app=app if webhook else None,
+        telegram_secret=tg_settings.WEBHOOK_SECRET,
+        update_inbox=app.bot_data.get(UPDATE_INBOX_KEY),
+        status_messages=app.bot_data.get(STATUS_MESSAGES_KEY),
+    )
+    server = ApiServer(api, settings.HOST, settings.PORT)
+    await server.start()
+    app.bot_data[API_SERVER_KEY] = server
+    return server
+
+
+async def close_api(app: Application) -> None:
+    server: ApiServer | None = app.bot_data.pop(API_SERVER_KEY, None)
+    if server is not None:
+        await server.stop()
+
+
+async def setup_update_inbox(app: Application) -> UpdateInbox | None:
+    if not tg_settings.USE_UPDATE_INBOX:
+        return None
+
+    inbox = UpdateInbox(app, tg_settings.WORKER_INDEX, tg_settings.WORKER_COUNT)
+    await inbox.start()
+    app.bot_data[UPDATE_INBOX_KEY] = inbox
+    return inbox
+
+
+async def close_update_inbox(app: Application) -> None:
+    inbox: UpdateInbox | None = app.bot_data.pop(UPDATE_INBOX_KEY, None)
+    if inbox is not None:
+        await inbox.stop()
+
+
+def get_photo_uploader(context: ContextTypes.DEFAULT_TYPE) -> TelegramPhotoUploader:
+    return context.bot_data[PHOTO_UPLOADER_KEY]
+
+
+async def setup_photo_uploader(app: Application) -> TelegramPhotoUploader:
+    uploader = build_photo_uploader()
+    app.bot_data[PHOTO_UPLOADER_KEY] = uploader
+    return uploader
+
+
+async def close_photo_uploader(app: Application) -> None:
+    uploader: TelegramPhotoUploader | None = app.bot_data.pop(PHOTO_UPLOADER_KEY, None)
+    if uploader is not None:
+        await uploader.close()
+
+
+async def setup_payment_sweeper(app: Application) -> PaymentSweeper | None:
+    if not tg_settings.RUNS_BACKGROUND_JOBS:
+        return None
+
+    messages: StatusMessageQueue | None = app.bot_data.get(STATUS_MESSAGES_KEY)
+    dispatcher: NotificationDispatcher = app.bot_data[NOTIFICATIONS_KEY]
+    sweeper = PaymentSweeper(
+        build_payment_provider(),
+        notify=messages.put_many if messages is not None else None,
+        tell=lambda chat_id, text: dispatcher.submit(Notification(chat_id, text)),
+    )
+    sweeper.start()
+    app.bot_data[PAYMENT_SWEEPER_KEY] = sweeper
+    return sweeper
+
+
+async def close_payment_sweeper(app: Application) -> None:
+    sweeper: PaymentSweeper | None = app.bot_data.pop(PAYMENT_SWEEPER_KEY, None)
+    if sweeper is not None:
+        await sweeper.stop()
+        await sweeper.provider.close()
@@ -1,24 +1,77 @@
+from datetime import datetime, timezone
+
 from icecream import ic
 
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler
 
 from src.repositories import Repository
-from src.enums import PaymentStatus, OrderStatusName, ServiceCyrillic, ServiceSlug, ServiceCyrillicSlugMap
+from src.enums import PaymentStatus, ServiceSlug
 
 from src.bot.states import OrderStates
 from src.bot import texts
 from src.bot.keyboards import (
     phone_keyboard,
     streets_keyboard,
-    yes_no_keyboard,
+    houses_keyboard,
+    cancel_order_keyboard,
     confirm_keyboard,
     client_confirm_keyboard,
-    services_keyboard,
-    services_keyboard_compact
+    bags_keyboard,
+    bag_weight_keyboard,
+    delivery_times_keyboard,
+    MAX_BAGS,
+    BAG_WEIGHTS,
 )
+from src.bot.service_menu import service_menu, services_to_mask
+from src.bot.handlers.send_invoice import send_order_invoice
+from src.services.capacity import CapacityError, capacity_scheduler
+from src.services.pricing import BAG_WEIGHT_KG, Bag, Pricing
+from src.services.payments import invoice_cache
+from src.services.promo import Promo, PromoCodeError, promo_codes
+from src.services.address_index import normalize_house
+from src.services.reference_cache import reference_cache
+from src.services.service_area import service_area
+
+
+def _bags(context: ContextTypes.DEFAULT_TYPE) -> list[Bag]:
+    # диалоги, начатые до выбора пакетов, хранят одну маску на весь заказ, а до выбора веса — без весов
+    masks = context.user_data.get("bags") or [context.user_data.get("services_mask", 0)]
+    weights = context.user_data.get("bag_weights") or []
+    return [
+        Bag(mask=mask, weight_kg=weights[position] if position < len(weights) else BAG_WEIGHT_KG)
+        for position, mask in enumerate(masks)
+    ]
+
+
+EXACT_TIME_MASK = services_to_mask({ServiceSlug.EXACT_TIME: True})
+
 
-from src.services.pricing import Pricing
+def _delivery_at(context: ContextTypes.DEFAULT_TYPE) -> datetime | None:
+    # user_data хранится в JSON: время доставки — unix-секунды
+    timestamp = context.user_data.get("delivery_at")
+    return datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else None
+
+
+def _laundry_point_id(context: ContextTypes.DEFAULT_TYPE) -> int | None:
+    # клиент может быть ещё не сохранён: точку берём по адресу из диалога
+    street_id = context.user_data.get("street_id") or reference_cache.street(context.user_data["street"]).id
+    house = context.user_data["house"]
+    point = service_area.locate(street_id, normalize_house(house) or house)
+    return point.id if point else None
+
+
+def order_price_text(bags: list[Bag], promo: Promo | None = None, delivery_at: datetime | None = None) -> str:
+    snapshot = Pricing.current()
+
+    text = Pricing.bags_message(snapshot, bags)
+    if promo:
+        total = snapshot.quote(bags).total
+        discount = promo.discount(total)
+        text += f"Промокод {promo.code}: −{discount}\nК оплате: {total - discount}\n"
+    if delivery_at:
+        text += texts.DELIVERY_AT_TEXT.format(delivery=capacity_scheduler.local(delivery_at).strftime("%d.%m %H:%M"))
+    return text
 
 
 async def ask_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -68,15 +121,16 @@ async def client_confirm_ok(update: Update, context: ContextTypes.DEFAULT_TYPE):
         {
             "name": client.name,
             "phone": client.phone,
-            "street": street,
+            "street": street.name,  # user_data хранится в JSON, кладём только имя
             "house": client.house,
             "apartment": client.apartment,
             "entrance": client.entrance,
+            "street_id": street.id,
         }
     )
 
-    await query.message.reply_text( "Отлично! Теперь можете выбрать дополнительные услуги\n", reply_markup=services_keyboard())
-    return OrderStates.SELECT_SERVICES
+    await query.message.reply_text(f"Отлично!\n{texts.ASK_BAGS_TEXT}", reply_markup=bags_keyboard())
+    return OrderStates.GET_BAGS
 
 
 async def client_confirm_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -107,23 +161,66 @@ async def get_street(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    street_name = query.data.split('_')[1]
-    street_map = {
-        'nov': 'Новорождественская',
-        'mit': 'Мытищинская',
-    }
+    # улицы — из справочника в памяти (src/services/reference_cache.py)
+    street_id = query.data.split('_')[1]
+    street = reference_cache.street_by_id(int(street_id)) if street_id.isdigit() else None
+    if street is None:
+        # кнопка из старой или устаревшей клавиатуры
+        await query.edit_message_text(texts.ASK_STREET_TEXT, reply_markup=streets_keyboard())
+        return OrderStates.GET_STREET
 
-    context.user_data["street"] = street_map.get(street_name, 'Мытищинская')
+    context.user_data["street"] = street.name
+    context.user_data["street_id"] = street.id
     await query.edit_message_text(texts.ASK_HOUSE_TEXT)
     return OrderStates.GET_HOUSE
 
 
 async def get_house(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["house"] = update.message.text.strip()
-    await update.message.reply_text(texts.ASK_APARTMENT_TEXT)
+    text = update.message.text.strip()
+    house = normalize_house(text)
+
+    street_id = context.user_data.get("street_id")
+    if street_id is None:
+        street_id = reference_cache.street(context.user_data["street"]).id
+    addresses = reference_cache.addresses
+
+    if house is not None and (not addresses.has_houses(street_id) or addresses.contains(street_id, house)):
+        if not _in_service_area(street_id, house):
+            await update.message.reply_text(texts.OUT_OF_AREA_TEXT)
+            return OrderStates.GET_HOUSE
+
+        context.user_data["house"] = house
+        await update.message.reply_text(texts.ASK_APARTMENT_TEXT)
+        return OrderStates.GET_APARTMENT
+
+    suggestions = addresses.suggest(street_id, text)
+    if suggestions:
+        await update.message.reply_text(texts.HOUSE_SUGGEST_TEXT, reply_markup=houses_keyboard(suggestions))
+    else:
+        await update.message.reply_text(texts.HOUSE_UNKNOWN_TEXT)
+    return OrderStates.GET_HOUSE
+
+
+async def choose_house(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    house = query.data.split('_', 1)[1]
+    street_id = context.user_data.get("street_id") or reference_cache.street(context.user_data["street"]).id
+    if not _in_service_area(street_id, house):
+        await query.edit_message_text(texts.OUT_OF_AREA_TEXT)
+        return OrderStates.GET_HOUSE
+
+    context.user_data["house"] = house
+    await query.edit_message_text(texts.ASK_APARTMENT_TEXT)
     return OrderStates.GET_APARTMENT
 
 
+def _in_service_area(street_id: int, house: str) -> bool:
+    # пока точки стирки не заведены (src/services/service_area.py), принимаем любой дом
+    return not service_area.enabled or service_area.locate(street_id, house) is not None
+
+
 async def get_apartment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["apartment"] = update.message.text.strip()
     await update.message.reply_text(texts.ASK_ENTRANCE_TEXT)
@@ -133,61 +230,156 @@ async def get_apartment(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def get_entrance(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["entrance"] = update.message.text.strip()
 
-    await update.message.reply_text(texts.ASK_SERVICES, reply_markup=services_keyboard())
+    await update.message.reply_text(texts.ASK_BAGS_TEXT, reply_markup=bags_keyboard())
+    return OrderStates.GET_BAGS
+
+
+async def get_bags(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    count = min(max(int(query.data.split('_')[1]), 1), MAX_BAGS)
+
+    # маска доп. услуг и вес на каждый пакет; выбираем по очереди
+    context.user_data["bags"] = [0] * count
+    context.user_data["bag_weights"] = [BAG_WEIGHT_KG] * count
+    context.user_data["bag_index"] = 0
+    context.user_data.pop("delivery_at", None)
+
+    text = f"{texts.ASK_BAG_SERVICES_TEXT.format(position=1, count=count)}\n{texts.ASK_SERVICES}"
+    await query.message.reply_text(text, reply_markup=service_menu().keyboards[0])
     return OrderStates.SELECT_SERVICES
 
 
 async def select_services(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
-    services = context.user_data.get("services", {service: False for service in ServiceSlug})
 
+    # Тексты, суммы и клавиатуры посчитаны заранее на каждую комбинацию (src/bot/service_menu.py)
+    menu = service_menu()
+    bags = context.user_data.get("bags")
+    if not bags:
+        # диалог начат до выбора пакетов: одна маска на весь заказ
+        mask = context.user_data.get("services_mask")
+        if mask is None:
+            mask = services_to_mask(context.user_data.get("services", {}))
+        bags = [mask]
+    index = min(context.user_data.get("bag_index", 0), len(bags) - 1)
+    mask = bags[index] & menu.available_mask
 
     if "Готово" in text:
-        current_services_text = Pricing.total_price_message(services)
-        order_total_price = f"{current_services_text}\n\n"
+        bags[index] = mask
+        context.user_data["bags"] = bags
+        context.user_data["bag_index"] = index
 
-        confirm_text = texts.ORDER_CHECKUP_TEXT.format(
-            name=context.user_data["name"],
-            phone=context.user_data["phone"],
-            street=context.user_data["street"],
-            house=context.user_data["house"],
-            apartment=context.user_data["apartment"],
-            entrance=context.user_data["entrance"],
-            services=order_total_price,
+        await update.message.reply_text(
+            texts.ASK_BAG_WEIGHT_TEXT.format(position=index + 1), reply_markup=bag_weight_keyboard()
         )
+        return OrderStates.GET_BAG_WEIGHT
 
-        context.user_data['order_price'] = current_services_text
+    bit = menu.button_bits.get(text)
+    if bit is not None:
+        mask ^= bit
+        bags[index] = mask
+        context.user_data['bags'] = bags
 
-        await update.message.reply_text(confirm_text, reply_markup=ReplyKeyboardRemove())
-        await update.message.reply_text("Всё верно?\nПодтвердите заказ:", reply_markup=confirm_keyboard())
+        await update.message.reply_text(menu.services_texts[mask], reply_markup=menu.keyboards[mask])
 
-        return OrderStates.CONFIRM
 
-    if text in ServiceCyrillic:
-        services[ServiceCyrillicSlugMap[text]] = not services[ServiceCyrillicSlugMap[text]]
+    return OrderStates.SELECT_SERVICES
 
-        context.user_data['services'] = services
 
-        current_services_text = Pricing.services_price_message(services)
-        services_price = f"{current_services_text}\n\nПродолжайте выбор или нажмите «Готово»"
-        await update.message.reply_text(services_price, reply_markup=services_keyboard(services))
+async def get_bag_weight(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
 
+    weight = int(query.data.split('_')[1])
+    if weight not in BAG_WEIGHTS:
+        # кнопка из устаревшей клавиатуры
+        weight = BAG_WEIGHT_KG
 
-    return OrderStates.SELECT_SERVICES
+    bags = context.user_data.get("bags") or [context.user_data.get("services_mask", 0)]
+    weights = context.user_data.get("bag_weights") or [BAG_WEIGHT_KG] * len(bags)
+    index = min(context.user_data.get("bag_index", 0), len(bags) - 1)
+    weights[index] = weight
+    context.user_data["bags"] = bags
+    context.user_data["bag_weights"] = weights
+    await query.edit_message_text(texts.BAG_WEIGHT_TEXT.format(position=index + 1, weight=weight))
 
+    if index + 1 < len(bags):
+        # следующий пакет
+        context.user_data["bag_index"] = index + 1
+        menu = service_menu()
+        next_text = texts.ASK_BAG_SERVICES_TEXT.format(position=index + 2, count=len(bags))
+        await query.message.reply_text(next_text, reply_markup=menu.keyboards[bags[index + 1] & menu.available_mask])
+        return OrderStates.SELECT_SERVICES
 
-async def confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = texts.CONFIRM_TEXT.format(
+    context.user_data.pop("promo_code", None)
+    context.user_data.pop("delivery_at", None)
+
+    # «точное время»: предлагаем только окна, к которым точка стирки реально успеет
+    point_id = _laundry_point_id(context) if any(bag & EXACT_TIME_MASK for bag in bags) else None
+    if point_id:
+        return await _ask_delivery_time(query.message, point_id, _bags(context))
+
+    return await _send_checkup(query.message, context)
+
+
+async def _ask_delivery_time(message, point_id: int, bags: list[Bag], text: str = texts.ASK_DELIVERY_TIME_TEXT):
+    options = await capacity_scheduler.delivery_options(point_id, bags)
+    if not options:
+        await message.reply_text(texts.NO_CAPACITY_TEXT, reply_markup=ReplyKeyboardRemove())
+        return ConversationHandler.END
+
+    await message.reply_text(text, reply_markup=delivery_times_keyboard(options))
+    return OrderStates.SELECT_DELIVERY_TIME
+
+
+async def _send_checkup(message, context: ContextTypes.DEFAULT_TYPE):
+    current_services_text = order_price_text(_bags(context), delivery_at=_delivery_at(context))
+    order_total_price = f"{current_services_text}\n\n"
+
+    confirm_text = texts.ORDER_CHECKUP_TEXT.format(
         name=context.user_data["name"],
         phone=context.user_data["phone"],
         street=context.user_data["street"],
         house=context.user_data["house"],
         apartment=context.user_data["apartment"],
         entrance=context.user_data["entrance"],
-        services=context.user_data["order_price"],
+        services=order_total_price,
     )
 
-    await update.callback_query.edit_message_text(text, reply_markup=confirm_keyboard())
+    context.user_data['order_price'] = current_services_text
+
+    await message.reply_text(confirm_text, reply_markup=ReplyKeyboardRemove())
+    await message.reply_text(texts.ASK_CONFIRM_TEXT, reply_markup=confirm_keyboard())
+
+    return OrderStates.CONFIRM
+
+
+async def choose_delivery_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    # окно проверяется ещё раз при бронировании машин в create_order
+    context.user_data["delivery_at"] = int(query.data.split('_')[1])
+    delivery = capacity_scheduler.local(_delivery_at(context)).strftime("%d.%m %H:%M")
+    await query.edit_message_text(texts.DELIVERY_AT_TEXT.format(delivery=delivery))
+
+    return await _send_checkup(query.message, context)
+
+
+async def apply_promo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        promo = await promo_codes.get(update.message.text)
+    except PromoCodeError as e:
+        await update.message.reply_text(f"{e}\n\n{texts.ASK_CONFIRM_TEXT}", reply_markup=confirm_keyboard())
+        return OrderStates.CONFIRM
+
+    context.user_data["promo_code"] = promo.code
+    context.user_data["order_price"] = order_price_text(_bags(context), promo, _delivery_at(context))
+
+    text = texts.PROMO_APPLIED_TEXT.format(services=context.user_data["order_price"])
+    await update.message.reply_text(text, reply_markup=confirm_keyboard())
     return OrderStates.CONFIRM
 
 
@@ -207,6 +399,9 @@ async def payment_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
             apartment=context.user_data["apartment"],
             entrance=context.user_data["entrance"],
         )
+        # повтор этого же нажатия не должен создавать клиента ещё раз
+        context.user_data["client_exists"] = True
+        context.user_data["client_changed"] = False
     elif context.user_data["client_changed"]:
         client = await Repository.update_client(
             telegram_id=telegram_id,
@@ -217,44 +412,57 @@ async def payment_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
             apartment=context.user_data["apartment"],
             entrance=context.user_data["entrance"],
         )
+        context.user_data["client_changed"] = False
     else:
         client = await Repository.get_client_by_telegram_id(telegram_id)
 
-    order = await Repository.create_order(
-        client=client,
-        telegram_chat_id=chat_id,
-        telegram_message_id=message_id,
-        services=context.user_data['services']
-    )
+    promo_code = context.user_data.get("promo_code")
+    # та же точка, по которой предлагали время доставки
+    point_id = _laundry_point_id(context)
+    try:
+        order, created = await Repository.create_order(
+            client=client,
+            telegram_chat_id=chat_id,
+            telegram_message_id=message_id,
+            bags=_bags(context),
+            # одно сообщение подтверждения — один заказ, сколько бы раз ни пришёл callback
+            idempotency_key=f"confirm:{chat_id}:{message_id}",
+            promo=await promo_codes.get(promo_code) if promo_code else None,
+            delivery_at=_delivery_at(context),
+            laundry_point_id=point_id,
+        )
+    except PromoCodeError as e:
+        # промокод кончился, пока клиент думал: предлагаем заказ без скидки
+        context.user_data.pop("promo_code", None)
+        context.user_data["order_price"] = order_price_text(_bags(context), delivery_at=_delivery_at(context))
+
+        text = texts.PROMO_REJECTED_TEXT.format(reason=e, services=context.user_data["order_price"])
+        await query.answer()
+        await query.edit_message_text(text, reply_markup=confirm_keyboard())
+        return OrderStates.CONFIRM
+    except CapacityError:
+        # окно заняли другие заказы, пока клиент думал
+        await query.answer()
+        if context.user_data.pop("delivery_at", None) and point_id:
+            await query.edit_message_reply_markup(reply_markup=None)
+            return await _ask_delivery_time(
+                query.message, point_id, _bags(context), texts.DELIVERY_TIME_TAKEN_TEXT,
+            )
+        await query.edit_message_text(texts.NO_CAPACITY_TEXT)
+        return ConversationHandler.END
 
     context.user_data["order_id"] = order.id
 
-    await update.callback_query.answer()
-    await update.callback_query.edit_message_text(texts.PAYMENT_QUESTION_TEXT, reply_markup=yes_no_keyboard("paid"))
-
-    return OrderStates.PAYMENT_QUESTION
-
-
-async def payment_yes(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
+    # оплата — счётом Telegram Payments; дальше ждём successful_payment (src/bot/handlers/payment.py)
     await query.answer()
-
-    text = texts.SUCCESS_TEXT.format(
-        name=context.user_data["name"],
-        phone=context.user_data["phone"],
-        street=context.user_data["street"],
-        house=context.user_data["house"],
-        apartment=context.user_data["apartment"],
-        entrance=context.user_data["entrance"],
-        services=context.user_data["order_price"],
+    await query.edit_message_text(
+        texts.INVOICE_SENT_TEXT.format(order_id=order.id), reply_markup=cancel_order_keyboard()
     )
+    if created:
+        # повтор того же подтверждения возвращает уже созданный заказ — счёт по нему уже отправлен
+        await send_order_invoice(context.bot, chat_id, order)
 
-    order_id = context.user_data["order_id"]
-    update_order = await Repository.update_order_status(order_id, OrderStatusName.NEW, PaymentStatus.SUCCEEDED)
-
-    await query.edit_message_text(text)
-
-    return ConversationHandler.END
+    return OrderStates.PAYMENT_QUESTION
 
 
 async def payment_no(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -262,8 +470,10 @@ async def payment_no(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     order_id = context.user_data["order_id"]
-    update_order = await Repository.update_order_status(order_id, OrderStatusName.CANCELED, PaymentStatus.CANCELED)
+    invoice_cache.discard(order_id)
+    # оплата могла пройти, пока клиент жал «Отменить» — оплаченный заказ так не отменяется
+    canceled = await Repository.update_payment_status(order_id, PaymentStatus.CANCELED, changed_by="client")
 
-    await query.edit_message_text(texts.CANCEL_TEXT)
+    await query.edit_message_text(texts.CANCEL_TEXT if canceled else texts.ALREADY_PAID_TEXT)
 
     return ConversationHandler.END
@@ -1,45 +1,69 @@
-from telegram import Update
-from telegram.ext import ContextTypes, PreCheckoutQueryHandler
-
+import logging
 
 from telegram import Update
-from telegram.ext import ContextTypes
+from telegram.ext import ContextTypes, ConversationHandler
 
+from src.bot import texts
 from src.repositories import Repository
 from src.enums import PaymentStatus
-from src.bot.texts import ORDER_CREATED_TEXT
+from src.bot.status_messages import pin_status_message, render_status
+from src.services.payments import invoice_cache, order_id_from_payload
+from src.services.status_sync import StatusChange
+
+logger = logging.getLogger(__name__)
+
+
+async def precheckout_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Telegram ждёт ответа 10 секунд, иначе платёж отменяется:
+    проверяем счёт только по invoice_cache, без БД и внешних запросов.
+    """
+    query = update.pre_checkout_query
+    error = invoice_cache.check(query.invoice_payload, query.currency, query.total_amount)
+    if error:
+        await query.answer(ok=False, error_message=error)
+    else:
+        await query.answer(ok=True)
 
 
 async def successful_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     payment = update.message.successful_payment
-    payload = payment.invoice_payload
 
     # payload = "order:123"
-    order_id = int(payload.split(":")[1])
-
-    repo = Repository()
+    order_id = order_id_from_payload(payment.invoice_payload)
+    if order_id is None:
+        logger.error(f"Successful payment with unknown payload {payment.invoice_payload!r}")
+        return ConversationHandler.END
+    invoice_cache.discard(order_id)
 
-    # 1. Обновляем статус платежа и заказа
-    order = await repo.update_payment_status(
+    # 1. Обновляем статус платежа и заказа; вебхук ЮKassa по тому же платежу уже ничего не поменяет
+    order = await Repository.update_payment_status(
         order_id=order_id,
-        status_name=PaymentStatus.SUCCEEDED,
+        status=PaymentStatus.SUCCEEDED,
+        payment_id=payment.provider_payment_charge_id or payment.telegram_payment_charge_id,
+        changed_by="telegram",
     )
+    if order is None:
+        # вебхук успел раньше
+        order = await Repository.get_order_by_id(order_id)
+    if order is None:
+        # заказ удалён (devtools, сброс базы), а деньги пришли — разбираться вручную
+        logger.error(f"Successful payment {payment.telegram_payment_charge_id} for missing order {order_id}")
+        await update.message.reply_text(texts.PAYMENT_RECEIVED_TEXT)
+        return ConversationHandler.END
 
-    # 2. Отправляем статусное сообщение
+    # 2. Статусное сообщение — под счётом, чтобы было видно; закрепляем
+    status = Repository.get_status_name(order.status_id)
     msg = await update.message.reply_text(
-        ORDER_CREATED_TEXT.format(status="заказ оплачен")
+        render_status(StatusChange(order.id, status, update.message.chat_id, update.message.message_id))
     )
 
     # 3. Сохраняем message_id для дальнейших апдейтов
-    await repo.attach_telegram_message(
+    await Repository.attach_telegram_message(
         order_id=order.id,
         chat_id=msg.chat.id,
         message_id=msg.message_id,
     )
+    await pin_status_message(context.bot, msg.chat.id, msg.message_id)
 
-async def precheckout_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.pre_checkout_query
-    await query.answer(ok=True)
-
-
-precheckout_query_handler = PreCheckoutQueryHandler(precheckout_handler)
+    return ConversationHandler.END
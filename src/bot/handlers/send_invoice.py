@@ -0,0 +1,23 @@
+from telegram import Bot, LabeledPrice, Message
+
+from src.bot import texts
+from src.bot.settings import tg_settings
+from src.models import Order
+from src.services.payments import invoice_cache, invoice_payload
+
+
+async def send_order_invoice(bot: Bot, chat_id: int, order: Order) -> Message:
+    """
+    Счёт Telegram Payments на сумму заказа. Сумма запоминается в invoice_cache —
+    по ней precheckout_handler проверит оплату, не обращаясь к БД.
+    """
+    invoice = invoice_cache.add(order.id, order.total_price_rub)
+    return await bot.send_invoice(
+        chat_id=chat_id,
+        title=texts.INVOICE_TITLE.format(order_id=order.id),
+        description=texts.INVOICE_DESCRIPTION.format(bags=order.bags_count, weight=order.weight_kg),
+        payload=invoice_payload(order.id),
+        provider_token=tg_settings.PAYMENT_PROVIDER_TOKEN,
+        currency=invoice.currency,
+        prices=[LabeledPrice(texts.INVOICE_LABEL, invoice.amount)],
+    )
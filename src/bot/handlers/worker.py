@@ -0,0 +1,171 @@
+import logging
+
+from telegram import Update
+from telegram.ext import ContextTypes, ConversationHandler
+
+from src.repositories import Repository
+from src.enums import OrderStatusName
+from src.models import Order, Worker
+
+from src.bot import texts
+from src.bot.states import WorkerStates
+from src.bot.dependencies import get_photo_uploader, get_status_messages
+from src.bot.keyboards import worker_orders_keyboard, worker_status_keyboard, worker_photo_keyboard
+from src.services.capacity import capacity_scheduler
+from src.services.photo_storage import PhotoTooLarge
+from src.services.status_sync import StatusChange
+from src.settings import PhotoStorageSettings
+
+logger = logging.getLogger(__name__)
+
+photo_settings = PhotoStorageSettings()
+
+# Статусы, которые работник отмечает руками, в порядке прохождения заказа
+WORKER_FLOW = [
+    OrderStatusName.NEW,
+    OrderStatusName.COURIER_PICKUP,
+    OrderStatusName.PICKED_UP,
+    OrderStatusName.WASHING,
+    OrderStatusName.DRYING,
+    OrderStatusName.IRONING,
+    OrderStatusName.PACKING,
+    OrderStatusName.COURIER_DELIVERY,
+    OrderStatusName.DELIVERED,
+]
+
+# В списке /work — всё, что ещё не доставлено
+WORKER_ORDER_STATUSES = WORKER_FLOW[:-1]
+
+
+async def _worker(update: Update) -> Worker | None:
+    return await Repository.get_worker(update.effective_user.id)
+
+
+def _status_name(order: Order) -> OrderStatusName:
+    return Repository.get_status_name(order.status_id)
+
+
+async def _show_orders(update: Update) -> int:
+    orders = await Repository.get_worker_orders(WORKER_ORDER_STATUSES)
+    if orders:
+        text = texts.WORKER_ORDERS_TEXT
+        markup = worker_orders_keyboard([
+            (order.id, f"#{order.id} {order.street.name if order.street else ''}, {order.house} — "
+                       f"{texts.ORDER_STATUS_NAMES[_status_name(order)]}")
+            for order in orders
+        ])
+    else:
+        text, markup = texts.WORKER_NO_ORDERS_TEXT, None
+
+    if update.callback_query:
+        await update.callback_query.edit_message_text(text, reply_markup=markup)
+    else:
+        await update.effective_message.reply_text(text, reply_markup=markup)
+    return WorkerStates.ORDERS
+
+
+async def work(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/work — вход для курьеров и работников точки."""
+    if await _worker(update) is None:
+        await update.message.reply_text(texts.NOT_A_WORKER_TEXT)
+        return ConversationHandler.END
+    return await _show_orders(update)
+
+
+async def worker_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.callback_query.answer()
+    context.user_data.pop("worker_order_id", None)
+    return await _show_orders(update)
+
+
+async def worker_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    order = await Repository.get_order_by_id(int(query.data.removeprefix("worder_")))
+    if order is None:
+        return await _show_orders(update)
+
+    current = _status_name(order)
+    later = WORKER_FLOW[WORKER_FLOW.index(current) + 1:] if current in WORKER_FLOW else []
+    delivery = (
+        texts.DELIVERY_AT_TEXT.format(
+            delivery=capacity_scheduler.local(order.delivery_exact_time).strftime("%d.%m %H:%M"))
+        if order.delivery_exact_time else ""
+    )
+    await query.edit_message_text(
+        texts.WORKER_ORDER_TEXT.format(
+            order_id=order.id,
+            address=f"{order.street.name if order.street else ''}, д. {order.house}, кв. {order.apartment}",
+            status=texts.ORDER_STATUS_NAMES[current],
+            delivery=delivery,
+        ),
+        reply_markup=worker_status_keyboard(
+            order.id, [(status, texts.ORDER_STATUS_NAMES[status]) for status in later]
+        ),
+    )
+    return WorkerStates.ORDER
+
+
+async def worker_set_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    worker = await _worker(update)
+    if worker is None:
+        await query.answer(texts.NOT_A_WORKER_TEXT, show_alert=True)
+        return ConversationHandler.END
+
+    order_id, status = query.data.removeprefix("wstatus_").split("_", 1)
+    status = OrderStatusName(status)
+    order = await Repository.set_status_by_worker(int(order_id), status, worker)
+    if order is None:
+        await query.answer(texts.WORKER_STATUS_SAME_TEXT)
+        return WorkerStates.ORDER
+    await query.answer()
+
+    # клиенту — правка статусного сообщения, как при переносе карточки в Kaiten
+    messages = get_status_messages(context)
+    if messages is not None:
+        await messages.put_many([
+            StatusChange(order.id, status, order.telegram_chat_id, order.telegram_message_id)
+        ])
+
+    context.user_data["worker_order_id"] = order.id
+    await query.edit_message_text(
+        texts.WORKER_STATUS_SET_TEXT.format(order_id=order.id, status=texts.ORDER_STATUS_NAMES[status]),
+        reply_markup=worker_photo_keyboard(),
+    )
+    return WorkerStates.PHOTO
+
+
+async def worker_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.message
+    worker = await _worker(update)
+    order_id = context.user_data.get("worker_order_id")
+    if worker is None or order_id is None:
+        return ConversationHandler.END
+
+    if message.photo:
+        attachment, content_type = message.photo[-1], "image/jpeg"  # самый крупный размер
+    else:
+        attachment, content_type = message.document, message.document.mime_type or "image/jpeg"
+
+    if attachment.file_size and attachment.file_size > photo_settings.MAX_BYTES:
+        await message.reply_text(texts.WORKER_PHOTO_TOO_LARGE_TEXT.format(limit=photo_settings.MAX_BYTES // 2 ** 20))
+        return WorkerStates.PHOTO
+
+    try:
+        file = await attachment.get_file()
+        stored = await get_photo_uploader(context).save(file, content_type)
+    except PhotoTooLarge:
+        await message.reply_text(texts.WORKER_PHOTO_TOO_LARGE_TEXT.format(limit=photo_settings.MAX_BYTES // 2 ** 20))
+        return WorkerStates.PHOTO
+    except Exception:
+        logger.exception(f"Order {order_id}: photo from worker {worker.id} not stored")
+        await message.reply_text(texts.WORKER_PHOTO_FAILED_TEXT)
+        return WorkerStates.PHOTO
+
+    await Repository.add_order_photo(order_id, worker, stored)
+    logger.info(f"Order {order_id}: photo {stored.key} ({stored.size} bytes) from worker {worker.id}")
+
+    await message.reply_text(texts.WORKER_PHOTO_SAVED_TEXT, reply_markup=worker_photo_keyboard())
+    return WorkerStates.PHOTO
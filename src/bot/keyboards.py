@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -5,6 +7,10 @@ from telegram import (
     ReplyKeyboardMarkup,
 )
 from src.enums import ServiceCyrillicSlugMap
+from src.services.address_index import AddressIndex
+from src.services.capacity import capacity_scheduler
+from src.services.pricing import BAG_WEIGHT_KG
+from src.services.reference_cache import reference_cache
 
 
 def start_keyboard():
@@ -21,12 +27,25 @@ def phone_keyboard():
     )
 
 
+_streets_keyboard: tuple[AddressIndex, InlineKeyboardMarkup] | None = None
+
+
 def streets_keyboard():
+    """Улицы из справочника; клавиатура пересобирается, только когда перезагрузился индекс адресов."""
+    global _streets_keyboard
+    index = reference_cache.addresses
+    if _streets_keyboard is None or _streets_keyboard[0] is not index:
+        keyboard = InlineKeyboardMarkup(
+            [[InlineKeyboardButton(name, callback_data=f"street_{street_id}")] for street_id, name in index.streets]
+        )
+        _streets_keyboard = (index, keyboard)
+    return _streets_keyboard[1]
+
+
+def houses_keyboard(houses: list[str]):
     return InlineKeyboardMarkup(
-        [
-            [InlineKeyboardButton("Новорождественская", callback_data="street_nov")],
-            [InlineKeyboardButton("Мытищинская", callback_data="street_mit")],
-        ]
+        [[InlineKeyboardButton(house, callback_data=f"house_{house}") for house in houses[i:i + 3]]
+         for i in range(0, len(houses), 3)]
     )
 
 
@@ -40,15 +59,57 @@ def client_confirm_keyboard():
         ]
     )
 
-def services_keyboard(selected: dict[str, bool] | None = None) -> ReplyKeyboardMarkup:
+MAX_BAGS = 5
+
+
+def bags_keyboard():
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(str(count), callback_data=f"bags_{count}") for count in range(1, MAX_BAGS + 1)]]
+    )
+
+
+# вес пакета — с шагом в одну базовую стирку (src/services/pricing.py)
+BAG_WEIGHTS = tuple(BAG_WEIGHT_KG * units for units in range(1, 5))
+
+
+def bag_weight_keyboard():
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(f"до {weight} кг", callback_data=f"weight_{weight}") for weight in BAG_WEIGHTS]]
+    )
+
+
+def delivery_times_keyboard(options: list[datetime]):
+    # в callback — unix-время: короче ISO и не зависит от часового пояса
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(capacity_scheduler.local(moment).strftime("%d.%m %H:%M"),
+                               callback_data=f"slot_{int(moment.timestamp())}")]
+         for moment in options]
+    )
+
+SERVICE_MARK_ON = "✅"
+SERVICE_MARK_OFF = "⬜"
+
+
+def service_button_text(name: str, picked: bool) -> str:
+    return f"{SERVICE_MARK_ON if picked else SERVICE_MARK_OFF} {name}"
+
+
+def services_keyboard(
+        selected: dict[str, bool] | None = None,
+        available: set[str] | None = None,
+) -> ReplyKeyboardMarkup:
+    """
+    Клавиатура доп. услуг с отметками выбранных.
+    Готовые варианты на каждую комбинацию строит src/bot/service_menu.py.
+    """
     if selected is None:
         selected = {}
 
-    def btn_text(name: str, key: str) -> str:
-        mark = "✅" if selected.get(key, False) else "⬜"
-        return f"{mark} {name}"
-
-    keyboard = [[KeyboardButton(name)] for name, slug in ServiceCyrillicSlugMap.items()]
+    keyboard = [
+        [KeyboardButton(service_button_text(name, selected.get(slug, False)))]
+        for name, slug in ServiceCyrillicSlugMap.items()
+        if available is None or slug in available
+    ]
     keyboard.append([KeyboardButton("✅ Готово")])
 
     return ReplyKeyboardMarkup(
@@ -100,6 +161,12 @@ def skip_keyboard(prefix: str):
     )
 
 
+def cancel_order_keyboard():
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton("❌ Отменить заказ", callback_data="paid_no")]]
+    )
+
+
 def confirm_keyboard():
     return InlineKeyboardMarkup(
         [
@@ -109,3 +176,29 @@ def confirm_keyboard():
             ]
         ]
     )
+
+
+def worker_orders_keyboard(orders: list[tuple[int, str]]):
+    """orders — пары (id заказа, подпись кнопки)."""
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(label, callback_data=f"worder_{order_id}")] for order_id, label in orders]
+    )
+
+
+def worker_status_keyboard(order_id: int, statuses: list[tuple[str, str]]):
+    """statuses — пары (OrderStatusName, подпись); в callback — id заказа и статус."""
+    keyboard = [
+        [InlineKeyboardButton(label, callback_data=f"wstatus_{order_id}_{status}")]
+        for status, label in statuses
+    ]
+    keyboard.append([InlineKeyboardButton("⬅️ К списку", callback_data="wlist")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def worker_photo_keyboard():
+    return InlineKeyboardMarkup(
+        [[
+            InlineKeyboardButton("Пропустить", callback_data="wphoto_skip"),
+            InlineKeyboardButton("⬅️ К списку", callback_data="wlist"),
+        ]]
+    )
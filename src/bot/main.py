@@ -1,15 +1,45 @@
+import asyncio
+import logging
+import signal
+
+from telegram import Update
 from telegram.ext import (
     Application,
     ConversationHandler,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
+    PreCheckoutQueryHandler,
     filters,
 )
 
 from src.database import init_db, close_db
+from src.services.payments import invoice_cache
 from src.bot.settings import tg_settings
-from src.bot.states import OrderStates
+from src.bot.dependencies import (
+    setup_kaiten,
+    close_kaiten,
+    setup_outbox_worker,
+    close_outbox_worker,
+    setup_status_sync,
+    close_status_sync,
+    setup_kaiten_mirror,
+    close_kaiten_mirror,
+    setup_update_inbox,
+    close_update_inbox,
+    setup_api,
+    close_api,
+    setup_photo_uploader,
+    close_photo_uploader,
+    setup_notifications,
+    close_notifications,
+    setup_payment_sweeper,
+    close_payment_sweeper,
+)
+from src.bot.states import OrderStates, WorkerStates
+from src.bot.persistence import build_persistence
+from src.bot.update_processor import PerUserUpdateProcessor
+from src.api.telegram import WEBHOOK_PATH
 from src.bot.handlers.start import start
 from src.bot.handlers.reset import reset
 from src.bot.handlers.help import help
@@ -24,35 +54,75 @@ from src.bot.handlers.order import (
 
     get_street,
     get_house,
+    choose_house,
     get_apartment,
     get_entrance,
+    get_bags,
+    get_bag_weight,
 
     select_services,
+    apply_promo,
+    choose_delivery_time,
 
     payment_question,
-    payment_yes,
     payment_no,
 )
+from src.bot.handlers.payment import precheckout_handler, successful_payment
+from src.bot.handlers.worker import (
+    work,
+    worker_list,
+    worker_order,
+    worker_set_status,
+    worker_photo,
+)
 
 
 
 async def on_startup(app: Application):
     await init_db()
+    await invoice_cache.load()
+    await setup_kaiten(app)
+    await setup_outbox_worker(app)
+    await setup_notifications(app)
+    await setup_status_sync(app)
+    await setup_photo_uploader(app)
+    await setup_payment_sweeper(app)
+    await setup_kaiten_mirror(app)
+    await setup_update_inbox(app)
+    await setup_api(app)
 
 
 async def on_shutdown(app: Application):
+    await close_api(app)
+    await close_update_inbox(app)
+    await close_kaiten_mirror(app)
+    await close_photo_uploader(app)
+    await close_payment_sweeper(app)
+    await close_status_sync(app)
+    await close_notifications(app)
+    await close_outbox_worker(app)
+    await close_kaiten(app)
     await close_db()
 
 
 
-def main():
-    app = (
+def build_application() -> Application:
+    builder = (
         Application.builder()
         .token(tg_settings.BOT_TOKEN)
         .post_init(on_startup)
         .post_shutdown(on_shutdown)
-        .build()
+        .persistence(build_persistence(tg_settings.PERSISTENCE, tg_settings.PERSISTENCE_INTERVAL))
+        # разные пользователи — параллельно, один пользователь — строго по порядку
+        .concurrent_updates(PerUserUpdateProcessor(tg_settings.MAX_CONCURRENT_UPDATES))
     )
+    if tg_settings.BOT_API_URL:
+        builder = builder.base_url(tg_settings.BOT_API_URL)
+    if tg_settings.BOT_MODE == "webhook":
+        # апдейты приходят в FastAPI (src/api/telegram.py), Updater не нужен
+        builder = builder.updater(None)
+
+    app = builder.build()
 
     conv = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -80,6 +150,7 @@ def main():
             ],
             OrderStates.GET_HOUSE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, get_house),
+                CallbackQueryHandler(choose_house, pattern="^house_"),
             ],
             OrderStates.GET_APARTMENT: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, get_apartment),
@@ -88,29 +159,115 @@ def main():
                 MessageHandler(filters.TEXT & ~filters.COMMAND, get_entrance),
             ],
 
-            # ── услуги ────────────────────────────
+            # ── пакеты и услуги ───────────────────
+            OrderStates.GET_BAGS: [
+                CallbackQueryHandler(get_bags, pattern="^bags_"),
+            ],
             OrderStates.SELECT_SERVICES: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, select_services),
             ],
+            OrderStates.GET_BAG_WEIGHT: [
+                CallbackQueryHandler(get_bag_weight, pattern="^weight_"),
+            ],
 
             # ── подтверждение и оплата ─────────────
             OrderStates.CONFIRM: [
                 CallbackQueryHandler(payment_question, pattern="^confirm$"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, apply_promo),
+            ],
+            OrderStates.SELECT_DELIVERY_TIME: [
+                CallbackQueryHandler(choose_delivery_time, pattern="^slot_"),
             ],
             OrderStates.PAYMENT_QUESTION: [
-                CallbackQueryHandler(payment_yes, pattern="^paid_yes$"),
                 CallbackQueryHandler(payment_no, pattern="^paid_no$"),
+                MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment),
             ],
         },
         fallbacks=[CommandHandler("start", start)],
         allow_reentry=True,
+        name="order",
+        persistent=True,
+    )
+
+    # Курьеры и работники точки: отдельный диалог, чтобы /start клиента его не сбрасывал
+    worker_conv = ConversationHandler(
+        entry_points=[CommandHandler("work", work)],
+        states={
+            WorkerStates.ORDERS: [
+                CallbackQueryHandler(worker_order, pattern="^worder_"),
+            ],
+            WorkerStates.ORDER: [
+                CallbackQueryHandler(worker_set_status, pattern="^wstatus_"),
+                CallbackQueryHandler(worker_list, pattern="^wlist$"),
+            ],
+            WorkerStates.PHOTO: [
+                MessageHandler(filters.PHOTO | filters.Document.IMAGE, worker_photo),
+                CallbackQueryHandler(worker_list, pattern="^(wlist|wphoto_skip)$"),
+            ],
+        },
+        fallbacks=[CommandHandler("work", work)],
+        allow_reentry=True,
+        name="worker",
+        persistent=True,
     )
 
     app.add_handler(conv)
+    app.add_handler(worker_conv)
+    # оплата счёта, выставленного вне текущего диалога (например, клиент уже начал /start заново)
+    app.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment))
+    app.add_handler(PreCheckoutQueryHandler(precheckout_handler))
     app.add_handler(CommandHandler('reset', reset))
     app.add_handler(CommandHandler('help', help))
 
-    app.run_polling()
+    return app
+
+
+async def run_webhook(app: Application) -> None:
+    """
+    Вебхук-режим: uvicorn из src/api принимает апдейты и кладёт их в update_queue.
+    post_init/post_shutdown вызываются только из run_polling, поэтому здесь — вручную.
+    """
+    if not tg_settings.WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL is required for BOT_MODE=webhook")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await app.initialize()
+    await on_startup(app)
+    try:
+        # вебхук общий для всех воркеров — регистрирует его первый
+        if tg_settings.WORKER_INDEX == 0:
+            await app.bot.set_webhook(
+                url=tg_settings.WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=tg_settings.WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=100,
+            )
+        await app.start()
+        await stop.wait()
+
+        # перестаём принимать и дорабатываем взятые апдейты, пока бот ещё запущен
+        await close_api(app)
+        await close_update_inbox(app)
+        await app.stop()
+    finally:
+        # как в run_polling: сначала shutdown (сбрасывает persistence), потом закрываем БД
+        await app.shutdown()
+        await on_shutdown(app)
+
+
+def main():
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+    app = build_application()
+
+    if tg_settings.BOT_MODE == "webhook":
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
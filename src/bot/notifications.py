@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable
+
+from telegram import Bot, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from src.bot.settings import NotificationSettings
+from src.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    chat_id: int
+    text: str
+    # сначала пробуем отредактировать это сообщение; если его уже нельзя править — шлём новое
+    edit_message_id: int | None = None
+    reply_markup: InlineKeyboardMarkup | None = None
+    # вызывается, когда ушло новое сообщение (например, чтобы запомнить его id у заказа)
+    on_sent: Callable[[Message], Awaitable[None]] | None = None
+    attempts: int = 0
+
+
+@dataclass(frozen=True)
+class DispatcherMetrics:
+    queue_depth: int      # сообщений ждёт отправки
+    chats: int            # чатов с очередью
+    sent_total: int       # новых сообщений
+    edited_total: int
+    unchanged_total: int  # правка не понадобилась: текст тот же
+    coalesced_total: int  # правок, поглощённых более поздними для того же сообщения
+    throttled_total: int  # ответов 429
+    failed_total: int
+
+
+def _seconds(retry_after: int | timedelta) -> float:
+    # PTB отдаёт int или timedelta в зависимости от PTB_TIMEDELTA
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+class NotificationDispatcher:
+    """
+    Рассылка сообщений клиентам в пределах лимитов Bot API.
+
+    - общий TokenBucket на бота и маленький TokenBucket на каждый чат;
+      чат, упёршийся в свой лимит, откладывается таймером и не занимает воркер;
+    - в один чат сообщения уходят строго по порядку, разные чаты — параллельно;
+    - правки одного и того же сообщения склеиваются: уходит последний текст;
+    - на 429 вся рассылка замирает на retry_after, сообщение повторяется;
+    - правка, которую Telegram не принял (сообщение удалено или слишком старое),
+      превращается в новое сообщение.
+    """
+
+    def __init__(self, bot: Bot, settings: NotificationSettings | None = None):
+        self.bot = bot
+        self.settings = settings or NotificationSettings()
+        self.bucket = TokenBucket(self.settings.GLOBAL_RATE, self.settings.GLOBAL_BURST)
+
+        self._chats: dict[int, deque[Notification]] = {}
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._scheduled: set[int] = set()  # чаты в очереди, на таймере или в работе
+        self._ready: asyncio.Queue[int] = asyncio.Queue()
+        self._timers: set[asyncio.TimerHandle] = set()
+        self._workers: list[asyncio.Task] = []
+        self._paused_until = 0.0
+
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self._sent_total = 0
+        self._edited_total = 0
+        self._unchanged_total = 0
+        self._coalesced_total = 0
+        self._throttled_total = 0
+        self._failed_total = 0
+
+    # ── жизненный цикл ─────────────────────────────
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"notifications-{i}")
+            for i in range(self.settings.PARALLELISM)
+        ]
+
+    async def stop(self) -> None:
+        if self._unfinished and self._workers:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.settings.DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        dropped = sum(len(queue) for queue in self._chats.values())
+        if dropped:
+            logger.warning(f"Notifications: {dropped} messages not sent on shutdown")
+
+    async def join(self) -> None:
+        """Дождаться, пока уйдёт всё поставленное (для CLI и бенчмарков)."""
+        await self._idle.wait()
+
+    # ── постановка ─────────────────────────────────
+    def submit(self, notification: Notification) -> None:
+        queue = self._chats.setdefault(notification.chat_id, deque())
+
+        if notification.edit_message_id is not None:
+            for queued in queue:
+                if queued.edit_message_id == notification.edit_message_id:
+                    queued.text = notification.text
+                    queued.reply_markup = notification.reply_markup
+                    self._coalesced_total += 1
+                    return
+
+        queue.append(notification)
+        self._unfinished += 1
+        self._idle.clear()
+
+        if notification.chat_id not in self._scheduled:
+            self._scheduled.add(notification.chat_id)
+            self._ready.put_nowait(notification.chat_id)
+
+    def submit_many(self, notifications: list[Notification]) -> None:
+        for notification in notifications:
+            self.submit(notification)
+
+    def metrics(self) -> DispatcherMetrics:
+        return DispatcherMetrics(
+            queue_depth=self._unfinished,
+            chats=len(self._chats),
+            sent_total=self._sent_total,
+            edited_total=self._edited_total,
+            unchanged_total=self._unchanged_total,
+            coalesced_total=self._coalesced_total,
+            throttled_total=self._throttled_total,
+            failed_total=self._failed_total,
+        )
+
+    # ── отправка ───────────────────────────────────
+    def _later(self, delay: float, chat_id: int) -> None:
+        def ready() -> None:
+            self._timers.discard(timer)
+            self._ready.put_nowait(chat_id)
+
+        timer = asyncio.get_running_loop().call_later(delay, ready)
+        self._timers.add(timer)
+
+    def _done(self, count: int = 1) -> None:
+        self._unfinished -= count
+        if self._unfinished == 0:
+            self._idle.set()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10_000:
+                # полные корзины ничего не помнят — их можно выбросить
+                self._chat_buckets = {chat: b for chat, b in self._chat_buckets.items() if not b.is_full}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.settings.CHAT_RATE, self.settings.CHAT_BURST)
+        return bucket
+
+    async def _acquire_global(self) -> None:
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self.bucket.acquire()
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._chats.get(chat_id)
+            if not queue:
+                self._chats.pop(chat_id, None)
+                self._scheduled.discard(chat_id)
+                continue
+
+            wait = self._chat_bucket(chat_id).try_acquire()
+            if wait:
+                self._later(wait, chat_id)
+                continue
+
+            await self._acquire_global()
+            notification = queue.popleft()
+            retry_in = await self._deliver(notification)
+
+            if retry_in is not None:
+                newer = notification.edit_message_id is not None and any(
+                    queued.edit_message_id == notification.edit_message_id for queued in queue
+                )
+                if newer:
+                    self._done()  # более свежая правка того же сообщения уже в очереди
+                else:
+                    queue.appendleft(notification)
+                self._later(retry_in, chat_id)
+            elif queue:
+                self._ready.put_nowait(chat_id)
+            else:
+                del self._chats[chat_id]
+                self._scheduled.discard(chat_id)
+
+    async def _deliver(self, notification: Notification) -> float | None:
+        """Отправить одно сообщение. Возвращает, через сколько секунд повторить, или None."""
+        notification.attempts += 1
+        try:
+            if notification.edit_message_id is not None:
+                try:
+                    await self.bot.edit_message_text(
+                        notification.text,
+                        chat_id=notification.chat_id,
+                        message_id=notification.edit_message_id,
+                        reply_markup=notification.reply_markup,
+                    )
+                    self._edited_total += 1
+                    self._done()
+                    return None
+                except BadRequest as exc:
+                    if "not modified" in exc.message.lower():
+                        self._unchanged_total += 1
+                        self._done()
+                        return None
+                    logger.info(f"Chat {notification.chat_id}: message {notification.edit_message_id} "
+                                f"not editable ({exc.message}), sending a new one")
+                    notification.edit_message_id = None
+                    await self._acquire_global()
+
+            message = await self.bot.send_message(
+                notification.chat_id, notification.text, reply_markup=notification.reply_markup
+            )
+            self._sent_total += 1
+            self._done()
+            if notification.on_sent is not None:
+                try:
+                    await notification.on_sent(message)
+                except Exception:
+                    logger.exception(f"Chat {notification.chat_id}: on_sent failed")
+            return None
+
+        except RetryAfter as exc:
+            self._throttled_total += 1
+            delay = _seconds(exc.retry_after)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            logger.warning(f"Telegram flood control: pausing notifications for {delay:.0f}s")
+            return self._retry_or_drop(notification, delay, exc)
+        except Forbidden as exc:
+            # клиент заблокировал бота — повторять бессмысленно
+            self._failed_total += 1
+            self._done()
+            logger.info(f"Chat {notification.chat_id}: {exc.message}")
+            return None
+        except BadRequest as exc:
+            self._failed_total += 1
+            self._done()
+            logger.warning(f"Chat {notification.chat_id}: message rejected: {exc.message}")
+            return None
+        except NetworkError as exc:
+            return self._retry_or_drop(notification, min(2.0 ** notification.attempts, 30.0), exc)
+        except TelegramError as exc:
+            self._failed_total += 1
+            self._done()
+            logger.warning(f"Chat {notification.chat_id}: message not sent: {exc}")
+            return None
+
+    def _retry_or_drop(self, notification: Notification, delay: float, exc: Exception) -> float | None:
+        if notification.attempts < self.settings.MAX_ATTEMPTS:
+            return delay
+        self._failed_total += 1
+        self._done()
+        logger.error(f"Chat {notification.chat_id}: message dropped after {notification.attempts} attempts: {exc}")
+        return None
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import logging
+from typing import Any
+
+from telegram.ext import BasePersistence, PersistenceInput
+from tortoise import connections
+from tortoise.transactions import in_transaction
+
+from src.database import init_db
+
+logger = logging.getLogger(__name__)
+
+# None в буфере означает «удалить запись»
+_DROP = None
+
+# те же типы, что у BasePersistence (в PTB они лежат в приватном telegram.ext._utils.types)
+ConversationKey = tuple[int | str, ...]
+ConversationDict = dict[ConversationKey, object]
+CDCData = tuple[list[tuple[str, float, dict[str, Any]]], dict[str, str]]
+
+
+class BufferedPersistence(BasePersistence[dict, dict, dict]):
+    """
+    Общая часть хранилищ состояния диалога.
+
+    - user_data грузится лениво: при первом апдейте пользователя (refresh_user_data),
+      а не целиком при старте;
+    - update_* только кладут изменения в буфер (по ключу остаётся последнее значение),
+      а запись одной пачкой уходит в бэкенд после того, как Application отдал
+      все изменения текущего прохода (раз в update_interval);
+    - bot_data/chat_data не храним: в bot_data лежат живые сервисы (см. src/bot/dependencies.py).
+    """
+
+    def __init__(self, update_interval: float = 5.0):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._loaded_users: set[int] = set()
+        self._dirty_users: dict[int, dict | None] = {}
+        self._dirty_conversations: dict[tuple[str, str], object | None] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    # ── бэкенд: сам по себе ничего не хранит ───────
+    async def _load_user(self, user_id: int) -> dict | None:
+        return None
+
+    async def _load_conversations(self, name: str) -> dict[str, object]:
+        return {}
+
+    async def _write(
+            self,
+            users: dict[int, dict | None],
+            conversations: dict[tuple[str, str], object | None],
+    ) -> None:
+        pass
+
+    # ── буфер ──────────────────────────────────────
+    @staticmethod
+    def _encode_key(key: ConversationKey) -> str:
+        return json.dumps(list(key))
+
+    def _schedule_flush(self) -> None:
+        # Application вызывает update_* пачкой через gather: одна запись на весь проход
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        await asyncio.sleep(0)
+        await self._flush_buffer()
+
+    async def _flush_buffer(self) -> None:
+        if not self._dirty_users and not self._dirty_conversations:
+            return
+
+        users, self._dirty_users = self._dirty_users, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        try:
+            await self._write(users, conversations)
+        except Exception:
+            # вернём в буфер, не затирая более свежие изменения
+            logger.exception("Persistence: не удалось записать состояние, повторим на следующем проходе")
+            for user_id, data in users.items():
+                self._dirty_users.setdefault(user_id, data)
+            for key, state in conversations.items():
+                self._dirty_conversations.setdefault(key, state)
+
+    # ── user_data ──────────────────────────────────
+    async def get_user_data(self) -> dict[int, dict]:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._loaded_users:
+            return
+        self._loaded_users.add(user_id)
+
+        stored = await self._load_user(user_id)
+        if stored:
+            # то, что уже успели положить в этом апдейте, важнее сохранённого
+            user_data.update({k: v for k, v in stored.items() if k not in user_data})
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._loaded_users.add(user_id)
+        self._dirty_users[user_id] = data
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded_users.discard(user_id)
+        self._dirty_users[user_id] = _DROP
+        self._schedule_flush()
+
+    # ── диалоги ────────────────────────────────────
+    async def get_conversations(self, name: str) -> ConversationDict:
+        stored = await self._load_conversations(name)
+        return {tuple(json.loads(key)): state for key, state in stored.items()}
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: object | None) -> None:
+        self._dirty_conversations[(name, self._encode_key(key))] = new_state
+        self._schedule_flush()
+
+    # ── не используется ────────────────────────────
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> CDCData | None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data: CDCData) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush_buffer()
+
+
+class MemoryPersistence(BufferedPersistence):
+    """Хранилище в памяти процесса: для разработки и бенчмарков."""
+
+    def __init__(self, update_interval: float = 5.0):
+        super().__init__(update_interval=update_interval)
+        self.users: dict[int, dict] = {}
+        self.conversations: dict[str, dict[str, object]] = {}
+
+    async def _load_user(self, user_id: int) -> dict | None:
+        return self.users.get(user_id)
+
+    async def _load_conversations(self, name: str) -> dict[str, object]:
+        return dict(self.conversations.get(name, {}))
+
+    async def _write(
+            self,
+            users: dict[int, dict | None],
+            conversations: dict[tuple[str, str], object | None],
+    ) -> None:
+        for user_id, data in users.items():
+            if data is _DROP:
+                self.users.pop(user_id, None)
+            else:
+                # копия, как при настоящей сериализации: дальнейшие правки не должны «протекать»
+                self.users[user_id] = copy.deepcopy(data)
+
+        for (name, key), state in conversations.items():
+            states = self.conversations.setdefault(name, {})
+            if state is None:
+                states.pop(key, None)
+            else:
+                states[key] = state
+
+
+class PostgresPersistence(BufferedPersistence):
+    """
+    Хранилище в Postgres (таблицы bot_user_data, bot_conversations).
+    Каждая пачка — одна транзакция с executemany-upsert'ами.
+    """
+
+    async def _connection(self):
+        # Application грузит диалоги в initialize(), раньше post_init — поднимаем БД сами
+        await init_db()
+        return connections.get("default")
+
+    async def _load_user(self, user_id: int) -> dict | None:
+        conn = await self._connection()
+        rows = await conn.execute_query_dict(
+            "select data from bot_user_data where user_id = $1", [user_id]
+        )
+        if not rows:
+            return None
+        data = rows[0]["data"]
+        return json.loads(data) if isinstance(data, str) else data
+
+    async def _load_conversations(self, name: str) -> dict[str, object]:
+        conn = await self._connection()
+        rows = await conn.execute_query_dict(
+            "select key, state from bot_conversations where name = $1", [name]
+        )
+        return {row["key"]: row["state"] for row in rows}
+
+    async def _write(
+            self,
+            users: dict[int, dict | None],
+            conversations: dict[tuple[str, str], object | None],
+    ) -> None:
+        upsert_users = [[user_id, json.dumps(data, default=str)] for user_id, data in users.items() if data is not _DROP]
+        drop_users = [user_id for user_id, data in users.items() if data is _DROP]
+        upsert_states = [[name, key, int(state)] for (name, key), state in conversations.items() if state is not None]
+        drop_states = [[name, key] for (name, key), state in conversations.items() if state is None]
+
+        await self._connection()
+        async with in_transaction() as conn:
+            if upsert_users:
+                await conn.execute_many(
+                    "insert into bot_user_data (user_id, data, updated_at) values ($1, $2::jsonb, now()) "
+                    "on conflict (user_id) do update set data = excluded.data, updated_at = now()",
+                    upsert_users,
+                )
+            if drop_users:
+                await conn.execute_query(
+                    "delete from bot_user_data where user_id = any($1::bigint[])", [drop_users]
+                )
+            if upsert_states:
+                await conn.execute_many(
+                    "insert into bot_conversations (name, key, state, updated_at) values ($1, $2, $3, now()) "
+                    "on conflict (name, key) do update set state = excluded.state, updated_at = now()",
+                    upsert_states,
+                )
+            if drop_states:
+                await conn.execute_many(
+                    "delete from bot_conversations where name = $1 and key = $2", drop_states
+                )
+
+
+def build_persistence(backend: str, update_interval: float) -> BufferedPersistence:
+    if backend == "postgres":
+        return PostgresPersistence(update_interval=update_interval)
+    return MemoryPersistence(update_interval=update_interval)
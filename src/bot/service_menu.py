@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from telegram import ReplyKeyboardMarkup
+
+from src.enums import ServiceCyrillicSlugMap
+from src.bot.keyboards import service_button_text, services_keyboard
+from src.services.pricing import (
+    ALL_MASKS,
+    SERVICE_BITS,
+    Pricing,
+    PriceSnapshot,
+    mask_to_services,
+    services_to_mask,
+)
+
+CONTINUE_TEXT = "Продолжайте выбор или нажмите «Готово»"
+
+
+@dataclass(frozen=True)
+class ServiceMenu:
+    """
+    Всё, что показывает выбор доп. услуг, заранее посчитано на каждую из 2^6 комбинаций.
+    Индекс — битовая маска выбранных услуг; для комбинаций с недоступными
+    в этом прайсе услугами — None. Строится один раз на версию прайса.
+    """
+    version: int
+    available_mask: int
+    totals: tuple[int | None, ...]
+    services_texts: tuple[str | None, ...]  # ответ на переключение услуги
+    keyboards: tuple[ReplyKeyboardMarkup | None, ...]
+    button_bits: dict[str, int]             # текст кнопки (с отметкой и без) -> бит
+
+    @classmethod
+    def build(cls, snapshot: PriceSnapshot) -> ServiceMenu:
+        available = {slug for slug in SERVICE_BITS if slug in snapshot.service_prices}
+        available_mask = services_to_mask({slug: True for slug in available})
+
+        totals, services_texts, keyboards = [], [], []
+        for mask in range(ALL_MASKS):
+            if mask & ~available_mask:
+                totals.append(None)
+                services_texts.append(None)
+                keyboards.append(None)
+                continue
+
+            services = mask_to_services(mask)
+            totals.append(snapshot.total(services))
+            services_texts.append(f"{Pricing.services_message(snapshot, services)}\n\n{CONTINUE_TEXT}")
+            keyboards.append(services_keyboard(services, available))
+
+        button_bits = {}
+        for name, slug in ServiceCyrillicSlugMap.items():
+            if slug not in available:
+                continue
+            bit = 1 << SERVICE_BITS.index(slug)
+            # старые клавиатуры в чатах присылают название без отметки
+            for text in (name, service_button_text(name, True), service_button_text(name, False)):
+                button_bits[text] = bit
+
+        return cls(
+            version=snapshot.version,
+            available_mask=available_mask,
+            totals=tuple(totals),
+            services_texts=tuple(services_texts),
+            keyboards=tuple(keyboards),
+            button_bits=button_bits,
+        )
+
+
+_menu: ServiceMenu | None = None
+
+
+def service_menu() -> ServiceMenu:
+    """Меню для текущего прайса; пересобирается, только когда сменилась версия цен."""
+    global _menu
+    snapshot = Pricing.current()
+    menu = _menu
+    if menu is None or menu.version != snapshot.version:
+        menu = _menu = ServiceMenu.build(snapshot)
+    return menu
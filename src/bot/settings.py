@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -5,11 +7,76 @@ class TelegramSettings(BaseSettings):
     BOT_TOKEN: str
     PAYMENT_PROVIDER_TOKEN: str
 
+    # polling — для разработки, webhook — для прода (через src/api)
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+    WEBHOOK_URL: str | None = None  # публичный адрес, например https://bot.example.com
+    WEBHOOK_SECRET: str | None = None
+    MAX_CONCURRENT_UPDATES: int = 64
+
+    # Несколько процессов за одним вебхуком (src/bot/update_inbox.py):
+    # у каждого свой WORKER_INDEX в [0, WORKER_COUNT) и свой API_PORT
+    WORKER_COUNT: int = 1
+    WORKER_INDEX: int = 0
+
+    # свой Bot API сервер или заглушка для нагрузочных тестов
+    BOT_API_URL: str | None = None
+
+    # где хранить состояние диалога и user_data (src/bot/persistence.py)
+    PERSISTENCE: Literal["memory", "postgres"] = "postgres"
+    PERSISTENCE_INTERVAL: float = 5.0  # как часто сбрасывать накопленные изменения, сек
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         extra="ignore",
     )
 
+    @property
+    def USE_UPDATE_INBOX(self) -> bool:
+        return self.BOT_MODE == "webhook" and self.WORKER_COUNT > 1
+
+    @property
+    def RUNS_BACKGROUND_JOBS(self) -> bool:
+        """
+        Фоновые задачи над общей базой и доской (outbox Kaiten, зеркало доски, синхронизация
+        статусов, сверка оплат) запускает только первый воркер — иначе каждая работа
+        делается WORKER_COUNT раз. Вебхук Kaiten тоже принимает только он.
+        """
+        return self.WORKER_INDEX == 0
+
+
+class NotificationSettings(BaseSettings):
+    """Рассылка сообщений клиентам (src/bot/notifications.py) в пределах лимитов Bot API."""
+    # за любую секунду уходит не больше BURST + RATE: Telegram режет около 30 в секунду на бота
+    GLOBAL_RATE: float = 25.0
+    GLOBAL_BURST: int = 5
+    CHAT_RATE: float = 1.0       # в один чат — не чаще раза в секунду
+    CHAT_BURST: int = 1
+    PARALLELISM: int = 16        # одновременных запросов к Bot API
+    MAX_ATTEMPTS: int = 5        # сетевые ошибки и 429 сверх этого — сообщение теряется с записью в лог
+    DRAIN_TIMEOUT: float = 5.0   # сколько при остановке дожидаться отправки очереди
+
+    # статусное сообщение заказа (src/bot/status_messages.py): переносы за это время — одна правка
+    STATUS_DEBOUNCE: float = 3.0
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="NOTIFY_",
+        extra="ignore",
+    )
+
+    def per_worker(self, workers: int) -> "NotificationSettings":
+        """
+        Доля одного из `workers` процессов бота: лимит Telegram общий на токен,
+        а TokenBucket у каждого процесса свой — общий темп и запас делятся поровну.
+        """
+        if workers <= 1:
+            return self
+        return self.model_copy(update={
+            "GLOBAL_RATE": self.GLOBAL_RATE / workers,
+            "GLOBAL_BURST": max(1, self.GLOBAL_BURST // workers),
+        })
+
 
 tg_settings = TelegramSettings()
@@ -17,11 +17,23 @@ class OrderStates(IntEnum):
     GET_APARTMENT = 9
     GET_ENTRANCE = 10
 
-
+    # bags: count, then services and weight for each bag
+    GET_BAGS = 11
     SELECT_SERVICES = 12
+    GET_BAG_WEIGHT = 17  # added later: numbers are stored in bot_conversations
 
     # order options
     GET_COMMENT = 13
 
     CONFIRM = 14
     PAYMENT_QUESTION = 15
+
+    # exact_time: delivery window from laundry point capacity
+    SELECT_DELIVERY_TIME = 16
+
+
+class WorkerStates(IntEnum):
+    # /work: список заказов → заказ → отметка статуса → фото (необязательно)
+    ORDERS = 1
+    ORDER = 2
+    PHOTO = 3
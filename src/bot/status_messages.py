@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from telegram import Bot, Message
+from telegram.error import TelegramError
+
+from src.bot import texts
+from src.bot.notifications import Notification, NotificationDispatcher
+from src.enums import OrderStatusName
+from src.repositories import Repository
+from src.services.status_sync import StatusChange
+
+logger = logging.getLogger(__name__)
+
+# после этих статусов сообщение больше не меняется — помнить его текст незачем
+FINAL_STATUSES = {OrderStatusName.DELIVERED, OrderStatusName.CANCELED}
+
+
+def render_status(change: StatusChange) -> str:
+    return texts.ORDER_STATUS_TEXT.format(
+        order_id=change.order_id,
+        status=texts.ORDER_STATUS_NAMES.get(change.status, change.status),
+    )
+
+
+async def pin_status_message(bot: Bot, chat_id: int, message_id: int) -> None:
+    """Закрепить статусное сообщение заказа без звука; если не вышло — заказ от этого не страдает."""
+    try:
+        await bot.pin_chat_message(chat_id, message_id, disable_notification=True)
+    except TelegramError as exc:
+        logger.info(f"Chat {chat_id}: status message {message_id} not pinned: {exc}")
+
+
+@dataclass(frozen=True)
+class StatusMessageMetrics:
+    changes_total: int    # изменений статуса пришло
+    debounced_total: int  # поглощено более поздними в пределах debounce
+    unchanged_total: int  # текст не изменился — правка не нужна
+    submitted_total: int  # правок отдано в NotificationDispatcher
+
+
+class StatusMessageQueue:
+    """
+    Одно закреплённое статусное сообщение на заказ, которое правится на месте.
+
+    Синхронизация статусов и работники только отдают изменения сюда и не ждут Telegram.
+    Переносы одного заказа за `debounce` секунд склеиваются в одну правку с последним
+    статусом; правка, текст которой совпадает с уже показанным, не отправляется.
+    Отправкой в пределах лимитов занимается NotificationDispatcher.
+    """
+
+    def __init__(self, dispatcher: NotificationDispatcher, debounce: float | None = None, remember: int = 10_000):
+        self.dispatcher = dispatcher
+        self.debounce = dispatcher.settings.STATUS_DEBOUNCE if debounce is None else debounce
+        self.remember = remember
+
+        self._latest: dict[int, StatusChange] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._rendered: OrderedDict[int, str] = OrderedDict()
+
+        self._changes_total = 0
+        self._debounced_total = 0
+        self._unchanged_total = 0
+        self._submitted_total = 0
+
+    async def put_many(self, changes: list[StatusChange]) -> None:
+        loop = asyncio.get_running_loop()
+        for change in changes:
+            self._changes_total += 1
+            if change.order_id in self._latest:
+                self._debounced_total += 1
+            self._latest[change.order_id] = change
+
+            # окно отсчитывается от первого изменения: клиент видит статус не позже чем через debounce
+            if change.order_id not in self._timers:
+                self._timers[change.order_id] = loop.call_later(self.debounce, self._flush, change.order_id)
+
+    def stop(self) -> None:
+        """Отдать отложенные правки сразу — диспетчер ещё успеет их отправить."""
+        for order_id, timer in list(self._timers.items()):
+            timer.cancel()
+            self._flush(order_id)
+
+    def metrics(self) -> StatusMessageMetrics:
+        return StatusMessageMetrics(
+            changes_total=self._changes_total,
+            debounced_total=self._debounced_total,
+            unchanged_total=self._unchanged_total,
+            submitted_total=self._submitted_total,
+        )
+
+    def _flush(self, order_id: int) -> None:
+        self._timers.pop(order_id, None)
+        change = self._latest.pop(order_id, None)
+        if change is None:
+            return
+
+        text = render_status(change)
+        if self._rendered.get(order_id) == text:
+            self._unchanged_total += 1
+            return
+
+        if change.status in FINAL_STATUSES:
+            self._rendered.pop(order_id, None)
+        else:
+            self._rendered[order_id] = text
+            self._rendered.move_to_end(order_id)
+            if len(self._rendered) > self.remember:
+                self._rendered.popitem(last=False)
+
+        self._submitted_total += 1
+        self.dispatcher.submit(Notification(
+            chat_id=change.telegram_chat_id,
+            text=text,
+            edit_message_id=change.telegram_message_id,
+            on_sent=self._replace_message(change),
+        ))
+
+    @staticmethod
+    def _replace_message(change: StatusChange):
+        # старое сообщение править уже нельзя — закрепляем новое и дальше правим его
+        async def on_sent(message: Message) -> None:
+            await Repository.attach_telegram_message(change.order_id, message.chat_id, message.message_id)
+            await pin_status_message(message.get_bot(), message.chat_id, message.message_id)
+            logger.info(f"Order {change.order_id}: new status message {message.message_id}")
+        return on_sent
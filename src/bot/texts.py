@@ -38,11 +38,34 @@ ASK_CONTACT_SHARE_TEXT = "Пожалуйста, используйте кноп
 ASK_NAME_TEXT = "Введите ваше имя:"
 ASK_STREET_TEXT = "Выберите улицу:"
 ASK_HOUSE_TEXT = "Введите номер дома:"
+HOUSE_SUGGEST_TEXT = "Такого дома нет в зоне обслуживания. Может быть, один из этих?"
+HOUSE_UNKNOWN_TEXT = "Не получилось разобрать номер дома. Пример: 7, 12а, 7к1, 5 стр 2"
+OUT_OF_AREA_TEXT = "К сожалению, этот дом пока вне зоны обслуживания. Введите другой номер дома или /start"
 ASK_APARTMENT_TEXT = "Введите номер квартиры:"
 ASK_ENTRANCE_TEXT = "Введите номер подъезда:"
 
+ASK_BAGS_TEXT = "Сколько пакетов белья отдаёте? Вес каждого уточним дальше"
+
+ASK_BAG_SERVICES_TEXT = "Пакет {position} из {count}. Выберите доп. услуги для него:"
+
+ASK_BAG_WEIGHT_TEXT = "Сколько весит пакет {position}? Каждые начатые 3 кг — ещё одна стирка"
+
+BAG_WEIGHT_TEXT = "Пакет {position}: до {weight} кг"
+
 ASK_SERVICES = "Выберите дополнительные услуги:\n(нажмите на услугу, чтобы добавить/убрать)"
 
+ASK_DELIVERY_TIME_TEXT = "Когда привезти чистые вещи? Вот ближайшее время, к которому успеем:"
+
+DELIVERY_TIME_TAKEN_TEXT = "Это время уже заняли, пока вы выбирали. Выберите другое:"
+
+NO_CAPACITY_TEXT = "😔 Все машины на ближайшие дни заняты, принять заказ сейчас не получится. Попробуйте позже: /start"
+
+ASK_CONFIRM_TEXT = "Всё верно?\nЕсть промокод — отправьте его сообщением.\nПодтвердите заказ:"
+
+PROMO_APPLIED_TEXT = "🎟 Промокод применён!\n\n{services}\nПодтвердите заказ:"
+
+PROMO_REJECTED_TEXT = "{reason}\n\n{services}\nПодтвердить заказ без промокода?"
+
 ASK_COMMENT_TEXT = "Комментарий к заказу (или нажмите «Пропустить»):"
 
 ORDER_CHECKUP_TEXT = (
@@ -53,17 +76,49 @@ ORDER_CHECKUP_TEXT = (
     "{services}\n\n"
 )
 
-PAYMENT_QUESTION_TEXT = "Вы оплатили заказ?"
+DELIVERY_AT_TEXT = "Доставка к: {delivery}\n"
 
-SUCCESS_TEXT = (
-    "✅ Заказ успешно сформирован!\n\n"
-    "Имя: {name}\n"
-    "Телефон: {phone}\n"
-    "Адрес: {street}, дом {house}, кв. {apartment}, подъезд {entrance}\n\n"
-    "{services}\n\n"
-    "Отслеживать текущий статус заказа можно по это сообщению\n\n"
-    "При изменении статуса оно будет автоматически обновляться\n\n"
-    "Статус заказа: заказ оплачен 🔵"
-)
+INVOICE_SENT_TEXT = "Заказ #{order_id} оформлен. Счёт на оплату — ниже 👇"
+INVOICE_TITLE = "Стирка, заказ #{order_id}"
+INVOICE_DESCRIPTION = "Пакетов: {bags}, до {weight} кг. Заберём, постираем и привезём обратно."
+INVOICE_LABEL = "Стирка"
 
 CANCEL_TEXT = "❌ Заказ отменён. Вы можете начать заново командой /start."
+ALREADY_PAID_TEXT = "Заказ уже оплачен, отменить его можно только через поддержку."
+PAYMENT_RECEIVED_TEXT = "Оплата получена, спасибо!"
+
+ORDER_STATUS_NAMES = {
+    "waiting_for_capture": "ожидает оплаты ⏳",
+    "new": "заказ оплачен 🔵",
+    "courier_pickup": "курьер едет за вещами 🚶",
+    "picked_up": "курьер забрал вещи 📦",
+    "washing": "стирается 🫧",
+    "drying": "сушится 🌬",
+    "ironing": "гладится 👔",
+    "packing": "упаковывается 🎁",
+    "courier_delivery": "курьер везёт вещи 🚚",
+    "delivered": "доставлен ✅",
+    "canceled": "отменён ❌",
+}
+
+ORDER_STATUS_TEXT = (
+    "📦 Заказ #{order_id}\n\n"
+    "Отслеживать текущий статус заказа можно по этому сообщению\n\n"
+    "Статус заказа: {status}"
+)
+
+NOT_A_WORKER_TEXT = "Команда только для сотрудников. Попросите администратора добавить вас."
+WORKER_ORDERS_TEXT = "Заказы в работе — выберите заказ:"
+WORKER_NO_ORDERS_TEXT = "Заказов в работе нет 🎉"
+WORKER_ORDER_TEXT = (
+    "📦 Заказ #{order_id}\n"
+    "Адрес: {address}\n"
+    "Статус: {status}\n"
+    "{delivery}"
+    "\nОтметьте новый статус:"
+)
+WORKER_STATUS_SET_TEXT = "Заказ #{order_id}: {status}\nПришлите фото (вещи, пакеты, квитанция) или нажмите «Пропустить»."
+WORKER_STATUS_SAME_TEXT = "Этот статус уже стоит."
+WORKER_PHOTO_SAVED_TEXT = "📷 Фото сохранено. Можно прислать ещё или вернуться к списку."
+WORKER_PHOTO_TOO_LARGE_TEXT = "Файл слишком большой (больше {limit} МБ). Пришлите фото поменьше."
+WORKER_PHOTO_FAILED_TEXT = "Не получилось сохранить фото, попробуйте ещё раз."
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import Application
+from tortoise import connections
+
+from src.bot.update_processor import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateInbox:
+    """
+    Общая входящая очередь апдейтов для нескольких процессов бота (таблица telegram_updates).
+
+    - вебхук любого воркера только вставляет апдейт: повтор от Telegram с тем же
+      update_id отбрасывается первичным ключом;
+    - пользователи поделены между воркерами: abs(user_id) % worker_count == worker_index.
+      Все апдейты пользователя обрабатывает один процесс, поэтому порядок держит
+      PerUserUpdateProcessor, а состояние диалога (src/bot/persistence.py) можно
+      грузить лениво и не перечитывать;
+    - строки, взятые в работу и не закрытые упавшим процессом, возвращаются в очередь
+      при старте воркера с тем же индексом (at-least-once; create_order идемпотентен).
+    """
+
+    def __init__(
+            self,
+            app: Application,
+            worker_index: int,
+            worker_count: int,
+            batch_size: int = 100,
+            poll_interval: float = 0.05,
+            retention_hours: int = 24,
+    ):
+        self.app = app
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retention_hours = retention_hours
+
+        self._done: list[int] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._handlers: set[asyncio.Task] = set()
+        self._pruned_at = 0.0
+
+    def partition(self, user_id: int) -> int:
+        return abs(user_id) % self.worker_count
+
+    # ── приём ──────────────────────────────────────
+    async def put(self, data: dict) -> bool:
+        """Сохранить апдейт из вебхука. False — дубль, уже был получен раньше."""
+        update = Update.de_json(data, self.app.bot)
+        user_id = PerUserUpdateProcessor.user_key(update) or 0
+
+        rows = await connections.get("default").execute_query_dict(
+            "insert into telegram_updates (update_id, user_id, payload) values ($1, $2, $3::jsonb) "
+            "on conflict (update_id) do nothing returning update_id",
+            [update.update_id, user_id, json.dumps(data)],
+        )
+        if rows and self.partition(user_id) == self.worker_index:
+            self._wakeup.set()
+        return bool(rows)
+
+    # ── жизненный цикл ─────────────────────────────
+    async def start(self) -> None:
+        conn = connections.get("default")
+        _, rows = await conn.execute_query(
+            "update telegram_updates set status = 'pending', locked_at = null "
+            "where status = 'processing' and mod(abs(user_id), $1) = $2",
+            [self.worker_count, self.worker_index],
+        )
+        if rows:
+            logger.warning(f"Update inbox: {rows} updates left unfinished by previous run, requeued")
+
+        self._task = asyncio.create_task(self._run(), name="update-inbox")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        # дожидаемся начатых апдейтов, чтобы не обрабатывать их повторно после рестарта
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._mark_done()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._mark_done()
+                if time.monotonic() - self._pruned_at > 3600:
+                    self._pruned_at = time.monotonic()
+                    await self.prune()
+                claimed = await self.claim()
+                for update_id, payload in claimed:
+                    self._dispatch(update_id, payload)
+            except Exception:
+                logger.exception("Update inbox: ошибка при разборе очереди")
+                claimed = []
+
+            if len(claimed) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def claim(self) -> list[tuple[int, dict]]:
+        rows = await connections.get("default").execute_query_dict(
+            "update telegram_updates set status = 'processing', locked_at = now() "
+            "where update_id in ("
+            "    select update_id from telegram_updates "
+            "    where status = 'pending' and mod(abs(user_id), $1) = $2 "
+            "    order by update_id limit $3 for update skip locked"
+            ") returning update_id, payload",
+            [self.worker_count, self.worker_index, self.batch_size],
+        )
+        claimed = [
+            (row["update_id"], json.loads(row["payload"]) if isinstance(row["payload"], str) else row["payload"])
+            for row in rows
+        ]
+        # RETURNING не гарантирует порядок
+        claimed.sort(key=lambda item: item[0])
+        return claimed
+
+    # ── обработка ──────────────────────────────────
+    def _dispatch(self, update_id: int, payload: dict) -> None:
+        # Задачи создаются по порядку update_id — в том же порядке они встают
+        # в очередь PerUserUpdateProcessor
+        task = asyncio.create_task(self._handle(update_id, payload))
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+
+    async def _handle(self, update_id: int, payload: dict) -> None:
+        update = Update.de_json(payload, self.app.bot)
+        try:
+            await self.app.update_processor.process_update(update, self.app.process_update(update))
+        except Exception:
+            # ошибки хендлеров уже ушли в error handlers Application; апдейт не повторяем
+            logger.exception(f"Update inbox: update {update_id} failed")
+        self._done.append(update_id)
+
+    async def _mark_done(self) -> None:
+        if not self._done:
+            return
+        done, self._done = self._done, []
+        try:
+            await connections.get("default").execute_query(
+                "update telegram_updates set status = 'done', processed_at = now() where update_id = any($1::bigint[])",
+                [done],
+            )
+        except Exception:
+            self._done.extend(done)
+            raise
+
+    async def prune(self) -> int:
+        """Удалить обработанные апдейты старше retention_hours: дубли приходят в пределах минут."""
+        _, rows = await connections.get("default").execute_query(
+            "delete from telegram_updates where status = 'done' "
+            "and processed_at < now() - make_interval(hours => $1)",
+            [self.retention_hours],
+        )
+        return rows
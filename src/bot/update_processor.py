@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+# Лимит базового класса: его семафор берётся в process_update раньше блокировки пользователя,
+# поэтому он не должен ограничивать — настоящий лимит в PerUserUpdateProcessor
+UNBOUNDED = 1_000_000
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка апдейтов разных пользователей
+    при строгом порядке внутри диалога одного пользователя.
+
+    Порядок внутри пользователя держит FIFO asyncio.Lock на его id, общий лимит —
+    свой семафор на max_concurrent_updates. Слот семафора берётся только после
+    блокировки пользователя: иначе очередь апдейтов одного пользователя, который
+    шлёт сообщения подряд, занимала бы слоты и не давала работать остальным.
+    Семафор базового класса берётся раньше нас, поэтому ему задан UNBOUNDED.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(UNBOUNDED)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._holders: dict[int, int] = {}
+
+    @staticmethod
+    def user_key(update: object) -> int | None:
+        """Id пользователя (или чата), по которому упорядочиваются апдейты."""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.user_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock, self._slots:
+                await coroutine
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                del self._holders[key]
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,109 @@
+# src/courier_routes.py
+"""
+Рейсы курьеров по заказам в статусах «курьер едет за вещами» и «курьер везёт вещи».
+
+    python -m src.courier_routes show [ЧЧ:ММ]   # план в консоль
+    python -m src.courier_routes push [ЧЧ:ММ]   # план + карточка с чек-листом на каждый рейс в Kaiten
+
+ЧЧ:ММ — когда курьеры выезжают (по умолчанию — сейчас). Рейсы строятся отдельно
+для каждой точки стирки; заказы, дом которых не найден в справочнике координат,
+печатаются отдельным списком.
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from src.database import init_db, close_db
+from src.repositories import Repository
+from src.services.capacity import capacity_scheduler
+from src.services.courier_routes import (
+    COURIER_STATUSES,
+    CourierRoutePlanner,
+    RouteOrder,
+    RoutePlan,
+    checklist_items,
+    run_card,
+)
+from src.services.kaiten_kanban import AsyncKaiten
+from src.services.kaiten_scheduler import KaitenWriteScheduler
+from src.services.service_area import service_area
+
+
+def parse_start(value: str | None) -> datetime:
+    now = capacity_scheduler.local(datetime.now(timezone.utc))
+    if not value:
+        return now
+    hours, minutes = value.split(":")
+    return now.replace(hour=int(hours), minute=int(minutes), second=0, microsecond=0)
+
+
+async def build_plans(start_at: datetime) -> list[RoutePlan]:
+    kinds = {Repository.get_status_id(status): kind for status, kind in COURIER_STATUSES.items()}
+    orders = await Repository.get_courier_orders(list(COURIER_STATUSES))
+
+    by_point: dict[int | None, list[RouteOrder]] = defaultdict(list)
+    for order in orders:
+        by_point[order.laundry_point_id].append(RouteOrder.from_order(order, kinds[order.status_id]))
+
+    planner = CourierRoutePlanner()
+    return [
+        planner.plan(point_orders, service_area.point(point_id) if point_id else None, start_at)
+        for point_id, point_orders in by_point.items()
+    ]
+
+
+def print_plan(plan: RoutePlan) -> None:
+    print(f"=== {plan.point.name if plan.point else 'Без точки стирки'} ===")
+    for number, run in enumerate(plan.runs, start=1):
+        print(run_card(run, number, plan.point)["description"], end="")
+        for item in checklist_items(run):
+            print(f"  {item}")
+    if plan.unplaced:
+        print("Без координат: " + ", ".join(f"#{order.order_id} {order.street}, {order.house}" for order in plan.unplaced))
+    print()
+
+
+async def push_plan(plan: RoutePlan, kaiten: AsyncKaiten, scheduler: KaitenWriteScheduler) -> None:
+    for number, run in enumerate(plan.runs, start=1):
+        card = await scheduler.call(kaiten.create_card, **run_card(run, number, plan.point))
+        # чек-лист с пунктами — несколько запросов подряд, но на рейс это единицы
+        await scheduler.call(kaiten.add_checklist, card["id"], "Маршрут", checklist_items(run))
+        print(f"Рейс {number}: карточка {card['id']}")
+
+
+async def main() -> None:
+    if len(sys.argv) < 2 or sys.argv[1] not in ("show", "push"):
+        print(__doc__)
+        return
+
+    start_at = parse_start(sys.argv[2] if len(sys.argv) > 2 else None)
+
+    await init_db()
+    try:
+        started = datetime.now(timezone.utc)
+        plans = await build_plans(start_at)
+        elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+
+        for plan in plans:
+            print_plan(plan)
+        print(f"Рейсов: {sum(len(plan.runs) for plan in plans)}, спланировано за {elapsed:.2f} с")
+
+        if sys.argv[1] == "push":
+            async with AsyncKaiten() as kaiten:
+                scheduler = KaitenWriteScheduler(
+                    kaiten,
+                    rate=kaiten.settings.RATE_LIMIT,
+                    burst=kaiten.settings.RATE_BURST,
+                    parallelism=kaiten.settings.PARALLELISM,
+                )
+                for plan in plans:
+                    await push_plan(plan, kaiten, scheduler)
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,36 @@
+import asyncio
+import logging
+
 from tortoise import Tortoise
 from src.settings import DBSettings
+from src.migrations import pending_migrations
+from src.services.capacity import capacity_scheduler
+from src.services.payments import invoice_cache
+from src.services.pricing import Pricing
+from src.services.promo import promo_codes
+from src.services.reference_cache import reference_cache
+from src.services.service_area import service_area
+from src.utils.pg_listen import pg_listener
 
 db_settings = DBSettings()
 
+logger = logging.getLogger(__name__)
+
+_init_lock = asyncio.Lock()
+_initialized = False
+
 
 async def init_db() -> None:
+    # Может вызываться повторно и параллельно: persistence поднимает БД раньше on_startup
+    global _initialized
+    async with _init_lock:
+        if _initialized:
+            return
+        await _init_db()
+        _initialized = True
+
+
+async def _init_db() -> None:
     await Tortoise.init(
         db_url=db_settings.DATABASE_URL,
         modules={"models": ["src.models"]},
@@ -12,6 +38,32 @@ async def init_db() -> None:
     # При первом запуске можно раскомментировать, чтобы создать таблицы (но у нас уже есть через init.sql)
     # await Tortoise.generate_schemas()
 
+    # схему меняют миграции (python -m src.migrations), бот их не применяет — только напоминает
+    pending = await pending_migrations(db_settings.DATABASE_URL)
+    if pending:
+        logger.warning(f"Не применены миграции: {', '.join(map(str, pending))} — python -m src.migrations")
+
+    # Справочники и прайс — в память; обновляются по NOTIFY из Postgres
+    await reference_cache.load()
+    await Pricing.load()
+    await service_area.load()
+
+    pg_listener.subscribe(reference_cache.CHANNEL, reference_cache.invalidate)
+    pg_listener.subscribe(Pricing.CHANNEL, Pricing.invalidate)
+    pg_listener.subscribe(promo_codes.CHANNEL, promo_codes.invalidate)
+    pg_listener.subscribe(service_area.CHANNEL, service_area.invalidate)
+    pg_listener.subscribe(capacity_scheduler.CHANNEL, capacity_scheduler.invalidate)
+    pg_listener.subscribe(invoice_cache.CHANNEL, invoice_cache.invalidate)
+    try:
+        await pg_listener.connect(db_settings.DATABASE_URL)
+    except Exception:
+        logger.exception("LISTEN недоступен: справочники и цены обновятся только после рестарта")
+
 
 async def close_db() -> None:
+    global _initialized
+    _initialized = False
+    await pg_listener.close()
+    await reference_cache.close()
+    await service_area.close()
     await Tortoise.close_connections()
@@ -1,12 +1,16 @@
 # src/devtools.py
 from __future__ import annotations
 
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
 from typing import List
 
 from src.enums import ServiceSlug
 from src.models import Street, Client, Order
 from src.repositories import Repository
+from src.services.courier_routes import DELIVERY, PICKUP, RouteOrder
+from src.services.pricing import Bag, services_to_mask
+from src.services.service_area import Point
 
 TEST_MARKER = "[TEST]"
 
@@ -47,50 +51,77 @@ TEST_CLIENTS = [
 ]
 
 TEST_ORDERS = [
-    # базовый заказ без опций
+    # один пакет: УФ и мешок
     {
-        "services": {
-            ServiceSlug.UV: True,
-            ServiceSlug.IRONING: False,
-            ServiceSlug.CONDITIONER: False,
-            ServiceSlug.EXACT_TIME: False,
-            ServiceSlug.WASH_BAG: True,
-
-        },
+        "bags": [
+            Bag(mask=services_to_mask({ServiceSlug.UV: True, ServiceSlug.WASH_BAG: True})),
+        ],
         "telegram_chat_id": 111,
         "telegram_message_id": 1231,
-        "comment": f"{TEST_MARKER} Заказ без доп. опций",
+        "comment": f"{TEST_MARKER} Один пакет: УФ + мешок",
     },
-    # заказ с глажкой и кондиционером
+    # один пакет с кондиционером
     {
-        "services": {
-            ServiceSlug.UV: False,
-            ServiceSlug.IRONING: False,
-            ServiceSlug.CONDITIONER: True,
-            ServiceSlug.EXACT_TIME: False,
-            ServiceSlug.WASH_BAG: False,
-
-        },
+        "bags": [
+            Bag(mask=services_to_mask({ServiceSlug.CONDITIONER: True})),
+        ],
         "telegram_chat_id": 222,
         "telegram_message_id": 1232,
-        "comment": f"{TEST_MARKER} Стирка + глажка + кондиционер",
+        "comment": f"{TEST_MARKER} Один пакет: кондиционер",
     },
-    # заказ с доставкой ко времени и мешком
+    # два пакета с разными опциями, второй тяжелее
     {
-        "services": {
-            ServiceSlug.UV: True,
-            ServiceSlug.IRONING: True,
-            ServiceSlug.CONDITIONER: False,
-            ServiceSlug.EXACT_TIME: False,
-            ServiceSlug.WASH_BAG: False,
-
-        },
+        "bags": [
+            Bag(mask=services_to_mask({ServiceSlug.UV: True, ServiceSlug.IRONING: True})),
+            Bag(mask=services_to_mask({ServiceSlug.EXACT_TIME: True}), weight_kg=5),
+        ],
         "telegram_chat_id": 333,
         "telegram_message_id": 1233,
-        "comment": f"{TEST_MARKER} Доставка ко времени + мешок",
+        "comment": f"{TEST_MARKER} Два пакета: УФ + глажка и 5 кг ко времени",
     },
 ]
 
+# Синтетический день курьеров: точка стирки и дома вокруг неё (~6×6 км)
+ROUTE_POINT = Point(id=1, name=f"{TEST_MARKER} Точка", lat=55.91, lon=37.73, radius_m=3000)
+ROUTE_STREETS = ["Новорождественская", "Мытищинская", "Летная", "Веры Волошиной", "Шараповская", "Академика Каргина"]
+ROUTE_SPREAD_DEG = 0.027
+
+
+def synthetic_route_orders(count: int, start_at: datetime, seed: int = 1, exact_share: float = 0.15) -> List[RouteOrder]:
+    """
+    Заказы для планировщика рейсов без БД: забор и доставка по случайным домам,
+    часть доставок — ко времени в течение дня. Дома повторяются, чтобы были общие подъезды.
+    """
+    rnd = random.Random(seed)
+    houses = [
+        (street_id, street, str(house), ROUTE_POINT.lat + rnd.uniform(-ROUTE_SPREAD_DEG, ROUTE_SPREAD_DEG),
+         ROUTE_POINT.lon + rnd.uniform(-ROUTE_SPREAD_DEG, ROUTE_SPREAD_DEG) * 1.8)
+        for street_id, street in enumerate(ROUTE_STREETS, start=1)
+        for house in range(1, max(2, count // (2 * len(ROUTE_STREETS))) + 1)
+    ]
+
+    orders = []
+    for order_id in range(1, count + 1):
+        street_id, street, house, lat, lon = rnd.choice(houses)
+        kind = rnd.choice((PICKUP, DELIVERY))
+        deliver_at = None
+        if kind == DELIVERY and rnd.random() < exact_share:
+            deliver_at = start_at + timedelta(hours=rnd.randint(1, 10))
+        orders.append(RouteOrder(
+            order_id=order_id,
+            kind=kind,
+            street=street,
+            house=house,
+            entrance=str(rnd.randint(1, 4)),
+            apartment=rnd.randint(1, 200),
+            bags=rnd.randint(1, 3),
+            lat=lat,
+            lon=lon,
+            deliver_at=deliver_at,
+            street_id=street_id,
+        ))
+    return orders
+
 
 async def create_test_clients() -> List[Client]:
     clients: List[Client] = []
@@ -111,7 +142,7 @@ async def create_test_orders() -> List[Order]:
 
         client = await Client.get(telegram_id=TEST_CLIENTS[ind]["telegram_id"])
 
-        order = await Repository.create_order(**data, client=client)
+        order, _ = await Repository.create_order(**data, client=client)
 
         orders.append(order)
 
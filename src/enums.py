@@ -19,6 +19,9 @@ class PaymentStatus(StrEnum):
     WAITING_FOR_CAPTURE = "waiting_for_capture"
     SUCCEEDED = "succeeded"
     CANCELED = "canceled"
+    # деньги пришли за уже отменённый заказ: возврат ждёт сверщика оплат, потом — сделан
+    REFUND_PENDING = "refund_pending"
+    REFUNDED = "refunded"
 
 
 class ServiceSlug(StrEnum):
@@ -76,3 +79,30 @@ class KaitenTagsNames(StrEnum):
     UV = 'ультрафиолет'
     WASH_BAG = 'мешок'
 
+
+class KaitenOperation(StrEnum):
+    CREATE_CARD = "create_card"
+    MOVE_COLUMN = "move_column"
+    ADD_TAG = "add_tag"
+
+
+class OutboxStatus(StrEnum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+KaitenColumnStatusMap: dict[KaitenColumns, OrderStatusName] = {
+    KaitenColumns.WAITING_FOR_CAPTURE: OrderStatusName.WAITING_FOR_CAPTURE,
+    KaitenColumns.NEW: OrderStatusName.NEW,
+    KaitenColumns.COURIER_PICKUP: OrderStatusName.COURIER_PICKUP,
+    KaitenColumns.PICKED_UP: OrderStatusName.PICKED_UP,
+    KaitenColumns.WASHING: OrderStatusName.WASHING,
+    KaitenColumns.DRYING: OrderStatusName.DRYING,
+    KaitenColumns.IRONING: OrderStatusName.IRONING,
+    KaitenColumns.PACKING: OrderStatusName.PACKING,
+    KaitenColumns.COURIER_DELIVERY: OrderStatusName.COURIER_DELIVERY,
+    KaitenColumns.DELIVERED: OrderStatusName.DELIVERED,
+    KaitenColumns.CANCELED: OrderStatusName.CANCELED,
+}
+
+StatusKaitenColumnMap: dict[OrderStatusName, KaitenColumns] = {v: k for k, v in KaitenColumnStatusMap.items()}
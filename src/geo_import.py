@@ -0,0 +1,106 @@
+# src/geo_import.py
+"""
+Загрузка зоны обслуживания из CSV (без сети).
+
+    python -m src.geo_import points FILE      # name,lat,lon,radius_m
+    python -m src.geo_import buildings FILE   # street,house,lat,lon
+    python -m src.geo_import summary
+
+Повторная загрузка обновляет существующие записи. Улицы из файла домов
+заводятся в streets, а streets.houses заполняется номерами загруженных домов —
+по нему бот проверяет и подсказывает номер дома (src/services/address_index.py).
+Работающие боты перечитают зону по NOTIFY geodata_changed.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from tortoise.transactions import in_transaction
+
+from src.database import init_db, close_db
+from src.models import Building, LaundryPoint, Street
+from src.services.address_index import normalize_house
+
+BATCH_SIZE = 1000
+
+
+def read_rows(path: Path, columns: tuple[str, ...]) -> list[dict[str, str]]:
+    with path.open(encoding="utf-8-sig", newline="") as file:
+        reader = csv.DictReader(file)
+        missing = set(columns) - set(reader.fieldnames or ())
+        if missing:
+            raise SystemExit(f"{path}: нет колонок {', '.join(sorted(missing))}")
+        return list(reader)
+
+
+async def import_points(path: Path) -> None:
+    rows = read_rows(path, ("name", "lat", "lon", "radius_m"))
+    points = [
+        LaundryPoint(name=row["name"].strip(), lat=float(row["lat"]), lon=float(row["lon"]), radius_m=int(row["radius_m"]))
+        for row in rows
+    ]
+    await LaundryPoint.bulk_create(points, on_conflict=["name"], update_fields=["lat", "lon", "radius_m"])
+    print(f"Загружено точек стирки: {len(points)}")
+
+
+async def import_buildings(path: Path) -> None:
+    rows = read_rows(path, ("street", "house", "lat", "lon"))
+
+    houses: dict[str, dict[str, tuple[float, float]]] = defaultdict(dict)
+    skipped = 0
+    for row in rows:
+        house = normalize_house(row["house"])
+        if house is None:
+            skipped += 1
+            continue
+        houses[row["street"].strip()][house] = (float(row["lat"]), float(row["lon"]))
+
+    async with in_transaction():
+        for street_name, street_houses in houses.items():
+            street, _ = await Street.get_or_create(name=street_name)
+            await Building.bulk_create(
+                [Building(street=street, house=house, lat=lat, lon=lon) for house, (lat, lon) in street_houses.items()],
+                on_conflict=["street_id", "house"],
+                update_fields=["lat", "lon"],
+                batch_size=BATCH_SIZE,
+            )
+
+            known = await Building.filter(street=street).values_list("house", flat=True)
+            street.houses = sorted(known)
+            await street.save(update_fields=["houses"])
+
+    print(f"Загружено домов: {sum(map(len, houses.values()))} на {len(houses)} улицах, пропущено строк: {skipped}")
+
+
+async def show_summary() -> None:
+    print(f"Точек стирки: {await LaundryPoint.filter(is_active=True).count()}")
+    print(f"Домов с координатами: {await Building.all().count()}")
+
+
+async def main() -> None:
+    if len(sys.argv) < 2 or sys.argv[1] not in ("points", "buildings", "summary"):
+        print(__doc__)
+        return
+
+    command = sys.argv[1]
+    if command != "summary" and len(sys.argv) < 3:
+        print(__doc__)
+        return
+
+    await init_db()
+    try:
+        if command == "points":
+            await import_points(Path(sys.argv[2]))
+        elif command == "buildings":
+            await import_buildings(Path(sys.argv[2]))
+        await show_summary()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
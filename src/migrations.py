@@ -0,0 +1,187 @@
+# src/migrations.py
+"""
+Версионные миграции схемы.
+
+pg_init/01-schema.sql — исходная схема, её выполняет только создание пустой базы
+(docker-entrypoint-initdb.d). Всё, что добавлено после, лежит в migrations/NNNN_название.sql
+и применяется по порядку номеров поверх неё — и в новой базе, и в уже работающей;
+применённые версии записаны в schema_migrations. Tortoise схему
+не создаёт и не меняет — src/models.py просто должен совпадать с итогом миграций.
+
+Миграция выполняется в одной транзакции с записью о ней. Файл, который начинается
+со строки `-- migrate: no-transaction` (нужно для create index concurrently), выполняется
+по одному оператору без транзакции — его операторы должны быть идемпотентными
+(if not exists): при сбое часть из них уже применена, и файл будет выполнен заново.
+
+    python -m src.migrations           # применить новые
+    python -m src.migrations status    # что применено, что нет
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import asyncpg
+
+from src.settings import DBSettings
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+# pg_advisory_lock: несколько процессов, запущенных разом, применяют миграции по очереди
+LOCK_ID = 4_207_001
+
+CREATE_TABLE = """
+create table if not exists schema_migrations (
+    version int primary key,
+    name text not null,
+    checksum char(64) not null,
+    applied_at timestamptz not null default now()
+)
+"""
+
+_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_STATEMENT_END_RE = re.compile(r";[ \t]*(?:\n|$)")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.startswith(NO_TRANSACTION)
+
+    def statements(self) -> list[str]:
+        """Операторы по одному — для миграций без транзакции. Разделитель — `;` в конце строки."""
+        statements = []
+        for chunk in _STATEMENT_END_RE.split(self.sql):
+            code = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith("--")]
+            if code:
+                statements.append(chunk.strip())
+        return statements
+
+    def __str__(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    migrations: dict[int, Migration] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILE_RE.match(path.name)
+        if match is None:
+            raise ValueError(f"Migration file name must look like 0001_name.sql: {path.name}")
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {path.name}")
+        migrations[version] = Migration(version, match.group(2), path.read_text(encoding="utf-8"))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+async def _applied(conn: asyncpg.Connection) -> dict[int, str]:
+    """Версия → checksum применённых миграций; пустая база — ничего не применено."""
+    if await conn.fetchval("select to_regclass('schema_migrations')") is None:
+        return {}
+    rows = await conn.fetch("select version, checksum from schema_migrations")
+    return {row["version"]: row["checksum"] for row in rows}
+
+
+def _check_changed(migrations: list[Migration], applied: dict[int, str]) -> None:
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is not None and checksum != migration.checksum:
+            # уже применённую миграцию не перевыполняем — изменения нужно оформить новой
+            logger.warning(f"Migration {migration} was changed after it had been applied")
+
+
+async def pending_migrations(dsn: str, directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    conn = await asyncpg.connect(dsn)
+    try:
+        applied = await _applied(conn)
+    finally:
+        await conn.close()
+    migrations = load_migrations(directory)
+    _check_changed(migrations, applied)
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+async def _apply(conn: asyncpg.Connection, migration: Migration) -> None:
+    record = "insert into schema_migrations (version, name, checksum) values ($1, $2, $3)"
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record, migration.version, migration.name, migration.checksum)
+        return
+
+    for statement in migration.statements():
+        await conn.execute(statement)
+    await conn.execute(record, migration.version, migration.name, migration.checksum)
+
+
+async def migrate(dsn: str, directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Применить все новые миграции; возвращает применённые."""
+    migrations = load_migrations(directory)
+    conn = await asyncpg.connect(dsn)
+    try:
+        # блокировка сессии — снимется и при обрыве соединения
+        await conn.execute("select pg_advisory_lock($1)", LOCK_ID)
+        await conn.execute(CREATE_TABLE)
+        applied = await _applied(conn)
+        _check_changed(migrations, applied)
+
+        done = []
+        for migration in migrations:
+            if migration.version in applied:
+                continue
+            logger.info(f"Applying migration {migration}")
+            await _apply(conn, migration)
+            done.append(migration)
+        return done
+    finally:
+        await conn.close()
+
+
+async def show_status(dsn: str) -> None:
+    conn = await asyncpg.connect(dsn)
+    try:
+        applied = await _applied(conn)
+    finally:
+        await conn.close()
+    migrations = load_migrations()
+    _check_changed(migrations, applied)
+    for migration in migrations:
+        mark = "применена" if migration.version in applied else "не применена"
+        print(f"{migration}  {mark}")
+
+
+async def main() -> None:
+    command = sys.argv[1] if len(sys.argv) > 1 else "up"
+    if command not in ("up", "status"):
+        print(__doc__)
+        return
+
+    dsn = DBSettings().DATABASE_URL
+    if command == "status":
+        await show_status(dsn)
+        return
+
+    done = await migrate(dsn)
+    print(f"Применено миграций: {len(done)}" + "".join(f"\n  {migration}" for migration in done))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
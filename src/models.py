@@ -1,12 +1,14 @@
 # src/models/models.py
 from tortoise.models import Model
 from tortoise import fields
+from tortoise.contrib.postgres.fields import ArrayField
 from typing import Optional
 
 class Street(Model):
     id = fields.IntField(pk=True)
     name = fields.CharField(max_length=50, unique=True)
-    #houses = fields.JSONField(default=list)
+    # нормализованные номера домов (src/services/address_index.py); в БД default '{}'
+    houses = ArrayField(element_type="text", null=True)
     
     class Meta:
         table = "streets"
@@ -14,6 +16,41 @@ class Street(Model):
     def __str__(self):
         return self.name
 
+class LaundryPoint(Model):
+    """Точка со стиральными машинами и радиус района, который она обслуживает."""
+    id = fields.IntField(pk=True)
+    name = fields.CharField(max_length=100, unique=True)
+    lat = fields.FloatField()
+    lon = fields.FloatField()
+    radius_m = fields.IntField()
+    is_active = fields.BooleanField(default=True)
+
+    # мощности точки (src/services/capacity.py)
+    machines = fields.IntField(default=4)
+    dryers = fields.IntField(default=4)
+    ironers = fields.IntField(default=1)
+    wash_minutes = fields.IntField(default=60)
+    dry_minutes = fields.IntField(default=90)
+    iron_minutes = fields.IntField(default=20)  # на один пакет
+    opens_hour = fields.SmallIntField(default=8)    # часы работы, местное время
+    closes_hour = fields.SmallIntField(default=22)
+    capacity_version = fields.IntField(default=0)  # +1 на каждое бронирование, см. CapacityScheduler
+
+    class Meta:
+        table = "laundry_points"
+
+class Building(Model):
+    """Дом с координатами; загружается из файла (python -m src.geo_import)."""
+    id = fields.BigIntField(pk=True)
+    street = fields.ForeignKeyField("models.Street", related_name="buildings")
+    house = fields.TextField()  # нормализованный номер (normalize_house)
+    lat = fields.FloatField()
+    lon = fields.FloatField()
+
+    class Meta:
+        table = "buildings"
+        unique_together = (("street", "house"),)
+
 class Client(Model):
     id = fields.BigIntField(pk=True)
     telegram_id = fields.BigIntField(unique=True)
@@ -29,6 +66,8 @@ class Client(Model):
 
     registered_at = fields.DatetimeField(auto_now_add=True)
     total_orders = fields.IntField(default=0)
+    # точка стирки, в зону которой попадает адрес (src/services/service_area.py)
+    laundry_point = fields.ForeignKeyField("models.LaundryPoint", related_name="clients", null=True)
 
     class Meta:
         table = "clients"
@@ -51,7 +90,11 @@ class Order(Model):
     floor = fields.TextField(null=True)
     apartment = fields.IntField()
     comment = fields.TextField(null=True)
+    laundry_point = fields.ForeignKeyField("models.LaundryPoint", related_name="orders", null=True)
 
+    # Итоги по пакетам (order_items) денормализованы сюда: списки заказов не джойнят пакеты.
+    # Флаги опций — объединение опций всех пакетов
+    bags_count = fields.IntField(default=1)
     weight_kg = fields.IntField(default=3)
     ironing = fields.BooleanField(default=False)
     conditioner = fields.BooleanField(default=False)
@@ -61,12 +104,16 @@ class Order(Model):
     delivery_exact_time = fields.DatetimeField(null=True)
 
     total_price_rub = fields.IntField()
+    price_version = fields.IntField(null=True)  # версия прайса (price_versions), по которой посчитан заказ
+    promo_code = fields.ForeignKeyField("models.PromoCode", related_name="orders", null=True)
+    discount_rub = fields.IntField(default=0)  # скидка по промокоду, уже вычтена из total_price_rub
     payment_id = fields.TextField(null=True)
     payment_status = fields.TextField(default="pending")
 
     kaiten_card_id = fields.IntField(null=True)
     telegram_chat_id = fields.IntField()
     telegram_message_id = fields.IntField()
+    idempotency_key = fields.CharField(max_length=255, unique=True, null=True)
 
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
@@ -74,6 +121,80 @@ class Order(Model):
     class Meta:
         table = "orders"
 
+class OrderItem(Model):
+    """Пакет заказа: у каждого свой вес и свои доп. опции."""
+    id = fields.BigIntField(pk=True)
+    order = fields.ForeignKeyField("models.Order", related_name="items")
+    position = fields.IntField()  # номер пакета в заказе, с 1
+
+    weight_kg = fields.IntField(default=3)
+    ironing = fields.BooleanField(default=False)
+    conditioner = fields.BooleanField(default=False)
+    vacuum_pack = fields.BooleanField(default=False)
+    uv = fields.BooleanField(default=False)
+    wash_bag = fields.BooleanField(default=False)
+
+    price_rub = fields.IntField()  # стирка по весу + опции пакета, без опций всего заказа
+
+    class Meta:
+        table = "order_items"
+        unique_together = (("order", "position"),)
+
+class CapacityReservation(Model):
+    """Занятые ресурсы точки (машины, сушилки, гладильщики) на отрезке времени под заказ."""
+    id = fields.BigIntField(pk=True)
+    laundry_point = fields.ForeignKeyField("models.LaundryPoint", related_name="reservations")
+    order = fields.ForeignKeyField("models.Order", related_name="reservations")
+    resource = fields.CharField(max_length=16)
+    units = fields.IntField()
+    start_at = fields.DatetimeField()
+    end_at = fields.DatetimeField()
+
+    class Meta:
+        table = "capacity_reservations"
+
+class PriceVersion(Model):
+    """Снимок каталога услуг; новая версия создаётся триггером при каждом изменении services."""
+    version = fields.IntField(pk=True)
+    catalogue = fields.JSONField()  # [{"slug", "name", "price_rub"}, ...] только активные услуги
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "price_versions"
+
+class PromoCode(Model):
+    id = fields.IntField(pk=True)
+    code = fields.CharField(max_length=64, unique=True)
+    discount_rub = fields.IntField(default=0)
+    discount_percent = fields.IntField(null=True)
+    usage_limit = fields.IntField(null=True)  # None — без ограничения
+    used_count = fields.IntField(default=0)
+    valid_until = fields.DatetimeField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "promo_codes"
+
+class PromoCodeUse(Model):
+    """
+    Погашение промокода. Скидка привязана к адресу, а не к телефону:
+    один код — один раз на квартиру (street, house_key, apartment).
+    """
+    id = fields.BigIntField(pk=True)
+    promo_code = fields.ForeignKeyField("models.PromoCode", related_name="uses")
+    client = fields.ForeignKeyField("models.Client", related_name="promo_code_uses")
+    order = fields.ForeignKeyField("models.Order", related_name="promo_code_uses", null=True)
+
+    street = fields.ForeignKeyField("models.Street", null=True)
+    house_key = fields.TextField()  # нормализованный номер дома
+    apartment = fields.IntField()
+
+    used_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "promo_code_uses"
+        unique_together = (("promo_code", "client"), ("promo_code", "street", "house_key", "apartment"))
+
 class OrderStatusHistory(Model):
     id = fields.BigIntField(pk=True)
     order = fields.ForeignKeyField("models.Order", related_name="history")
@@ -83,3 +204,56 @@ class OrderStatusHistory(Model):
 
     class Meta:
         table = "order_status_history"
+
+class Worker(Model):
+    """Курьер или работник точки стирки: отмечает статусы заказов через бота (/work)."""
+    id = fields.IntField(pk=True)
+    telegram_id = fields.BigIntField(unique=True)
+    name = fields.TextField()
+    is_active = fields.BooleanField(default=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "workers"
+
+    @property
+    def changed_by(self) -> str:
+        """Значение OrderStatusHistory.changed_by для отметок этого работника."""
+        return f"worker:{self.id}"
+
+class OrderPhoto(Model):
+    """Фото к отметке статуса; сам файл — в хранилище по sha256 (src/services/photo_storage.py)."""
+    id = fields.BigIntField(pk=True)
+    order = fields.ForeignKeyField("models.Order", related_name="photos")
+    history = fields.ForeignKeyField("models.OrderStatusHistory", related_name="photos", null=True)
+    worker = fields.ForeignKeyField("models.Worker", related_name="photos", null=True)
+    storage_key = fields.TextField()
+    sha256 = fields.CharField(max_length=64)
+    size_bytes = fields.BigIntField()
+    content_type = fields.TextField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "order_photos"
+
+class KaitenOutbox(Model):
+    """
+    Очередь операций над Kaiten (transactional outbox).
+    Пишется в той же транзакции, что и заказ, разбирается фоновым воркером.
+    """
+    id = fields.BigIntField(pk=True)
+    order = fields.ForeignKeyField("models.Order", related_name="kaiten_outbox")
+    operation = fields.TextField()
+    payload = fields.JSONField(default=dict)
+    idempotency_key = fields.CharField(max_length=255, unique=True)
+
+    status = fields.TextField(default="pending")
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField(auto_now_add=True)
+    last_error = fields.TextField(null=True)
+
+    created_at = fields.DatetimeField(auto_now_add=True)
+    processed_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "kaiten_outbox"
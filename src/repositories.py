@@ -1,16 +1,44 @@
 import logging
-import asyncio
 from datetime import datetime
 from typing import Optional
-from icecream import ic
 
-from src.models import Client, Order, OrderStatus, Street, OrderStatusHistory
-from src.enums import ServiceSlug, OrderStatusName, PaymentStatus, KaitenColumns, KaitenTagsNames
-from src.services.pricing import Pricing
-from src.services.kaiten_kanban import Kaiten
+from tortoise.exceptions import IntegrityError
+from tortoise.transactions import in_transaction
+
+from src.models import (
+    Client,
+    Order,
+    OrderItem,
+    OrderPhoto,
+    OrderStatus,
+    Street,
+    OrderStatusHistory,
+    KaitenOutbox,
+    Worker,
+)
+from src.enums import (
+    OrderStatusName,
+    PaymentStatus,
+    KaitenTagsNames,
+    KaitenOperation,
+    StatusKaitenColumnMap,
+)
+from src.services.capacity import capacity_scheduler
+from src.services.photo_storage import StoredPhoto
+from src.services.pricing import Bag, Pricing, bag_services
+from src.services.promo import Promo, promo_codes
+from src.services.reference_cache import reference_cache
+from src.services.service_area import service_area
+from src.services.address_index import normalize_house
+from src.utils.db_errors import violates
 
 logger = logging.getLogger(__name__)
 
+# orders.idempotency_key text unique (migrations/0003_telegram_updates.sql)
+ORDER_IDEMPOTENCY_CONSTRAINTS = {"orders_idempotency_key_key"}
+# clients.telegram_id bigint unique (pg_init/01-schema.sql)
+CLIENT_TELEGRAM_ID_CONSTRAINTS = {"clients_telegram_id_key"}
+
 
 class Repository:
 
@@ -20,22 +48,25 @@ class Repository:
         Гарантированно получить объект Street для клиента.
 
         Поведение:
-        - пытаемся сделать client.fetch_related("street") и вернуть client.street;
-        - если всё ещё None, кидаем ошибку;
+        - берём улицу по client.street_id из справочника в памяти (без запроса);
+        - если адреса нет, кидаем ошибку;
         """
-        await client.fetch_related("street")
+        street = reference_cache.street_by_id(client.street_id) if client.street_id else None
 
-        if client.street is None:
+        if street is None:
             raise ValueError("У клиента не указан адрес")
 
-        return client.street
+        return street
 
     @staticmethod
     async def resolve_street_by_name(street_name: str) -> Street:
-        street = await Street.get_or_none(name=street_name)
-        if not street:
-            raise ValueError(f"Unknown street: {street_name}")
-        return street
+        return reference_cache.street(street_name)
+
+    @staticmethod
+    def resolve_laundry_point_id(street: Street, house: str) -> int | None:
+        """Точка стирки для адреса — из зоны обслуживания в памяти (src/services/service_area.py)."""
+        point = service_area.locate(street.id, normalize_house(house) or house)
+        return point.id if point else None
 
     # ── Клиенты ─────────────────────────────────────
     @staticmethod
@@ -79,22 +110,31 @@ class Repository:
             floor: str = None,
             comment: str = None,
     ) -> Client:
-
+        """
+        Идемпотентно: повтор апдейта (inbox отдаёт апдейт ещё раз, user_data ещё не сохранены)
+        упирается в clients.telegram_id unique и возвращает уже созданного клиента.
+        """
         street = await Repository.resolve_street_by_name(street)
 
-
-        return await Client.create(
-            telegram_id=telegram_id,
-            phone=phone,
-            name=name,
-            street=street,
-            apartment=apartment,
-            house=house,
-
-            entrance=entrance,
-            floor=floor,
-            comment=comment,
-        )
+        try:
+            return await Client.create(
+                laundry_point_id=Repository.resolve_laundry_point_id(street, house),
+                telegram_id=telegram_id,
+                phone=phone,
+                name=name,
+                street=street,
+                apartment=apartment,
+                house=house,
+
+                entrance=entrance,
+                floor=floor,
+                comment=comment,
+            )
+        except IntegrityError as exc:
+            if not violates(exc, CLIENT_TELEGRAM_ID_CONSTRAINTS, "clients.telegram_id"):
+                raise
+            logger.info(f"Client {telegram_id} already exists, reusing it")
+            return await Client.get(telegram_id=telegram_id)
 
     @staticmethod
     async def update_client(
@@ -114,21 +154,31 @@ class Repository:
         client.phone = phone
         client.name = name
 
-        client.street = street
+        client.street = await Repository.resolve_street_by_name(street)
         client.house = house
+        client.laundry_point_id = Repository.resolve_laundry_point_id(client.street, house)
         client.apartment = apartment
         client.entrance = entrance
         client.floor = floor
         client.comment = comment
         await client.save(
-            update_fields=["phone", "name", "street", "apartment", "house", "entrance", "floor", "comment"]
+            update_fields=["phone", "name", "street_id", "apartment", "house", "laundry_point_id", "entrance", "floor", "comment"]
         )
         return client
 
     # ── Статусы ─────────────────────────────────────
+    # Справочник статусов — из памяти (src/services/reference_cache.py)
     @staticmethod
     async def get_status_by_name(name: str) -> OrderStatus:
-        return await OrderStatus.get(name=name)
+        return reference_cache.status(name)
+
+    @staticmethod
+    def get_status_id(name: OrderStatusName) -> int:
+        return reference_cache.status_id(name)
+
+    @staticmethod
+    def get_status_name(status_id: int) -> OrderStatusName:
+        return OrderStatusName(reference_cache.status_name(status_id))
 
     # ── Заказы ──────────────────────────────────────
     @staticmethod
@@ -136,50 +186,136 @@ class Repository:
             client: Client,
             telegram_chat_id: int,
             telegram_message_id: int,
-            services: dict[ServiceSlug, bool],
+            bags: list[Bag],
             comment: str = None,
-    ) -> Order:
-
-        street = await Repository.resolve_client_street(client)
+            idempotency_key: str | None = None,
+            promo: Promo | None = None,
+            delivery_at: datetime | None = None,
+            laundry_point_id: int | None = None,
+    ) -> tuple[Order, bool]:
+        """
+        Заказ, его пакеты, первая запись истории и задача на карточку Kaiten — одной транзакцией,
+        без лишних чтений: id статуса из кэша, улица берётся по street_id клиента.
 
-        # Считаем цену заказа
-        total = Pricing.calculate_order_price(services)
+        bags — пакеты с весом и маской доп. услуг; итоги по ним пишутся и в сам заказ.
+        promo — промокод из promo_codes.get(): гасится в той же транзакции,
+        если лимит исчерпан или адрес уже получал скидку — PromoCodeError и заказа нет.
 
-        # Берём самый первый статус
-        status_new = await OrderStatus.get(name=OrderStatusName.WAITING_FOR_CAPTURE)
-
-        # Создаём заказ
-        order = await Order.create(
-            client=client,
-            status=status_new,
-            total_price_rub=total,
-            payment_status=PaymentStatus.WAITING_FOR_CAPTURE,
-            comment=comment,
+        Машины точки стирки бронируются в той же транзакции (src/services/capacity.py).
+        laundry_point_id — точка, по которой клиенту предлагали время доставки;
+        по умолчанию — точка из карточки клиента.
+        delivery_at — выбранное время доставки (услуга «точное время»): не успеваем к нему
+        или точка загружена на весь горизонт — CapacityError и заказа нет.
 
-            telegram_chat_id=telegram_chat_id,
-            telegram_message_id=telegram_message_id,
+        idempotency_key — ключ повторов (например, chat_id:message_id подтверждения):
+        повторный вызов с тем же ключом вернёт уже созданный заказ.
 
-            street=street,
-            house=client.house,
-            entrance=client.entrance,
-            floor=client.floor,
-            apartment=client.apartment,
+        Возвращает (заказ, создан ли он этим вызовом) — как get_or_create у Tortoise:
+        на повтор не нужно второй раз выставлять счёт.
+        """
+        if client.street_id is None:
+            raise ValueError("У клиента не указан адрес")
 
-            **services
-        )
+        if not bags:
+            raise ValueError("В заказе нет ни одного пакета")
 
-        # Создаём kaiten карточку
-        with Kaiten() as k:
-            await k.add_card_to_order(order)
+        # Считаем цену всех пакетов разом; версия прайса сохраняется вместе с суммой
+        prices = Pricing.current()
+        quote = prices.quote(bags)
+        discount = promo.discount(quote.total) if promo else 0
 
-        # История статуса
-        await OrderStatusHistory.create(
-            order=order,
-            status=status_new,
-            changed_by="system",
-        )
 
-        return order
+        # Берём самый первый статус
+        status_id = Repository.get_status_id(OrderStatusName.WAITING_FOR_CAPTURE)
+        point_id = laundry_point_id or client.laundry_point_id
+        plan = None
+
+        # Заказ, история и задача на карточку Kaiten — одной транзакцией.
+        # Сама карточка создаётся фоновым воркером (src/services/kaiten_outbox.py).
+        try:
+            async with in_transaction():
+                order = await Order.create(
+                    client=client,
+                    status_id=status_id,
+                    total_price_rub=quote.total - discount,
+                    promo_code_id=promo.id if promo else None,
+                    discount_rub=discount,
+                    price_version=prices.version or None,
+                    payment_status=PaymentStatus.WAITING_FOR_CAPTURE,
+                    comment=comment,
+
+                    telegram_chat_id=telegram_chat_id,
+                    telegram_message_id=telegram_message_id,
+
+                    street_id=client.street_id,
+                    laundry_point_id=point_id,
+                    house=client.house,
+                    entrance=client.entrance,
+                    floor=client.floor,
+                    apartment=client.apartment,
+
+                    idempotency_key=idempotency_key,
+                    delivery_exact_time=delivery_at,
+
+                    bags_count=len(bags),
+                    weight_kg=sum(bag.weight_kg for bag in bags),
+                    # флаги заказа — объединение опций пакетов
+                    **bag_services(quote.order_mask)
+                )
+
+                await OrderItem.bulk_create([
+                    OrderItem(
+                        order_id=order.id,
+                        position=position,
+                        weight_kg=bag.weight_kg,
+                        price_rub=price,
+                        **bag_services(bag.mask),
+                    )
+                    for position, (bag, price) in enumerate(zip(bags, quote.bag_prices), start=1)
+                ])
+
+                # История статуса
+                await OrderStatusHistory.create(
+                    order=order,
+                    status_id=status_id,
+                    changed_by="system",
+                )
+
+                await KaitenOutbox.create(
+                    order=order,
+                    operation=KaitenOperation.CREATE_CARD,
+                    idempotency_key=f"order:{order.id}:create_card",
+                )
+
+                # строка точки блокируется до COMMIT — брони точки идут по очереди
+                if point_id:
+                    plan = await capacity_scheduler.reserve(order.id, point_id, bags, delivery_at)
+
+                # последним: блокировка строки промокода держится до COMMIT
+                if promo:
+                    await promo_codes.redeem(
+                        promo,
+                        client_id=client.id,
+                        order_id=order.id,
+                        street_id=client.street_id,
+                        house=client.house,
+                        apartment=client.apartment,
+                    )
+        except IntegrityError as exc:
+            # повтор: заказ с этим ключом уже есть — отдаём его.
+            # Отдельной проверки до вставки нет, чтобы не платить запросом за каждый заказ.
+            # Прочие нарушения (погашение промокода разбирает сам redeem) — наверх как есть
+            if not idempotency_key or not violates(exc, ORDER_IDEMPOTENCY_CONSTRAINTS, "orders.idempotency_key"):
+                raise
+            existing = await Order.get_or_none(idempotency_key=idempotency_key)
+            if existing is None:
+                raise
+            return existing, False
+
+        if plan is not None:
+            # бронь в расписание в памяти — только после COMMIT
+            capacity_scheduler.confirm(plan)
+        return order, True
 
     @staticmethod
     async def attach_telegram_message(order_id: int, chat_id: int, message_id: int) -> Optional[Order]:
@@ -193,44 +329,178 @@ class Repository:
     async def update_order_status(
             order_id: int,
             status: OrderStatusName,
-            payment_status: PaymentStatus,
+            payment_status: PaymentStatus | None = None,
             changed_by: str = "system",
     ) -> Order:
-        order = await Order.get(id=order_id)
+        """
+        payment_status=None — оплату не трогаем (отметки работников): её в это же время
+        может менять вебхук или сверщик оплат, поэтому пишутся только меняемые поля,
+        а строка заказа читается под блокировкой внутри транзакции.
+        """
+        status_id = Repository.get_status_id(status)
+        card_status = StatusKaitenColumnMap[status]
+
+        async with in_transaction():
+            order = await Order.select_for_update().get(id=order_id)
+
+            order.status_id = status_id
+            update_fields = ["status_id"]
+            if payment_status is not None:
+                order.payment_status = payment_status
+                update_fields.append("payment_status")
+            await order.save(update_fields=update_fields)
+
+            # история статусов
+            history = await OrderStatusHistory.create(
+                order=order,
+                status_id=status_id,
+                changed_by=changed_by
+            )
+
+            # Перенос карточки уйдёт в Kaiten через outbox
+            await KaitenOutbox.create(
+                order=order,
+                operation=KaitenOperation.MOVE_COLUMN,
+                payload={"column_id": card_status},
+                idempotency_key=f"order:{order.id}:move_column:{history.id}",
+            )
+
+            # отменённый заказ освобождает машины точки и погашенный промокод
+            if status == OrderStatusName.CANCELED:
+                await capacity_scheduler.release(order.id)
+                await promo_codes.release(order.id)
+
+        logger.info(f"Order {order.id} → {status} by {changed_by}, card move queued")
 
-        order_status_obj = await OrderStatus.get(name=status)
+        return order
 
-        # Самый понятный и надёжный способ:
-        order.status_id = order_status_obj.id
-        order.payment_status = payment_status
+    @staticmethod
+    async def update_payment_status(
+            order_id: int,
+            status: PaymentStatus,
+            payment_id: str | None = None,
+            changed_by: str = "payment",
+    ) -> Optional[Order]:
+        """
+        Итог оплаты: successful_payment из Telegram или вебхук ЮKassa — оба могут прийти
+        по одному платежу и в любом порядке.
+
+        Идемпотентно: статус оплаты меняется условным UPDATE только из незавершённого
+        (pending / waiting_for_capture), повтор и запоздалые события ничего не делают
+        и возвращают None. Исключение — успешная оплата уже отменённого заказа: он
+        помечается refund_pending, и деньги возвращает сверщик оплат. Оплаченный заказ из «ожидает оплаты» переходит в NEW,
+        отменённый платёж отменяет заказ (и освобождает машины точки).
+        """
+        open_statuses = [s for s in (PaymentStatus.PENDING, PaymentStatus.WAITING_FOR_CAPTURE) if s != status]
+        fields = {"payment_status": status}
+        if payment_id:
+            fields["payment_id"] = payment_id
+
+        async with in_transaction():
+            updated = await Order.filter(id=order_id, payment_status__in=open_statuses).update(**fields)
+            if not updated:
+                current = await Order.get_or_none(id=order_id).values_list("payment_status", flat=True)
+                if status == PaymentStatus.SUCCEEDED and current == PaymentStatus.CANCELED and payment_id:
+                    # деньги пришли за уже отменённый заказ — вернёт сверщик оплат (src/services/payment_sweeper.py)
+                    await Order.filter(id=order_id, payment_status=PaymentStatus.CANCELED).update(
+                        payment_status=PaymentStatus.REFUND_PENDING, payment_id=payment_id,
+                    )
+                    logger.warning(f"Order {order_id}: payment {payment_id} succeeded after cancel, refund queued")
+                elif current not in (None, status, PaymentStatus.REFUND_PENDING, PaymentStatus.REFUNDED):
+                    logger.warning(f"Order {order_id}: payment {payment_id} is {status}, order payment is {current}")
+                return None
+
+            order = await Order.get(id=order_id)
+            order_status = {
+                PaymentStatus.SUCCEEDED: OrderStatusName.NEW,
+                PaymentStatus.CANCELED: OrderStatusName.CANCELED,
+            }.get(status)
+            waiting = order.status_id == Repository.get_status_id(OrderStatusName.WAITING_FOR_CAPTURE)
+            if order_status is not None and waiting:
+                order = await Repository.update_order_status(order_id, order_status, changed_by=changed_by)
+
+        logger.info(f"Order {order_id}: payment {payment_id or '-'} → {status}")
+        return order
 
-        await order.save(update_fields=["status_id", "payment_status"])
+    @staticmethod
+    async def get_order_id_by_payment(payment_id: str) -> Optional[int]:
+        return await Order.get_or_none(payment_id=payment_id).values_list("id", flat=True)
 
-        # история статусов
-        await OrderStatusHistory.create(
-            order=order,
-            status=order_status_obj,  # здесь объект — нормально
-            changed_by=changed_by
+    @staticmethod
+    async def add_order_tag(order_id: int, tag: KaitenTagsNames) -> KaitenOutbox:
+        """Поставить в очередь добавление тэга к карточке заказа."""
+        return await KaitenOutbox.create(
+            order_id=order_id,
+            operation=KaitenOperation.ADD_TAG,
+            payload={"tag": tag},
+            idempotency_key=f"order:{order_id}:add_tag:{tag}",
         )
 
-        # Kaiten-логика...
-        with Kaiten() as k:
-            card_status = (
-                KaitenColumns.NEW
-                if status == OrderStatusName.NEW
-                else KaitenColumns.CANCELED
-            )
-            if order.kaiten_card_id:
-                k.change_card_status(order.kaiten_card_id, card_status)
-                logger.info(f"Card {order.kaiten_card_id} → {status}")
+    @staticmethod
+    async def get_courier_orders(statuses: list[OrderStatusName], laundry_point_id: int | None = None) -> list[Order]:
+        """Заказы, которые ждут курьера, с улицами — для планирования рейсов (src/services/courier_routes.py)."""
+        query = Order.filter(status_id__in=[Repository.get_status_id(status) for status in statuses])
+        if laundry_point_id is not None:
+            query = query.filter(laundry_point_id=laundry_point_id)
+        return await query.prefetch_related("street").order_by("id")
+
+    # ── Рассылки ────────────────────────────────────
+    @staticmethod
+    async def get_client_chat_ids(street_id: int | None = None) -> list[int]:
+        """Чаты клиентов для объявлений: всех или живущих на одной улице."""
+        query = Client.all() if street_id is None else Client.filter(street_id=street_id)
+        # в личном чате chat_id совпадает с id пользователя
+        return await query.values_list("telegram_id", flat=True)
 
-        return order
+    # ── Работники ───────────────────────────────────
+    @staticmethod
+    async def get_worker(telegram_id: int) -> Optional[Worker]:
+        return await Worker.get_or_none(telegram_id=telegram_id, is_active=True)
+
+    @staticmethod
+    async def get_worker_orders(statuses: list[OrderStatusName], limit: int = 30) -> list[Order]:
+        """Заказы в работе для списка /work: старые сверху, улица нужна для подписи кнопки."""
+        return await (
+            Order.filter(status_id__in=[Repository.get_status_id(status) for status in statuses])
+            .prefetch_related("street")
+            .order_by("id")
+            .limit(limit)
+        )
+
+    @staticmethod
+    async def set_status_by_worker(order_id: int, status: OrderStatusName, worker: Worker) -> Optional[Order]:
+        """
+        Отметка статуса работником: история пишется с changed_by=worker:<id>.
+        Повторное нажатие той же кнопки ничего не делает и возвращает None.
+        """
+        order = await Order.get(id=order_id)
+        if order.status_id == Repository.get_status_id(status):
+            return None
+        return await Repository.update_order_status(order_id, status, changed_by=worker.changed_by)
+
+    @staticmethod
+    async def add_order_photo(order_id: int, worker: Worker, photo: StoredPhoto) -> OrderPhoto:
+        """Фото привязывается к последней отметке этого работника по заказу."""
+        history = await (
+            OrderStatusHistory.filter(order_id=order_id, changed_by=worker.changed_by)
+            .order_by("-id")
+            .first()
+        )
+        return await OrderPhoto.create(
+            order_id=order_id,
+            history=history,
+            worker=worker,
+            storage_key=photo.key,
+            sha256=photo.sha256,
+            size_bytes=photo.size,
+            content_type=photo.content_type,
+        )
 
     @staticmethod
     async def get_order_by_id(order_id: int) -> Optional[Order]:
         return await (
             Order.filter(id=order_id)
-            .prefetch_related("client", "status", "street")
+            .prefetch_related("client", "status", "street", "items")
             .first()
         )
 
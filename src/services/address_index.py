@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+from src.models import Street
+
+# «д. 7», «дом 7 корп. 1», «7 к1», «7-а», «7/1», «7 стр 2» ...
+_HOUSE_RE = re.compile(
+    r"""
+    ^(?:д\.?|дом)?\s*
+    (?P<number>\d+)
+    (?:\s*-?\s*(?P<letter>[а-я])(?![а-я]))?
+    (?:\s*/\s*(?P<fraction>\d+))?
+    (?:\s*(?:корпус|корп|к)\.?\s*(?P<building>\d+))?
+    (?:\s*(?:строение|стр|с)\.?\s*(?P<structure>\d+))?
+    $""",
+    re.VERBOSE,
+)
+_NUMBER_PREFIX_RE = re.compile(r"\d+")
+
+
+def normalize_house(text: str) -> str | None:
+    """
+    Каноническая запись номера дома: «7 корп 1» -> «7к1», «д. 12-А» -> «12а», «5 стр. 2» -> «5с2».
+    None — если это не похоже на номер дома.
+    """
+    match = _HOUSE_RE.match(text.strip().lower().replace("ё", "е"))
+    if match is None:
+        return None
+
+    house = match["number"].lstrip("0") or "0"
+    if match["letter"]:
+        house += match["letter"]
+    if match["fraction"]:
+        house += f"/{match['fraction']}"
+    if match["building"]:
+        house += f"к{match['building']}"
+    if match["structure"]:
+        house += f"с{match['structure']}"
+    return house
+
+
+def _natural_key(house: str) -> tuple:
+    return tuple(int(part) if part.isdigit() else part for part in re.split(r"(\d+)", house))
+
+
+@dataclass(frozen=True)
+class AddressIndex:
+    """
+    Улицы и дома обслуживаемой зоны в памяти. Строится из streets при загрузке
+    справочников (src/services/reference_cache.py) и целиком подменяется при перезагрузке.
+
+    Дома каждой улицы — отсортированный кортеж нормализованных номеров:
+    проверка и подсказки по префиксу — двоичный поиск, без запросов к БД.
+    Пустой список домов значит «дома улицы ещё не заведены»: принимаем любой номер.
+    """
+    streets: tuple[tuple[int, str], ...] = ()
+    houses: Mapping[int, tuple[str, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, streets: Iterable[Street]) -> AddressIndex:
+        streets = sorted(streets, key=lambda street: street.id)
+        houses = {}
+        for street in streets:
+            normalized = {normalize_house(house) for house in street.houses or []}
+            houses[street.id] = tuple(sorted(normalized - {None}))
+
+        return cls(
+            streets=tuple((street.id, street.name) for street in streets),
+            houses=MappingProxyType(houses),
+        )
+
+    def has_houses(self, street_id: int) -> bool:
+        return bool(self.houses.get(street_id))
+
+    def contains(self, street_id: int, house: str) -> bool:
+        """house — уже нормализованный номер."""
+        houses = self.houses.get(street_id, ())
+        position = bisect_left(houses, house)
+        return position < len(houses) and houses[position] == house
+
+    def suggest(self, street_id: int, text: str, limit: int = 6) -> list[str]:
+        """
+        Дома улицы, начинающиеся с введённого; если таких нет — соседние по номеру.
+        """
+        houses = self.houses.get(street_id, ())
+        if not houses:
+            return []
+
+        prefix = normalize_house(text)
+        if prefix is None:
+            number = _NUMBER_PREFIX_RE.search(text)
+            prefix = number.group() if number else ""
+
+        start = bisect_left(houses, prefix)
+        found = []
+        for house in houses[start:]:
+            if not house.startswith(prefix) or len(found) == limit:
+                break
+            found.append(house)
+
+        if not found:
+            found = list(houses[max(0, start - limit // 2):start + limit - limit // 2])
+        return sorted(found, key=_natural_key)
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+from zoneinfo import ZoneInfo
+
+from tortoise.expressions import F
+
+from src.models import CapacityReservation, LaundryPoint
+from src.enums import ServiceSlug
+from src.services.pricing import Bag, SERVICE_BITS
+from src.settings import CapacitySettings
+
+logger = logging.getLogger(__name__)
+
+IRONING_BIT = 1 << SERVICE_BITS.index(ServiceSlug.IRONING)
+
+MACHINES = "machines"
+DRYERS = "dryers"
+IRONERS = "ironers"
+RESOURCES = (MACHINES, DRYERS, IRONERS)
+
+
+class CapacityError(Exception):
+    """Нет свободных машин/сушилок под заказ к нужному времени."""
+
+
+class FreeSlots:
+    """
+    Свободная мощность ресурса по слотам времени.
+
+    Окно заказа — единицы-десятки слотов, горизонт — сотни, поэтому срезы списка
+    быстрее дерева отрезков (benchmarks/capacity_booking.py), а поиск перескакивает
+    за последний занятый слот окна и не проверяет одни и те же слоты дважды.
+    """
+
+    def __init__(self, values: list[int]):
+        self.values = list(values)
+        self.size = len(self.values)
+
+    def add(self, lo: int, hi: int, delta: int) -> None:
+        values = self.values
+        for i in range(max(lo, 0), min(hi, self.size)):
+            values[i] += delta
+
+    def earliest(self, start: int, length: int, units: int) -> int | None:
+        """Первый слот s >= start, с которого units свободны все length слотов подряд."""
+        values = self.values
+        s = start
+        while s + length <= self.size:
+            window = values[s:s + length]
+            if min(window) >= units:
+                return s
+            # раньше последнего занятого слота окно всё равно упрётся в него
+            s += length - next(i for i, free in enumerate(reversed(window)) if free < units)
+        return None
+
+
+@dataclass(frozen=True)
+class Stage:
+    resource: str
+    units: int
+    start: int  # слоты от начала горизонта
+    end: int
+
+
+@dataclass(frozen=True)
+class Plan:
+    point_id: int
+    stages: tuple[Stage, ...]
+    ready_at: datetime
+    # расписание, по которому план построен, и версия точки после брони (для confirm)
+    epoch: datetime | None = None
+    version: int = 0
+
+
+class PointSchedule:
+    """Свободные машины, сушилки и гладильщики одной точки на горизонт планирования."""
+
+    def __init__(self, point: LaundryPoint, epoch: datetime, settings: CapacitySettings, version: int):
+        self.point = point
+        self.epoch = epoch
+        self.slot = timedelta(minutes=settings.SLOT_MINUTES)
+        self.version = version
+
+        tz = ZoneInfo(settings.TIMEZONE)
+        slots = settings.HORIZON_DAYS * 24 * 60 // settings.SLOT_MINUTES
+        open_slots = [self.is_open((epoch + i * self.slot).astimezone(tz)) for i in range(slots)]
+
+        self.free = {
+            resource: FreeSlots([getattr(point, resource) if is_open else 0 for is_open in open_slots])
+            for resource in RESOURCES
+        }
+
+    def is_open(self, local: datetime) -> bool:
+        return self.point.opens_hour <= local.hour < self.point.closes_hour
+
+    def slot_of(self, moment: datetime) -> int:
+        return max(0, math.ceil((moment - self.epoch) / self.slot))
+
+    def at(self, slot: int) -> datetime:
+        return self.epoch + slot * self.slot
+
+    def _slots(self, minutes: int) -> int:
+        return math.ceil(timedelta(minutes=minutes) / self.slot)
+
+    def plan(self, bags: list[Bag], not_before: datetime) -> Plan | None:
+        """Самый ранний план: стирка, затем сушка, затем глажка — каждая на свободных ресурсах."""
+        point = self.point
+        ironed = sum(1 for bag in bags if bag.mask & IRONING_BIT)
+        demands = [
+            (MACHINES, len(bags), point.wash_minutes),
+            (DRYERS, len(bags), point.dry_minutes),
+            (IRONERS, ironed, point.iron_minutes * ironed),
+        ]
+
+        stages = []
+        start = self.slot_of(not_before)
+        for resource, needed, minutes in demands:
+            # точка без этого этапа (например, без сушки: dry_minutes = 0) его пропускает
+            if not needed or minutes <= 0:
+                continue
+            capacity = getattr(point, resource)
+            if capacity <= 0:
+                return None
+            # пакетов больше, чем машин — стираем в несколько заходов
+            units = min(needed, capacity)
+            if resource == IRONERS:
+                length = self._slots(math.ceil(minutes / units))
+            else:
+                length = self._slots(minutes) * math.ceil(needed / units)
+
+            begin = self.free[resource].earliest(start, length, units)
+            if begin is None:
+                return None
+            stages.append(Stage(resource, units, begin, begin + length))
+            start = begin + length
+
+        return Plan(point_id=point.id, stages=tuple(stages), ready_at=self.at(start), epoch=self.epoch)
+
+    @property
+    def horizon(self) -> datetime:
+        return self.at(self.free[MACHINES].size)
+
+    def apply(self, stages: Iterable[Stage]) -> None:
+        for stage in stages:
+            self.free[stage.resource].add(stage.start, stage.end, -stage.units)
+
+
+class CapacityScheduler:
+    """
+    Бронирование мощностей точки стирки под заказ.
+
+    Расписание точки живёт в памяти: свободная мощность каждого ресурса по слотам.
+    Поиск окна и бронь не читают таблицу броней — она нужна только при загрузке.
+    Изменения самих точек (число машин, часы работы) приходят через NOTIFY geodata_changed.
+
+    Бронирование идёт в транзакции заказа. UPDATE laundry_points.capacity_version
+    блокирует строку точки до COMMIT, так что брони одной точки выполняются по очереди
+    во всех процессах бота. Если вернувшаяся версия не следует за версией в памяти,
+    значит, бронировал другой процесс (или бронь откатилась): расписание перечитывается
+    из capacity_reservations по индексу (laundry_point_id, end_at).
+
+    Расписание в памяти — только закоммиченные брони: reserve() ничего в нём не меняет,
+    бронь учитывает confirm() после COMMIT.
+    """
+
+    CHANNEL = "geodata_changed"
+
+    def __init__(self, settings: CapacitySettings | None = None):
+        self.settings = settings or CapacitySettings()
+        self._schedules: dict[int, PointSchedule] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def local(self, moment: datetime) -> datetime:
+        """Время в часовом поясе точек стирки — для показа клиенту и в карточке."""
+        return moment.astimezone(ZoneInfo(self.settings.TIMEZONE))
+
+    def _epoch(self) -> datetime:
+        today = self.local(datetime.now(timezone.utc)).date()
+        return datetime.combine(today, datetime.min.time(), ZoneInfo(self.settings.TIMEZONE)).astimezone(timezone.utc)
+
+    async def _load(self, point: LaundryPoint, version: int | None = None) -> PointSchedule:
+        version = point.capacity_version if version is None else version
+        schedule = PointSchedule(point, self._epoch(), self.settings, version)
+        reservations = await CapacityReservation.filter(laundry_point_id=point.id, end_at__gt=schedule.epoch)
+        schedule.apply(
+            Stage(reservation.resource, reservation.units,
+                  schedule.slot_of(reservation.start_at), schedule.slot_of(reservation.end_at))
+            for reservation in reservations
+        )
+        self._schedules[point.id] = schedule
+        return schedule
+
+    def invalidate(self, payload: str | None = None) -> None:
+        # расписания строятся лениво — достаточно их забыть
+        if payload in (None, "laundry_points"):
+            self._schedules.clear()
+
+    async def schedule(self, point_id: int) -> PointSchedule:
+        schedule = self._schedules.get(point_id)
+        if schedule is None or schedule.epoch != self._epoch():
+            schedule = await self._load(await LaundryPoint.get(id=point_id))
+        return schedule
+
+    # ── чтение ─────────────────────────────────────
+    async def delivery_options(self, point_id: int, bags: list[Bag], now: datetime | None = None) -> list[datetime]:
+        """Ближайшие часы, к которым заказ успеет: начиная с готовности плюс дорога."""
+        now = now or datetime.now(timezone.utc)
+        schedule = await self.schedule(point_id)
+        plan = schedule.plan(bags, now)
+        if plan is None:
+            return []
+
+        earliest = plan.ready_at + timedelta(minutes=self.settings.DELIVERY_LEAD_MINUTES)
+        first = earliest.replace(minute=0, second=0, microsecond=0)
+        if first < earliest:
+            first += timedelta(hours=1)
+
+        options = []
+        moment = first
+        while len(options) < self.settings.DELIVERY_OPTIONS and moment < schedule.horizon:
+            if schedule.is_open(self.local(moment)):
+                options.append(moment)
+            moment += timedelta(hours=1)
+        return options
+
+    # ── бронирование ───────────────────────────────
+    async def reserve(
+            self,
+            order_id: int,
+            point_id: int,
+            bags: list[Bag],
+            deliver_at: datetime | None = None,
+    ) -> Plan:
+        """
+        Забронировать машины под заказ. Вызывать внутри транзакции заказа,
+        после её COMMIT — confirm(plan).
+        deliver_at — выбранное клиентом время доставки: заказ должен успеть к нему.
+        """
+        lock = self._locks.setdefault(point_id, asyncio.Lock())
+        async with lock:
+            try:
+                return await self._reserve(order_id, point_id, bags, deliver_at)
+            except Exception:
+                # чем бы ни кончилось, расписание в памяти могло разойтись с базой — перечитаем
+                self._schedules.pop(point_id, None)
+                raise
+
+    async def _reserve(self, order_id: int, point_id: int, bags: list[Bag], deliver_at: datetime | None) -> Plan:
+        # блокировка строки точки до конца транзакции + версия расписания
+        await LaundryPoint.filter(id=point_id).update(capacity_version=F("capacity_version") + 1)
+        point = await LaundryPoint.get(id=point_id)
+
+        # в памяти — состояние до нашей брони, то есть версия на единицу меньше
+        schedule = self._schedules.get(point_id)
+        if schedule is None or schedule.version != point.capacity_version - 1 or schedule.epoch != self._epoch():
+            schedule = await self._load(point, point.capacity_version - 1)
+
+        plan = schedule.plan(bags, datetime.now(timezone.utc))
+        lead = timedelta(minutes=self.settings.DELIVERY_LEAD_MINUTES)
+        if plan is None or (deliver_at is not None and plan.ready_at + lead > deliver_at):
+            raise CapacityError("Нет свободных машин к этому времени")
+
+        await CapacityReservation.bulk_create([
+            CapacityReservation(
+                laundry_point_id=point_id,
+                order_id=order_id,
+                resource=stage.resource,
+                units=stage.units,
+                start_at=schedule.at(stage.start),
+                end_at=schedule.at(stage.end),
+            )
+            for stage in plan.stages
+        ])
+        return replace(plan, version=point.capacity_version)
+
+    def confirm(self, plan: Plan) -> None:
+        """Транзакция с бронью закоммичена — учесть бронь в расписании в памяти."""
+        schedule = self._schedules.get(plan.point_id)
+        if schedule is None or schedule.version >= plan.version:
+            # расписания нет или оно перечитано уже после COMMIT и бронь в нём есть
+            return
+        if schedule.version == plan.version - 1 and schedule.epoch == plan.epoch:
+            schedule.apply(plan.stages)
+            schedule.version = plan.version
+        else:
+            # между бронью и COMMIT расписание успело устареть
+            self._schedules.pop(plan.point_id, None)
+
+    async def release(self, order_id: int) -> None:
+        """Снять брони заказа (отмена). Вызывать внутри транзакции смены статуса."""
+        await self.release_many([order_id])
+
+    async def release_many(self, order_ids: list[int]) -> None:
+        """Снять брони пачки заказов: два запроса на пачку плюс сдвиг версии затронутых точек."""
+        point_ids = await (
+            CapacityReservation.filter(order_id__in=order_ids).distinct().values_list("laundry_point_id", flat=True)
+        )
+        if not point_ids:
+            return
+        await CapacityReservation.filter(order_id__in=order_ids).delete()
+        for point_id in point_ids:
+            # другие процессы увидят сдвиг версии и перечитают расписание, этот — сразу
+            await LaundryPoint.filter(id=point_id).update(capacity_version=F("capacity_version") + 1)
+            self._schedules.pop(point_id, None)
+        logger.info(f"Capacity released for {len(order_ids)} orders at points {list(point_ids)}")
+
+
+capacity_scheduler = CapacityScheduler()
@@ -1,10 +1,15 @@
+from __future__ import annotations
+
 import logging
 import httpx
 from typing import Any, Dict, Optional
 
+from tortoise.exceptions import NoValuesFetched
+
 from src.settings import KaitenSettings
-from src.enums import KaitenColumns, KaitenTagsNames, KaitenTagsIds
+from src.enums import KaitenColumns, KaitenTagsNames, KaitenTagsIds, ServiceSlug
 from src.models import Order
+from src.utils.local_time import local_time
 
 logger = logging.getLogger(__name__)
 
@@ -22,33 +27,175 @@ class KaitenAPIError(Exception):
         super().__init__(message or f"Kaiten API error {response.status_code}: {response.text}")
 
 
-class Kaiten:
+class _KaitenBase:
+    """
+    Общая часть синхронного и асинхронного клиентов:
+    настройки, заголовки, сборка payload'ов и описания карточки.
+    Сетевые вызовы живут в наследниках.
+    """
+
     def __init__(
             self,
             timeout: float = 30.0,
+            settings: KaitenSettings | None = None,
     ):
-        self.settings = KaitenSettings()
+        self.settings = settings or KaitenSettings()
+        self.timeout = timeout
 
-        self.base_url = f'https://{self.settings.DOMAIN}.kaiten.ru/api/latest'
+        self.base_url = self.settings.BASE_URL or f'https://{self.settings.DOMAIN}.kaiten.ru/api/latest'
         self.headers = {
             "Accept": "application/json",
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.settings.API_KEY}",
         }
 
+    def _raise_for_status(self, response: httpx.Response) -> None:
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            raise KaitenAPIError(response) from exc
+
+    def _card_payload(
+            self,
+            title: str,
+            description: str = '',
+            column_id: int = KaitenColumns.WAITING_FOR_CAPTURE,
+            owner_id: int | None = None,
+            responsible_id: int | None = None,
+            due_date: str | None = None,
+            tags: list[dict[str, KaitenTagsNames]] | None = None,
+            external_id: str | None = None,
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "title": title,
+            "description": description,
+            "board_id": self.settings.BOARD,
+            "column_id": column_id,
+            "expires_later": False,
+        }
+
+        if owner_id:
+            payload["owner_id"] = owner_id
+        if responsible_id:
+            payload["responsible_id"] = responsible_id
+        if due_date:
+            payload["due_date"] = due_date
+            payload["due_date_time_present"] = False  # если нет времени
+        if tags:
+            payload["tags"] = tags
+        if external_id:
+            # наш ключ идемпотентности: по нему находим карточку, если ответ на создание потерялся
+            payload["external_id"] = external_id
+
+        return payload
+
+    def _cards_params(self, updated_after: str | None, limit: int, offset: int) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"board_id": self.settings.BOARD, "limit": limit, "offset": offset}
+        if updated_after:
+            params["updated_after"] = updated_after
+        return params
+
+    @classmethod
+    def _maker_descriptions(
+            cls,
+            title: str,
+            options: dict[KaitenTagsNames, bool],
+            order: Order
+    ) -> str:
+        """
+        Формирование описание заказа.
+        :param order:
+        :return:
+        """
+        street_name = order.street.name if getattr(order, "street", None) else getattr(order, "street_id", "")
+        delivery = (
+            local_time(order.delivery_exact_time).strftime("%d.%m %H:%M")
+            if order.delivery_exact_time else "—"
+        )
+
+        option_num = 1
+        option_text = ""
+        for op_name, op_status in options.items():
+            if not op_status:
+                continue
+            option_text += f'{option_num}. {op_name.capitalize()}\n'
+            option_num +=1
+
+        return (
+            f"{title}\n"
+            f"- Адрес: {street_name}, дом {order.house or ''}, квартира {order.apartment}, подъезд {order.entrance or '—'}, этаж {order.floor or '—'}\n"
+            f"- Телефон: {order.client.phone or '—'}\n"
+            f"- Имя: {order.client.name or '—'}\n"
+            f"- Телеграм id: {order.client.telegram_id or '—'}\n"
+            f"- Стоимость: {order.total_price_rub} руб\n"
+            f"- Доставка к: {delivery}\n"
+            f"- Комментарий: {order.comment or '—'}\n\n"
+            f"{cls._bags_description(order)}"
+            f"**Дополнительно**\n"
+            f"{option_text}"
+        )
+
+    @staticmethod
+    def _bags_description(order: Order) -> str:
+        """Пакеты заказа с их опциями; пусто, если пакеты не подгружены (prefetch_related("items"))."""
+        try:
+            items = sorted(order.items, key=lambda item: item.position)
+        except NoValuesFetched:
+            return ""
+
+        bags_text = f"**Пакеты: {order.bags_count}, {order.weight_kg} кг**\n"
+        for item in items:
+            options = [KaitenTagsNames[slug.name] for slug in ServiceSlug if getattr(item, slug, False)]
+            bags_text += f"{item.position}. {item.weight_kg} кг, {item.price_rub} руб: {', '.join(options) or 'без опций'}\n"
+
+        return f"{bags_text}\n"
+
+    @classmethod
+    def _order_card(cls, order: Order) -> Dict[str, Any]:
+        """
+        Заголовок, описание и тэги карточки для заказа.
+        :param order:
+        :return:
+        """
+        options = {
+            KaitenTagsNames.IRONING: order.ironing,
+            KaitenTagsNames.UV: order.uv,
+            KaitenTagsNames.VACUUM_PACK: order.vacuum_pack,
+            KaitenTagsNames.WASH_BAG: order.wash_bag,
+            KaitenTagsNames.CONDITIONER: order.conditioner,
+            KaitenTagsNames.EXACT_TIME: order.delivery_exact_time,
+        }
+        tags = [{'name': op_name} for op_name, op_status in options.items() if op_status]
+        title = f'Заказ #{order.id}'
+        description = cls._maker_descriptions(title, options, order)
+
+        return {'title': title, 'description': description, 'tags': tags}
+
+    @staticmethod
+    async def _save_card_id(order: Order, card_id: int | None) -> None:
+        # Добавляем id карточки в поле заказа: один UPDATE, без повторного чтения строки
+        if card_id:
+            await Order.filter(id=order.id).update(kaiten_card_id=card_id)
+            order.kaiten_card_id = card_id
+
+
+class Kaiten(_KaitenBase):
+    def __init__(
+            self,
+            timeout: float = 30.0,
+            settings: KaitenSettings | None = None,
+            transport: httpx.BaseTransport | None = None,
+    ):
+        super().__init__(timeout=timeout, settings=settings)
+
         self.client = httpx.Client(
             base_url=self.base_url,
             headers=self.headers,
             timeout=timeout,
             follow_redirects=True,
+            transport=transport,
         )
 
-    def _raise_for_status(self, response: httpx.Response) -> None:
-        try:
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            raise KaitenAPIError(response) from exc
-
     def add_tags_to_card(
             self,
             card_id: int,
@@ -84,6 +231,7 @@ class Kaiten:
             responsible_id: int | None = None,
             due_date: str | None = None,  # формат YYYY-MM-DD
             tags: list[dict[str, KaitenTagsNames]] | None = None,
+            external_id: str | None = None,
     ) -> Dict[str, Any]:
         """
         Создаёт новую карточку в указанной колонке.
@@ -91,28 +239,35 @@ class Kaiten:
         Основные обязательные поля: title, board_id, column_id.
         Остальные — по необходимости (см. пример curl).
         """
-        payload: Dict[str, Any] = {
-            "title": title,
-            "description": description,
-            "board_id": self.settings.BOARD,
-            "column_id": column_id,
-            "expires_later": False,
-        }
-
-        if owner_id:
-            payload["owner_id"] = owner_id
-        if responsible_id:
-            payload["responsible_id"] = responsible_id
-        if due_date:
-            payload["due_date"] = due_date
-            payload["due_date_time_present"] = False  # если нет времени
-        if tags:
-            payload["tags"] = tags
+        payload = self._card_payload(
+            title=title,
+            description=description,
+            column_id=column_id,
+            owner_id=owner_id,
+            responsible_id=responsible_id,
+            due_date=due_date,
+            tags=tags,
+            external_id=external_id,
+        )
 
         response = self.client.post("/cards", json=payload)
         self._raise_for_status(response)
         return response.json()
 
+    def add_checklist(self, card_id: int, name: str, items: list[str]) -> Dict[str, Any]:
+        """Чек-лист на карточке: сначала сам список, затем пункты по порядку."""
+        response = self.client.post(f"/cards/{card_id}/checklists", json={"name": name})
+        self._raise_for_status(response)
+        checklist = response.json()
+
+        for sort_order, text in enumerate(items, start=1):
+            response = self.client.post(
+                f"/cards/{card_id}/checklists/{checklist['id']}/items",
+                json={"text": text, "sort_order": sort_order},
+            )
+            self._raise_for_status(response)
+        return checklist
+
     def get_board_columns(self) -> list[Dict[str, Any]]:
         """Получить список колонок на доске — удобно для поиска column_id по названию."""
         response = self.client.get(f"/boards/{self.settings.BOARD}/columns")
@@ -124,6 +279,17 @@ class Kaiten:
         self._raise_for_status(response)
         return response.json()
 
+    def get_cards(
+            self,
+            updated_after: str | None = None,
+            limit: int = 100,
+            offset: int = 0,
+    ) -> list[Dict[str, Any]]:
+        """Карточки доски постранично; updated_after (ISO) — только изменённые после момента."""
+        response = self.client.get("/cards", params=self._cards_params(updated_after, limit, offset))
+        self._raise_for_status(response)
+        return response.json()
+
     def get_tags(self) -> list[Dict[str, Any]]:
         """Получить все теги (для поиска tag_id по названию)."""
         response = self.client.get("/tags")
@@ -139,69 +305,178 @@ class Kaiten:
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
         self.close()
 
-
-    @classmethod
-    def _maker_descriptions(
-            cls,
-            title: str,
-            options: dict[KaitenTagsNames, bool],
-            order: Order
-    ) -> str:
+    async def add_card_to_order(self, order: Order) -> int:
         """
-        Формирование описание заказа.
+        Создание карточки с доставкой и добавление её id в заказ.
         :param order:
         :return:
         """
-        street_name = order.street.name if getattr(order, "street", None) else getattr(order, "street_id", "")
+        card = self.create_card(**self._order_card(order))
+        card_id = card.get("id")
 
-        option_num = 1
-        option_text = ""
-        for op_name, op_status in options.items():
-            if not op_status:
-                continue
-            option_text += f'{option_num}. {op_name.capitalize()}\n'
-            option_num +=1
+        await self._save_card_id(order, card_id)
 
-        return (
-            f"{title}\n"
-            f"- Адрес: {street_name}, дом {order.house or ''}, квартира {order.apartment}, подъезд {order.entrance or '—'}, этаж {order.floor or '—'}\n"
-            f"- Телефон: {order.client.phone or '—'}\n"
-            f"- Имя: {order.client.name or '—'}\n"
-            f"- Телеграм id: {order.client.telegram_id or '—'}\n"
-            f"- Стоимость: {order.total_price_rub} руб\n"
-            f"- Комментарий: {order.comment or '—'}\n\n"
-            f"**Дополнительно**\n"
-            f"{option_text}"
-        )
+        return card_id
 
 
-    async def add_card_to_order(self, order: Order) -> int:
+class AsyncKaiten(_KaitenBase):
+    """
+    Асинхронный вариант Kaiten на httpx.AsyncClient.
+    API тот же, но все сетевые методы — корутины,
+    поэтому ожидание ответа Kaiten не блокирует event loop бота.
+    """
+
+    def __init__(
+            self,
+            timeout: float = 30.0,
+            settings: KaitenSettings | None = None,
+            transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        super().__init__(timeout=timeout, settings=settings)
+
+        # Клиент рассчитан на долгую жизнь (см. src/bot/main.on_startup):
+        # keep-alive пул и HTTP/2 убирают TLS-рукопожатие с каждого заказа.
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=transport,
+            http2=self.settings.HTTP2,
+            limits=httpx.Limits(
+                max_connections=self.settings.MAX_CONNECTIONS,
+                max_keepalive_connections=self.settings.MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=self.settings.KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def add_tags_to_card(
+            self,
+            card_id: int,
+            tag: KaitenTagsNames
+    ):
         """
-        Создание карточки с доставкой и добавление её id в заказ.
-        :param order:
+        Добавление тэга к карточки.
+        Почему-то можно добавлять только по 1 тэгу за раз.
+
+        :param card_id:
+        :param tag:
         :return:
         """
+        response = await self.client.post(f"/cards/{card_id}/tags", json={'name': tag})
+        self._raise_for_status(response)
+        return response.json()
 
-        options = {
-            KaitenTagsNames.IRONING: order.ironing,
-            KaitenTagsNames.UV: order.uv,
-            KaitenTagsNames.VACUUM_PACK: order.vacuum_pack,
-            KaitenTagsNames.WASH_BAG: order.wash_bag,
-            KaitenTagsNames.CONDITIONER: order.conditioner,
-            KaitenTagsNames.EXACT_TIME: order.delivery_exact_time,
-        }
-        tags = [{'name': op_name} for op_name, op_status in options.items() if op_status]
-        title = f'Заказ #{order.id}'
-        description = self._maker_descriptions(title, options, order)
+    async def change_card_status(
+            self,
+            card_id: int,
+            status: KaitenColumns = KaitenColumns.NEW,
+    ):
+        response = await self.client.patch(f"/cards/{card_id}", json={'column_id': status})
+        self._raise_for_status(response)
+        return response.json()
+
+    async def create_card(
+            self,
+            title: str,
+            description: str = '',
+            column_id: int = KaitenColumns.WAITING_FOR_CAPTURE,
+            owner_id: int | None = None,
+            responsible_id: int | None = None,
+            due_date: str | None = None,  # формат YYYY-MM-DD
+            tags: list[dict[str, KaitenTagsNames]] | None = None,
+            external_id: str | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Создаёт новую карточку в указанной колонке.
+        См. Kaiten.create_card.
+        """
+        payload = self._card_payload(
+            title=title,
+            description=description,
+            column_id=column_id,
+            owner_id=owner_id,
+            responsible_id=responsible_id,
+            due_date=due_date,
+            tags=tags,
+            external_id=external_id,
+        )
 
+        response = await self.client.post("/cards", json=payload)
+        self._raise_for_status(response)
+        return response.json()
 
-        card = self.create_card(title=title, description=description, tags=tags)
+    async def add_checklist(self, card_id: int, name: str, items: list[str]) -> Dict[str, Any]:
+        """Чек-лист на карточке: сначала сам список, затем пункты по порядку."""
+        response = await self.client.post(f"/cards/{card_id}/checklists", json={"name": name})
+        self._raise_for_status(response)
+        checklist = response.json()
+
+        for sort_order, text in enumerate(items, start=1):
+            response = await self.client.post(
+                f"/cards/{card_id}/checklists/{checklist['id']}/items",
+                json={"text": text, "sort_order": sort_order},
+            )
+            self._raise_for_status(response)
+        return checklist
+
+    async def get_board_columns(self) -> list[Dict[str, Any]]:
+        """Получить список колонок на доске — удобно для поиска column_id по названию."""
+        response = await self.client.get(f"/boards/{self.settings.BOARD}/columns")
+        self._raise_for_status(response)
+        return response.json()
+
+    async def get_card(self, card_id: int) -> Dict[str, Any]:
+        response = await self.client.get(f"/cards/{card_id}")
+        self._raise_for_status(response)
+        return response.json()
+
+    async def get_cards(
+            self,
+            updated_after: str | None = None,
+            limit: int = 100,
+            offset: int = 0,
+    ) -> list[Dict[str, Any]]:
+        """Карточки доски постранично; updated_after (ISO) — только изменённые после момента."""
+        response = await self.client.get("/cards", params=self._cards_params(updated_after, limit, offset))
+        self._raise_for_status(response)
+        return response.json()
+
+    async def find_card(self, external_id: str) -> Dict[str, Any] | None:
+        """Карточка доски с нашим external_id, если она уже создана."""
+        response = await self.client.get(
+            "/cards", params={"board_id": self.settings.BOARD, "external_id": external_id, "limit": 10},
+        )
+        self._raise_for_status(response)
+        # совпадение проверяем сами: без фильтра по external_id API вернул бы любые карточки доски
+        return next((card for card in response.json() if card.get("external_id") == external_id), None)
+
+    async def get_tags(self) -> list[Dict[str, Any]]:
+        """Получить все теги (для поиска tag_id по названию)."""
+        response = await self.client.get("/tags")
+        self._raise_for_status(response)
+        return response.json()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self) -> AsyncKaiten:
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def add_card_to_order(self, order: Order, external_id: str | None = None) -> int:
+        """
+        Создание карточки с доставкой и добавление её id в заказ.
+        :param order:
+        :param external_id: ключ идемпотентности, по нему карточку потом можно найти (find_card)
+        :return:
+        """
+        card = await self.create_card(**self._order_card(order), external_id=external_id)
         card_id = card.get("id")
 
-        # Добавляем id карточки в поле заказа
-        if card_id:
-            fresh = await Order.get(id=order.id)
-            fresh.kaiten_card_id = card_id
-            await fresh.save(update_fields=["kaiten_card_id"])
+        await self._save_card_id(order, card_id)
 
         return card_id
+
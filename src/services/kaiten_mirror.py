@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+from src.enums import KaitenColumns
+from src.services.kaiten_kanban import AsyncKaiten
+
+logger = logging.getLogger(__name__)
+
+# (новое состояние, предыдущее или None)
+CardListener = Callable[["MirrorCard", "MirrorCard | None"], None]
+
+
+def card_moved_at(card: Dict[str, Any]) -> str:
+    return card.get("column_changed_at") or card.get("last_moved_at") or ""
+
+
+@dataclass(frozen=True)
+class MirrorCard:
+    id: int
+    column_id: int
+    title: str
+    tags: tuple[str, ...]
+    updated: str  # ISO-время последнего изменения в Kaiten
+    moved_at: str = ""  # ISO-время последнего переноса между колонками
+
+    @classmethod
+    def from_api(cls, card: Dict[str, Any]) -> MirrorCard:
+        return cls(
+            id=int(card["id"]),
+            column_id=int(card.get("column_id") or 0),
+            title=card.get("title") or "",
+            tags=tuple(t.get("name") for t in card.get("tags") or [] if t.get("name")),
+            updated=card.get("updated") or "",
+            moved_at=card_moved_at(card),
+        )
+
+
+class KaitenBoardMirror:
+    """
+    Локальная копия доски Kaiten: карточки, колонки и тэги по id.
+
+    Свежесть держится вебхуками (src/api/kaiten.py -> apply_card / remove_card)
+    и страховочным инкрементальным опросом get_cards(updated_after=...),
+    чтобы чтение статуса карточки не требовало запроса к API.
+    """
+
+    def __init__(
+            self,
+            kaiten: AsyncKaiten,
+            poll_interval: float = 60.0,
+            page_size: int = 100,
+    ):
+        self.kaiten = kaiten
+        self.poll_interval = poll_interval
+        self.page_size = page_size
+
+        self.cards: dict[int, MirrorCard] = {}
+        self.columns: dict[int, Dict[str, Any]] = {}
+        self.tags: dict[int, Dict[str, Any]] = {}
+
+        self._cursor: str | None = None
+        self._task: asyncio.Task | None = None
+        self._listeners: list[CardListener] = []
+
+    def subscribe(self, listener: CardListener) -> None:
+        """Слушатель вызывается синхронно на каждое реальное изменение карточки."""
+        self._listeners.append(listener)
+
+    # ── чтение ─────────────────────────────────────
+    def get_card(self, card_id: int) -> MirrorCard | None:
+        return self.cards.get(card_id)
+
+    def card_column(self, card_id: int) -> int | None:
+        card = self.cards.get(card_id)
+        return card.column_id if card else None
+
+    # ── обновление ─────────────────────────────────
+    def apply_card(self, card: Dict[str, Any]) -> MirrorCard | None:
+        """
+        Применить состояние карточки из вебхука или опроса.
+        Устаревшее (по полю updated) состояние игнорируется.
+        Возвращает карточку, если зеркало изменилось.
+        """
+        if card.get("archived") or card.get("board_id") not in (None, self.kaiten.settings.BOARD):
+            self.remove_card(int(card["id"]))
+            return None
+
+        fresh = MirrorCard.from_api(card)
+        current = self.cards.get(fresh.id)
+        if current is not None and fresh.updated and fresh.updated < current.updated:
+            return None
+        if current == fresh:
+            return None
+
+        self.cards[fresh.id] = fresh
+        if fresh.updated and (self._cursor is None or fresh.updated > self._cursor):
+            self._cursor = fresh.updated
+
+        for listener in self._listeners:
+            try:
+                listener(fresh, current)
+            except Exception:
+                logger.exception(f"Kaiten mirror: listener failed on card {fresh.id}")
+        return fresh
+
+    def remove_card(self, card_id: int) -> None:
+        self.cards.pop(card_id, None)
+
+    async def refresh_columns(self) -> None:
+        self.columns = {int(c["id"]): c for c in await self.kaiten.get_board_columns()}
+
+    async def refresh_tags(self) -> None:
+        self.tags = {int(t["id"]): t for t in await self.kaiten.get_tags()}
+
+    def validate_columns(self) -> set[KaitenColumns]:
+        """
+        Сверить KaitenColumns с реальными колонками доски.
+        Вызывается один раз при старте; возвращает отсутствующие на доске значения.
+        """
+        missing = {column for column in KaitenColumns if int(column) not in self.columns}
+        for column in missing:
+            logger.error(f"KaitenColumns.{column.name}={column.value} не найдена на доске {self.kaiten.settings.BOARD}")
+        return missing
+
+    async def poll(self) -> int:
+        """Догрузить карточки, изменённые после последнего известного момента."""
+        cursor = self._cursor
+        changed = 0
+        offset = 0
+
+        while True:
+            page = await self.kaiten.get_cards(updated_after=cursor, limit=self.page_size, offset=offset)
+            for card in page:
+                if self.apply_card(card) is not None:
+                    changed += 1
+            if len(page) < self.page_size:
+                break
+            offset += self.page_size
+
+        return changed
+
+    # ── жизненный цикл ─────────────────────────────
+    async def start(self) -> None:
+        try:
+            await self.refresh_columns()
+            await self.refresh_tags()
+            self.validate_columns()
+            await self.poll()
+            logger.info(f"Kaiten mirror: {len(self.cards)} cards, {len(self.columns)} columns, {len(self.tags)} tags")
+        except Exception:
+            # Бот должен подняться и при недоступном Kaiten — догрузим опросом
+            logger.exception("Kaiten mirror: начальная синхронизация не удалась")
+
+        self._task = asyncio.create_task(self._poll_forever(), name="kaiten-mirror")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _poll_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                changed = await self.poll()
+                if changed:
+                    logger.info(f"Kaiten mirror: poll picked up {changed} cards missed by webhooks")
+            except Exception:
+                logger.exception("Kaiten mirror: ошибка опроса")
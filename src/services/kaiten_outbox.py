@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable
+
+import httpx
+from tortoise.functions import Max
+from tortoise.transactions import in_transaction
+
+from src.enums import KaitenOperation, OutboxStatus
+from src.models import KaitenOutbox, Order
+from src.services.kaiten_kanban import AsyncKaiten, KaitenAPIError
+from src.services.kaiten_scheduler import KaitenWriteScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDeferred(Exception):
+    """Операцию пока нельзя выполнить (например, карточка ещё не создана) — попробуем позже."""
+
+
+class KaitenOutboxWorker:
+    """
+    Фоновый разбор kaiten_outbox.
+
+    Пачка готовых к выполнению записей забирается короткой транзакцией
+    (SELECT ... FOR UPDATE SKIP LOCKED и сдвиг next_attempt_at на время аренды), запросы
+    к Kaiten идут уже без транзакции и блокировок, результаты пишутся второй транзакцией.
+    Если процесс упал посреди пачки, записи вернутся в разбор, когда истечёт аренда.
+    Карточки создаются по порядку id, переносы и тэги всей пачки разом уходят
+    в KaitenWriteScheduler, который склеивает их по карточкам и держит лимит запросов.
+    Ошибки сети и 5xx/429 — повтор с экспоненциальной задержкой,
+    остальные 4xx и исчерпанные попытки — статус failed. Операции заказа,
+    карточка которого так и не создалась, тоже переходят в failed.
+    """
+
+    def __init__(
+            self,
+            kaiten: AsyncKaiten,
+            scheduler: KaitenWriteScheduler,
+            batch_size: int = 100,
+            poll_interval: float = 1.0,
+            max_attempts: int = 10,
+            base_backoff: float = 2.0,
+            max_backoff: float = 300.0,
+            lease: float = 120.0,
+    ):
+        self.kaiten = kaiten
+        self.scheduler = scheduler
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    # ── жизненный цикл ─────────────────────────────
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self.run(), name="kaiten-outbox")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = await self.drain_once()
+                if processed:
+                    m = self.scheduler.metrics()
+                    logger.info(
+                        f"Kaiten outbox: {processed} ops, queue={m.queue_depth}, "
+                        f"in_flight={m.in_flight}, rps={m.rps:.1f}, coalesced={m.coalesced_total}"
+                    )
+            except Exception:
+                logger.exception("Kaiten outbox: ошибка при разборе очереди")
+                processed = 0
+
+            # Очередь пуста — ждём следующий опрос (или остановку)
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    # ── обработка ──────────────────────────────────
+    async def drain_once(self) -> int:
+        entries = await self._claim()
+        if not entries:
+            return 0
+
+        # Сначала создаём карточки: от них зависят остальные операции пачки
+        creates = [e for e in entries if e.operation == KaitenOperation.CREATE_CARD]
+        others = [e for e in entries if e.operation != KaitenOperation.CREATE_CARD]
+
+        await asyncio.gather(*(self._process(entry, self._create_card(entry)) for entry in creates))
+
+        # Id карточек одним запросом; задачи ставятся в планировщик синхронно,
+        # в порядке id, поэтому «последний перенос» действительно последний
+        card_ids = dict(
+            await Order.filter(id__in={e.order_id for e in others})
+            .values_list("id", "kaiten_card_id")
+        ) if others else {}
+        latest_moves = await self._latest_moves(others)
+        submitted = [
+            self._submit(entry, card_ids.get(entry.order_id), latest_moves.get(entry.order_id)) for entry in others
+        ]
+        deferred = await asyncio.gather(*(
+            self._process(entry, operation) for entry, operation in zip(others, submitted)
+        ))
+        await self._fail_orphans([entry for entry, waits in zip(others, deferred) if waits])
+
+        async with in_transaction() as conn:
+            for entry in entries:
+                await entry.save(
+                    using_db=conn,
+                    update_fields=["status", "attempts", "next_attempt_at", "last_error", "processed_at"],
+                )
+
+        return len(entries)
+
+    @staticmethod
+    async def _latest_moves(entries: list[KaitenOutbox]) -> dict[int, int]:
+        """Id последнего переноса по каждому заказу пачки — в том числе ещё не взятого в разбор."""
+        order_ids = {e.order_id for e in entries if e.operation == KaitenOperation.MOVE_COLUMN}
+        if not order_ids:
+            return {}
+        return dict(
+            await KaitenOutbox.filter(order_id__in=order_ids, operation=KaitenOperation.MOVE_COLUMN)
+            .annotate(last_id=Max("id"))
+            .group_by("order_id")
+            .values_list("order_id", "last_id")
+        )
+
+    async def _claim(self) -> list[KaitenOutbox]:
+        """Забрать пачку в аренду: до её конца другие разборщики эти записи не увидят."""
+        now = datetime.now(timezone.utc)
+        async with in_transaction() as conn:
+            entries = await (
+                KaitenOutbox.filter(status=OutboxStatus.PENDING, next_attempt_at__lte=now)
+                .order_by("id")
+                .limit(self.batch_size)
+                .select_for_update(skip_locked=True)
+                .using_db(conn)
+            )
+            if entries:
+                await (
+                    KaitenOutbox.filter(id__in=[e.id for e in entries])
+                    .using_db(conn)
+                    .update(next_attempt_at=now + timedelta(seconds=self.lease))
+                )
+        return entries
+
+    async def _process(self, entry: KaitenOutbox, operation: Awaitable) -> bool:
+        """True — операция отложена до создания карточки."""
+        try:
+            await operation
+        except OutboxDeferred as exc:
+            # Не ошибка: ждём, пока выполнится предыдущая операция по заказу
+            entry.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=self.poll_interval)
+            entry.last_error = str(exc)
+            return True
+        except Exception as exc:
+            self._schedule_retry(entry, exc)
+            return False
+
+        entry.status = OutboxStatus.DONE
+        entry.processed_at = datetime.now(timezone.utc)
+        entry.last_error = None
+        return False
+
+    async def _fail_orphans(self, deferred: list[KaitenOutbox]) -> None:
+        """Ждать карточку есть смысл, только пока её создание ещё в очереди."""
+        if not deferred:
+            return
+        waiting = set(await KaitenOutbox.filter(
+            order_id__in={e.order_id for e in deferred},
+            operation=KaitenOperation.CREATE_CARD,
+            status=OutboxStatus.PENDING,
+        ).values_list("order_id", flat=True))
+
+        for entry in deferred:
+            if entry.order_id in waiting:
+                continue
+            entry.status = OutboxStatus.FAILED
+            entry.processed_at = datetime.now(timezone.utc)
+            entry.last_error = f"Kaiten card for order {entry.order_id} will not be created"
+            logger.error(f"Kaiten outbox #{entry.id} ({entry.operation}) failed: {entry.last_error}")
+
+    def _schedule_retry(self, entry: KaitenOutbox, exc: Exception) -> None:
+        entry.attempts += 1
+        entry.last_error = str(exc)[:1000]
+
+        if isinstance(exc, KaitenAPIError):
+            permanent = 400 <= exc.status_code < 500 and exc.status_code != 429
+        else:
+            # сетевые сбои повторяем, всё остальное (битый payload, удалённый заказ) — нет
+            permanent = not isinstance(exc, httpx.HTTPError)
+
+        if permanent or entry.attempts >= self.max_attempts:
+            entry.status = OutboxStatus.FAILED
+            entry.processed_at = datetime.now(timezone.utc)
+            logger.error(f"Kaiten outbox #{entry.id} ({entry.operation}) failed: {exc}")
+            return
+
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (entry.attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        entry.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        logger.warning(f"Kaiten outbox #{entry.id} ({entry.operation}) retry in {delay:.1f}s: {exc}")
+
+    # Все операции идемпотентны: повтор после сбоя не создаёт дублей.
+    async def _create_card(self, entry: KaitenOutbox) -> None:
+        order = await Order.get(id=entry.order_id).prefetch_related("client", "street", "items")
+        if order.kaiten_card_id:
+            return  # карточка уже создана прошлой попыткой
+
+        # ответ на прошлую попытку мог потеряться (или не записался результат) —
+        # тогда карточка с нашим ключом в Kaiten уже есть
+        card = await self.scheduler.call(self.kaiten.find_card, entry.idempotency_key)
+        if card is not None:
+            await Order.filter(id=order.id).update(kaiten_card_id=card["id"])
+            return
+        await self.scheduler.call(self.kaiten.add_card_to_order, order, entry.idempotency_key)
+
+    def _submit(self, entry: KaitenOutbox, card_id: int | None, latest_move: int | None = None) -> Awaitable:
+        if entry.operation == KaitenOperation.MOVE_COLUMN and latest_move is not None and entry.id < latest_move:
+            # есть перенос новее: этот (например, повтор после ошибки) вернул бы карточку в старую колонку
+            return self._skip()
+
+        if not card_id:
+            return self._fail(OutboxDeferred(f"Order {entry.order_id} has no Kaiten card yet"))
+
+        if entry.operation == KaitenOperation.MOVE_COLUMN:
+            return self.scheduler.submit_move(card_id, entry.payload["column_id"])
+        if entry.operation == KaitenOperation.ADD_TAG:
+            # планировщик сам пропустит тэги, которые уже стоят на карточке
+            return self.scheduler.submit_tag(card_id, entry.payload["tag"])
+
+        return self._fail(ValueError(f"Unknown Kaiten operation: {entry.operation}"))
+
+    @staticmethod
+    async def _fail(exc: Exception) -> None:
+        raise exc
+
+    @staticmethod
+    async def _skip() -> None:
+        pass
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from src.enums import KaitenColumns, KaitenTagsNames
+from src.services.kaiten_kanban import AsyncKaiten, KaitenAPIError
+from src.services.kaiten_mirror import card_moved_at
+from src.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CardOps:
+    """Накопленные, ещё не отправленные изменения одной карточки."""
+    column_id: KaitenColumns | str | None = None
+    tags: dict[str, None] = field(default_factory=dict)  # упорядоченное множество
+    waiters: list[asyncio.Future] = field(default_factory=list)
+    # переносы, которые перекрыл более поздний: их колонка уже не нужна, и повторять их
+    # после ошибки нельзя — старый перенос мог бы лечь поверх нового
+    superseded: list[asyncio.Future] = field(default_factory=list)
+    move_waiter: asyncio.Future | None = None
+
+
+@dataclass
+class _Move:
+    column_id: int
+    at: float            # time.monotonic() отправки
+    moved_at: str = ""   # column_changed_at из ответа Kaiten; пусто, пока ответа нет
+
+
+class RecentMoves:
+    """
+    Переносы, отправленные самим ботом.
+    Kaiten присылает на них такие же вебхуки, как на ручные переносы,
+    и синхронизация статусов должна такое эхо отбрасывать.
+
+    Эхо — это ровно наш перенос: та же колонка и то же время переноса, что вернул
+    Kaiten в ответ на PATCH. Ручной перенос в ту же колонку позже — уже другое событие.
+    Пока ответа нет (вебхук обогнал его), сверяем только колонку; окно короткое,
+    чтобы несостоявшийся перенос не прятал чужие.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._moves: dict[int, list[_Move]] = {}
+
+    def record(self, card_id: int, column_id: KaitenColumns | str | int) -> _Move:
+        move = _Move(int(column_id), time.monotonic())
+        self._moves.setdefault(card_id, []).append(move)
+        return move
+
+    @staticmethod
+    def confirm(move: _Move, moved_at: str) -> None:
+        move.moved_at = moved_at
+
+    def forget(self, card_id: int, move: _Move) -> None:
+        moves = self._moves.get(card_id)
+        if moves and move in moves:
+            moves.remove(move)
+            if not moves:
+                del self._moves[card_id]
+
+    def pop_echo(self, card_id: int, column_id: KaitenColumns | str | int, moved_at: str = "") -> bool:
+        """True, если это событие — недавний перенос бота (запись при этом гасится)."""
+        moves = self._moves.pop(card_id, None)
+        if not moves:
+            return False
+
+        now = time.monotonic()
+        fresh = [move for move in moves if now - move.at <= self.ttl]
+
+        echo = False
+        for move in fresh:
+            if move.column_id != int(column_id):
+                continue
+            if move.moved_at and moved_at and move.moved_at != moved_at:
+                continue
+            fresh.remove(move)
+            echo = True
+            break
+
+        if fresh:
+            self._moves[card_id] = fresh
+        return echo
+
+    def prune(self) -> None:
+        now = time.monotonic()
+        for card_id in [c for c, moves in self._moves.items() if now - moves[-1].at > self.ttl]:
+            del self._moves[card_id]
+
+
+@dataclass(frozen=True)
+class SchedulerMetrics:
+    queue_depth: int        # карточек с неотправленными изменениями
+    in_flight: int          # карточек, которые обрабатываются прямо сейчас
+    requests_total: int
+    coalesced_total: int    # операций, поглощённых более поздними
+    errors_total: int
+    rps: float              # фактических запросов в секунду за последнее окно
+
+
+class KaitenWriteScheduler:
+    """
+    Планировщик записей в Kaiten.
+
+    - изменения одной карточки склеиваются: из нескольких переносов уходит только последний,
+      тэги собираются в множество и проверяются одним get_card;
+    - разные карточки обрабатываются параллельно (не больше `parallelism`),
+      одна и та же — строго последовательно;
+    - каждый запрос берёт токен из общего TokenBucket, чтобы не упереться в лимиты Kaiten.
+    """
+
+    def __init__(
+            self,
+            kaiten: AsyncKaiten,
+            rate: float = 5.0,
+            burst: int = 10,
+            parallelism: int = 4,
+            metrics_window: float = 10.0,
+    ):
+        self.kaiten = kaiten
+        self.bucket = TokenBucket(rate, burst)
+        self.parallelism = parallelism
+        self.metrics_window = metrics_window
+
+        self._pending: dict[int, _CardOps] = {}
+        self._active: set[int] = set()
+        self._ready: asyncio.Queue[int] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+
+        self.recent_moves = RecentMoves()
+
+        self._requests_total = 0
+        self._coalesced_total = 0
+        self._errors_total = 0
+        self._request_times: deque[float] = deque()
+
+    # ── жизненный цикл ─────────────────────────────
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"kaiten-scheduler-{i}")
+            for i in range(self.parallelism)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        for ops in self._pending.values():
+            for waiter in ops.waiters + ops.superseded:
+                if not waiter.done():
+                    waiter.cancel()
+        self._pending.clear()
+
+    # ── постановка задач ───────────────────────────
+    def _ops_for(self, card_id: int) -> _CardOps:
+        ops = self._pending.get(card_id)
+        if ops is None:
+            ops = self._pending[card_id] = _CardOps()
+            # Активная карточка сама встанет в очередь после текущего запроса
+            if card_id not in self._active:
+                self._ready.put_nowait(card_id)
+        return ops
+
+    def submit_move(self, card_id: int, column_id: KaitenColumns | str) -> asyncio.Future:
+        ops = self._ops_for(card_id)
+        if ops.move_waiter is not None:
+            self._coalesced_total += 1
+            ops.waiters.remove(ops.move_waiter)
+            ops.superseded.append(ops.move_waiter)
+        ops.column_id = column_id
+
+        waiter = asyncio.get_running_loop().create_future()
+        ops.waiters.append(waiter)
+        ops.move_waiter = waiter
+        return waiter
+
+    def submit_tag(self, card_id: int, tag: KaitenTagsNames | str) -> asyncio.Future:
+        ops = self._ops_for(card_id)
+        if tag in ops.tags:
+            self._coalesced_total += 1
+        ops.tags[tag] = None
+
+        waiter = asyncio.get_running_loop().create_future()
+        ops.waiters.append(waiter)
+        return waiter
+
+    async def move(self, card_id: int, column_id: KaitenColumns | str) -> None:
+        await self.submit_move(card_id, column_id)
+
+    async def add_tag(self, card_id: int, tag: KaitenTagsNames | str) -> None:
+        await self.submit_tag(card_id, tag)
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Любой другой запрос к Kaiten (например, создание карточки) в рамках того же лимита."""
+        await self._take_token()
+        return await func(*args, **kwargs)
+
+    # ── выполнение ─────────────────────────────────
+    async def _take_token(self) -> None:
+        await self.bucket.acquire()
+        self._requests_total += 1
+        self._request_times.append(time.monotonic())
+        self._trim_window()
+
+    def _trim_window(self) -> None:
+        now = time.monotonic()
+        while self._request_times and now - self._request_times[0] > self.metrics_window:
+            self._request_times.popleft()
+
+    async def _worker(self) -> None:
+        while True:
+            card_id = await self._ready.get()
+            ops = self._pending.pop(card_id, None)
+            if ops is None:
+                continue
+
+            self._active.add(card_id)
+            try:
+                await self._apply(card_id, ops)
+            except Exception as exc:
+                self._errors_total += 1
+                # ошибку получает только последний перенос: повторять будут его одного
+                for waiter in ops.waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+            else:
+                for waiter in ops.waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+            finally:
+                for waiter in ops.superseded:
+                    if not waiter.done():
+                        waiter.set_result(None)
+                self._active.discard(card_id)
+                if card_id in self._pending:
+                    self._ready.put_nowait(card_id)
+
+    async def _apply(self, card_id: int, ops: _CardOps) -> None:
+        if ops.column_id is not None:
+            await self._take_token()
+            # записываем до запроса: вебхук может прийти раньше ответа
+            move = self.recent_moves.record(card_id, ops.column_id)
+            try:
+                card = await self.kaiten.change_card_status(card_id, ops.column_id)
+            except KaitenAPIError:
+                # Kaiten ответил отказом — переноса не было, и эха не будет
+                self.recent_moves.forget(card_id, move)
+                raise
+            self.recent_moves.confirm(move, card_moved_at(card))
+
+        if ops.tags:
+            # По API тэги добавляются по одному, поэтому сначала убираем уже стоящие
+            await self._take_token()
+            card = await self.kaiten.get_card(card_id)
+            existing = {t.get("name") for t in card.get("tags") or []}
+
+            for tag in ops.tags:
+                if tag in existing:
+                    continue
+                await self._take_token()
+                await self.kaiten.add_tags_to_card(card_id, tag)
+
+    # ── метрики ────────────────────────────────────
+    def metrics(self) -> SchedulerMetrics:
+        self._trim_window()
+        span = time.monotonic() - self._request_times[0] if self._request_times else 0.0
+        rps = len(self._request_times) / max(span, 1.0)
+
+        return SchedulerMetrics(
+            queue_depth=len(self._pending),
+            in_flight=len(self._active),
+            requests_total=self._requests_total,
+            coalesced_total=self._coalesced_total,
+            errors_total=self._errors_total,
+            rps=rps,
+        )
@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Protocol
+
+import httpx
+from pypika_tortoise.terms import Tuple
+from tortoise.expressions import Q, QueryModifier, ResolveContext, ValueWrapper
+from tortoise.transactions import in_transaction
+
+from src.enums import KaitenOperation, OrderStatusName, PaymentStatus, StatusKaitenColumnMap
+from src.models import KaitenOutbox, Order, OrderStatusHistory
+from src.services.capacity import capacity_scheduler
+from src.services.payments import invoice_cache
+from src.services.promo import promo_codes
+from src.services.reference_cache import reference_cache
+from src.services.status_sync import StatusChange
+from src.settings import PaymentSettings
+
+logger = logging.getLogger(__name__)
+
+OPEN_PAYMENT_STATUSES = [PaymentStatus.PENDING, PaymentStatus.WAITING_FOR_CAPTURE]
+
+# итог оплаты → статус заказа, если он ещё «ожидает оплаты»
+ORDER_STATUS_BY_PAYMENT = {
+    PaymentStatus.SUCCEEDED: OrderStatusName.NEW,
+    PaymentStatus.CANCELED: OrderStatusName.CANCELED,
+}
+
+REFUNDED_TEXT = "Оплата заказа #{order_id} пришла, когда заказ уже был отменён. Мы вернули деньги — они придут на карту в течение нескольких дней."
+
+
+class KeysetAfter(Q):
+    """
+    Строки строго после ключа (created_at, id) — сравнение строк `(created_at, id) > ($1, $2)`.
+
+    Через OR двух условий Postgres не всегда догадывается продолжить индекс (created_at, id)
+    с ключа; сравнение строк он превращает в одно условие на индекс. Tortoise такого
+    фильтра не умеет, поэтому Q с готовым критерием pypika.
+    """
+
+    def __init__(self, created_at: datetime, order_id: int):
+        super().__init__()
+        self.key = (created_at, order_id)
+
+    def resolve(self, resolve_context: ResolveContext) -> QueryModifier:
+        table = resolve_context.table
+        created_at = resolve_context.model._meta.fields_map["created_at"].to_db_value(self.key[0], None)
+        return QueryModifier(where_criterion=Tuple(table.created_at, table.id) > Tuple(
+            ValueWrapper(created_at), ValueWrapper(self.key[1]),
+        ))
+
+
+class PaymentProvider(Protocol):
+    """Откуда сверщик узнаёт итог платежа. Неизвестные и недоступные платежи просто не попадают в ответ."""
+
+    async def fetch_statuses(self, payment_ids: list[str]) -> dict[str, PaymentStatus]: ...
+
+    async def refund(self, payment_id: str, amount_rub: int) -> bool:
+        """Вернуть платёж целиком; True — провайдер принял возврат. Повтор по тому же платежу безопасен."""
+        ...
+
+    async def close(self) -> None: ...
+
+
+class NoProvider:
+    """Провайдер не подключён: сверяются только брошенные счета без платежа, возвраты — вручную."""
+
+    async def fetch_statuses(self, payment_ids: list[str]) -> dict[str, PaymentStatus]:
+        return {}
+
+    async def refund(self, payment_id: str, amount_rub: int) -> bool:
+        return False
+
+    async def close(self) -> None:
+        pass
+
+
+class YooKassaProvider:
+    """GET /v3/payments/{id} ЮKassa; у API нет выборки по списку id, поэтому запросы параллельно, не больше parallelism."""
+
+    BASE_URL = "https://api.yookassa.ru/v3"
+
+    def __init__(
+            self,
+            shop_id: str,
+            secret_key: str,
+            parallelism: int = 8,
+            currency: str = "RUB",
+            transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.currency = currency
+        self._client = httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            auth=(shop_id, secret_key),
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=parallelism),
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(parallelism)
+
+    async def fetch_statuses(self, payment_ids: list[str]) -> dict[str, PaymentStatus]:
+        results = await asyncio.gather(*(self._fetch(payment_id) for payment_id in payment_ids))
+        return {payment_id: status for payment_id, status in zip(payment_ids, results) if status is not None}
+
+    async def _fetch(self, payment_id: str) -> PaymentStatus | None:
+        async with self._semaphore:
+            try:
+                response = await self._client.get(f"/payments/{payment_id}")
+                response.raise_for_status()
+                return PaymentStatus(response.json()["status"])
+            except (httpx.HTTPError, KeyError, ValueError) as exc:
+                # не получилось — заказ останется незавершённым до следующего прохода
+                logger.warning(f"YooKassa: payment {payment_id} not checked: {exc!r}")
+                return None
+
+    async def refund(self, payment_id: str, amount_rub: int) -> bool:
+        # Idempotence-Key по платежу: повтор после обрыва не вернёт деньги второй раз
+        try:
+            response = await self._client.post(
+                "/refunds",
+                json={"payment_id": payment_id, "amount": {"value": f"{amount_rub}.00", "currency": self.currency}},
+                headers={"Idempotence-Key": f"refund:{payment_id}"},
+            )
+            response.raise_for_status()
+            return response.json().get("status") in ("pending", "succeeded")
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.warning(f"YooKassa: refund of payment {payment_id} failed: {exc!r}")
+            return False
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def build_payment_provider(settings: PaymentSettings | None = None) -> PaymentProvider:
+    settings = settings or PaymentSettings()
+    if settings.PROVIDER == "yookassa":
+        if not settings.YOOKASSA_SHOP_ID or not settings.YOOKASSA_SECRET_KEY:
+            raise RuntimeError("PAYMENTS_YOOKASSA_SHOP_ID and PAYMENTS_YOOKASSA_SECRET_KEY are required for PAYMENTS_PROVIDER=yookassa")
+        return YooKassaProvider(
+            settings.YOOKASSA_SHOP_ID, settings.YOOKASSA_SECRET_KEY, settings.PROVIDER_PARALLELISM, settings.CURRENCY,
+        )
+    return NoProvider()
+
+
+@dataclass
+class SweepStats:
+    scanned: int = 0    # незавершённых оплат просмотрено
+    paid: int = 0       # оплачены, а мы не знали (потерялся вебхук / successful_payment)
+    canceled: int = 0   # отменены у провайдера или брошены без платежа
+    pending: int = 0    # провайдер ещё не знает итога — оставлены до следующего прохода
+    batches: int = 0
+    refunded: int = 0   # возвращены деньги, пришедшие за отменённый заказ
+
+
+class PaymentSweeper:
+    """
+    Фоновая сверка оплат, которые зависли в pending / waiting_for_capture дольше SWEEP_STALE_MINUTES.
+
+    Заказы идут пачками по keyset (created_at, id) через частичный индекс
+    orders_open_payment_idx — без OFFSET и без загрузки всех зависших разом, память
+    ограничена одной пачкой. Счёт Telegram без платежа старше INVOICE_TTL_HOURS считается
+    брошенным и отменяется, по остальным итог спрашиваем у провайдера. Пачка применяется как StatusSyncEngine.flush:
+    по одному UPDATE на итог, bulk INSERT истории и переносов карточек в kaiten_outbox,
+    одно снятие броней машин и погашений промокодов на все отменённые.
+
+    Ещё сверщик возвращает деньги, пришедшие за уже отменённый заказ (payment_status
+    refund_pending, см. Repository.update_payment_status), и пишет об этом клиенту через `tell`.
+    Без провайдера такие заказы остаются в refund_pending — возврат делается вручную.
+    """
+
+    def __init__(
+            self,
+            provider: PaymentProvider,
+            settings: PaymentSettings | None = None,
+            notify: Callable[[list[StatusChange]], Awaitable[None]] | None = None,
+            tell: Callable[[int, str], None] | None = None,
+    ):
+        self.provider = provider
+        self.settings = settings or PaymentSettings()
+        self.notify = notify
+        self.tell = tell
+        self._reported: set[int] = set()  # refund_pending, о которых уже написали в лог
+
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    # ── жизненный цикл ─────────────────────────────
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self.run(), name="payment-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                stats = await self.sweep_once()
+                stats.refunded = await self.refund_late_payments()
+                if stats.scanned or stats.refunded:
+                    logger.info(
+                        f"Payment sweep: {stats.scanned} stale, paid={stats.paid}, "
+                        f"canceled={stats.canceled}, pending={stats.pending}, refunded={stats.refunded}"
+                    )
+            except Exception:
+                logger.exception("Payment sweep: ошибка при сверке оплат")
+
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.settings.SWEEP_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    # ── сверка ─────────────────────────────────────
+    async def sweep_once(self) -> SweepStats:
+        stats = SweepStats()
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=self.settings.SWEEP_STALE_MINUTES)
+        last: tuple[datetime, int] | None = None
+
+        while not self._stopping.is_set():
+            query = Order.filter(payment_status__in=OPEN_PAYMENT_STATUSES, created_at__lt=cutoff)
+            if last is not None:
+                query = query.filter(KeysetAfter(*last))
+            rows = await query.order_by("created_at", "id").limit(self.settings.SWEEP_BATCH).values_list(
+                "id", "created_at", "payment_id",
+            )
+            if not rows:
+                break
+
+            last = (rows[-1][1], rows[-1][0])
+            stats.scanned += len(rows)
+            stats.batches += 1
+            await self._sweep_batch(rows, stats)
+
+            if len(rows) < self.settings.SWEEP_BATCH:
+                break
+
+        return stats
+
+    async def refund_late_payments(self) -> int:
+        """Вернуть деньги за отменённые заказы (refund_pending); возвращает число возвратов."""
+        rows = await Order.filter(payment_status=PaymentStatus.REFUND_PENDING).order_by("id").limit(
+            self.settings.SWEEP_BATCH,
+        ).values_list("id", "payment_id", "total_price_rub", "telegram_chat_id")
+
+        refunded = 0
+        for order_id, payment_id, amount, chat_id in rows:
+            if not payment_id or not await self.provider.refund(payment_id, amount):
+                if order_id not in self._reported:
+                    self._reported.add(order_id)
+                    logger.error(
+                        f"Order {order_id}: payment {payment_id} came after cancel and is not refunded — "
+                        f"верните вручную и поставьте payment_status = 'refunded'"
+                    )
+                continue
+
+            updated = await Order.filter(id=order_id, payment_status=PaymentStatus.REFUND_PENDING).update(
+                payment_status=PaymentStatus.REFUNDED, updated_at=datetime.now(timezone.utc),
+            )
+            self._reported.discard(order_id)
+            if not updated:
+                continue
+            refunded += 1
+            logger.warning(f"Order {order_id}: late payment {payment_id} refunded")
+            if self.tell is not None and chat_id:
+                self.tell(chat_id, REFUNDED_TEXT.format(order_id=order_id))
+        return refunded
+
+    async def _sweep_batch(self, rows: list[tuple[int, datetime, str | None]], stats: SweepStats) -> None:
+        # счёт Telegram (без payment_id) можно оплатить, пока он в invoice_cache — INVOICE_TTL_HOURS
+        abandoned_before = datetime.now(timezone.utc) - timedelta(hours=self.settings.INVOICE_TTL_HOURS)
+        outcomes: dict[int, PaymentStatus] = {}
+        by_payment: dict[str, int] = {}
+        for order_id, created_at, payment_id in rows:
+            if payment_id:
+                by_payment[payment_id] = order_id
+            elif created_at < abandoned_before:
+                outcomes[order_id] = PaymentStatus.CANCELED
+
+        if by_payment:
+            for payment_id, status in (await self.provider.fetch_statuses(list(by_payment))).items():
+                if status in ORDER_STATUS_BY_PAYMENT and payment_id in by_payment:
+                    outcomes[by_payment[payment_id]] = status
+
+        stats.pending += len(rows) - len(outcomes)
+        if not outcomes:
+            return
+
+        changes = await self._apply(outcomes, stats)
+        if changes and self.notify is not None:
+            await self.notify(changes)
+
+    async def _apply(self, outcomes: dict[int, PaymentStatus], stats: SweepStats) -> list[StatusChange]:
+        waiting_id = reference_cache.status_id(OrderStatusName.WAITING_FOR_CAPTURE)
+        history: list[OrderStatusHistory] = []
+        moves: list[KaitenOutbox] = []
+        changes: list[StatusChange] = []
+        now = datetime.now(timezone.utc)
+
+        async with in_transaction():
+            for payment_status, order_status in ORDER_STATUS_BY_PAYMENT.items():
+                ids = [order_id for order_id, outcome in outcomes.items() if outcome == payment_status]
+                if not ids:
+                    continue
+
+                # итог мог прийти вебхуком, пока мы спрашивали провайдера — берём только всё ещё незавершённые
+                orders = await (
+                    Order.filter(id__in=ids, payment_status__in=OPEN_PAYMENT_STATUSES)
+                    .select_for_update()
+                    .only("id", "status_id", "telegram_chat_id", "telegram_message_id")
+                )
+                if not orders:
+                    continue
+                await Order.filter(id__in=[o.id for o in orders]).update(payment_status=payment_status, updated_at=now)
+
+                moved = [o for o in orders if o.status_id == waiting_id]
+                if moved:
+                    status_id = reference_cache.status_id(order_status)
+                    moved_ids = [o.id for o in moved]
+                    await Order.filter(id__in=moved_ids).update(status_id=status_id)
+
+                    for order in moved:
+                        history.append(OrderStatusHistory(order_id=order.id, status_id=status_id, changed_by="sweeper"))
+                        moves.append(KaitenOutbox(
+                            order_id=order.id,
+                            operation=KaitenOperation.MOVE_COLUMN,
+                            payload={"column_id": StatusKaitenColumnMap[order_status]},
+                            idempotency_key=f"order:{order.id}:move_column:sweep:{payment_status}",
+                        ))
+                        changes.append(StatusChange(order.id, order_status, order.telegram_chat_id, order.telegram_message_id))
+
+                    if order_status == OrderStatusName.CANCELED:
+                        await capacity_scheduler.release_many(moved_ids)
+                        await promo_codes.release_many(moved_ids)
+
+                # в остальных процессах счёт уберёт NOTIFY invoice_closed (migrations/0012_invoice_notify.sql)
+                for order in orders:
+                    invoice_cache.discard(order.id)
+                if payment_status == PaymentStatus.SUCCEEDED:
+                    stats.paid += len(orders)
+                else:
+                    stats.canceled += len(orders)
+
+            await OrderStatusHistory.bulk_create(history)
+            await KaitenOutbox.bulk_create(moves)
+
+        logger.info(f"Payment sweep: {len(changes)} orders moved, {len(moves)} card moves queued")
+        return changes
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from src.enums import OrderStatusName, PaymentStatus
+from src.models import Order
+from src.services.reference_cache import reference_cache
+from src.settings import PaymentSettings
+from src.utils.pg_listen import Reloader
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_PREFIX = "order:"
+
+UNKNOWN_INVOICE_TEXT = "Счёт устарел. Оформите заказ заново: /start"
+WRONG_AMOUNT_TEXT = "Сумма счёта изменилась. Оформите заказ заново: /start"
+
+
+def invoice_payload(order_id: int) -> str:
+    return f"{PAYLOAD_PREFIX}{order_id}"
+
+
+def order_id_from_payload(payload: str) -> int | None:
+    if not payload.startswith(PAYLOAD_PREFIX):
+        return None
+    try:
+        return int(payload.removeprefix(PAYLOAD_PREFIX))
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class PendingInvoice:
+    order_id: int
+    amount: int  # в копейках, как total_amount у Telegram
+    currency: str
+
+
+class InvoiceCache:
+    """
+    Неоплаченные счета в памяти процесса.
+
+    На pre_checkout_query Telegram ждёт ответа 10 секунд, поэтому проверка идёт
+    только по этому кэшу — без БД и внешних запросов. Счёт попадает сюда при отправке,
+    уходит при оплате или отмене; при запуске бота кэш заполняется неоплаченными
+    заказами за INVOICE_TTL_HOURS. Апдейты одного пользователя при нескольких
+    процессах обрабатывает один процесс (src/bot/update_inbox.py) — тот, что выставил счёт.
+    Оплату и отмену, сделанные другим процессом (сверщик оплат, вебхук), он узнаёт
+    по NOTIFY с id заказа (migrations/0012_invoice_notify.sql).
+    """
+
+    CHANNEL = "invoice_closed"
+
+    def __init__(self, settings: PaymentSettings | None = None):
+        self.settings = settings or PaymentSettings()
+        self._invoices: dict[int, PendingInvoice] = {}
+        self._reloader = Reloader(self.load, "invoice-cache")
+
+    def add(self, order_id: int, total_price_rub: int) -> PendingInvoice:
+        invoice = PendingInvoice(order_id, total_price_rub * 100, self.settings.CURRENCY)
+        self._invoices[order_id] = invoice
+        return invoice
+
+    def discard(self, order_id: int) -> None:
+        self._invoices.pop(order_id, None)
+
+    def invalidate(self, payload: str | None = None) -> None:
+        """Забыть счёт заказа из payload; без payload (переподключение LISTEN) — перечитать все."""
+        if payload is None:
+            self._reloader.invalidate()
+            return
+        try:
+            self.discard(int(payload))
+        except ValueError:
+            logger.warning(f"Invoice cache: bad NOTIFY payload {payload!r}")
+
+    def check(self, payload: str, currency: str, total_amount: int) -> str | None:
+        """None — счёт можно оплачивать; иначе текст отказа для клиента."""
+        order_id = order_id_from_payload(payload)
+        invoice = self._invoices.get(order_id) if order_id is not None else None
+        if invoice is None:
+            return UNKNOWN_INVOICE_TEXT
+        if invoice.currency != currency or invoice.amount != total_amount:
+            logger.warning(f"Order {order_id}: precheckout amount {total_amount} {currency}, "
+                           f"expected {invoice.amount} {invoice.currency}")
+            return WRONG_AMOUNT_TEXT
+        return None
+
+    async def load(self) -> None:
+        since = datetime.now(timezone.utc) - timedelta(hours=self.settings.INVOICE_TTL_HOURS)
+        rows = await Order.filter(
+            status_id=reference_cache.status_id(OrderStatusName.WAITING_FOR_CAPTURE),
+            payment_status__in=[PaymentStatus.PENDING, PaymentStatus.WAITING_FOR_CAPTURE],
+            created_at__gte=since,
+        ).values_list("id", "total_price_rub")
+        self._invoices = {
+            order_id: PendingInvoice(order_id, total * 100, self.settings.CURRENCY) for order_id, total in rows
+        }
+        logger.info(f"Invoice cache: {len(self._invoices)} unpaid invoices")
+
+
+invoice_cache = InvoiceCache()
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Protocol
+from urllib.parse import quote, urlsplit
+from uuid import uuid4
+
+import httpx
+from telegram import File
+
+from src.settings import PhotoStorageSettings
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/heic": ".heic"}
+
+
+class PhotoTooLarge(ValueError):
+    """Файл больше PhotoStorageSettings.MAX_BYTES — загрузка прервана, остатки удалены."""
+
+
+@dataclass(frozen=True)
+class StoredPhoto:
+    key: str  # ab/cd/<sha256>.jpg
+    sha256: str
+    size: int
+    content_type: str
+
+
+def content_key(sha256: str, content_type: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{EXTENSIONS.get(content_type, '')}"
+
+
+class _Hashing:
+    """Пропускает куски насквозь, попутно считая sha256 и размер."""
+
+    def __init__(self, chunks: AsyncIterator[bytes], max_bytes: int):
+        self.chunks = chunks
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.chunks:
+            self.size += len(chunk)
+            if self.size > self.max_bytes:
+                raise PhotoTooLarge(f"Фото больше {self.max_bytes} байт")
+            self.digest.update(chunk)
+            yield chunk
+
+
+class PhotoStorage(Protocol):
+    async def save(self, chunks: AsyncIterator[bytes], size: int | None, content_type: str) -> StoredPhoto: ...
+
+    async def close(self) -> None: ...
+
+
+class FileSystemStorage:
+    """
+    Каталог на диске. Куски пишутся во временный файл по мере прихода,
+    затем файл переименовывается в ключ по sha256; одинаковые фото хранятся один раз.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+
+    async def save(self, chunks: AsyncIterator[bytes], size: int | None, content_type: str) -> StoredPhoto:
+        hashing = _Hashing(chunks, self.max_bytes)
+        tmp = self.root / "tmp" / f"{uuid4().hex}.part"
+
+        file = await asyncio.to_thread(open, tmp, "wb")
+        try:
+            async for chunk in hashing:
+                # запись на диск — вне event loop, чтобы медленный диск не тормозил бота
+                await asyncio.to_thread(file.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(file.close)
+            tmp.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(file.close)
+
+        sha256 = hashing.digest.hexdigest()
+        key = content_key(sha256, content_type)
+        target = self.root / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            tmp.unlink()
+        else:
+            os.replace(tmp, target)
+
+        return StoredPhoto(key=key, sha256=sha256, size=hashing.size, content_type=content_type)
+
+    async def close(self) -> None:
+        pass
+
+
+class S3Storage:
+    """
+    S3-совместимое хранилище (MinIO, Yandex Object Storage и т. п.) на httpx с подписью SigV4.
+
+    Ключ зависит от содержимого, а оно известно только в конце, поэтому файл потоком
+    уходит во временный объект tmp/<uuid>, затем копируется на стороне сервера
+    в ключ по sha256 (если такого ещё нет) и временный объект удаляется.
+    S3 требует Content-Length у потоковой загрузки — его даёт Telegram (File.file_size).
+    """
+
+    def __init__(
+            self,
+            endpoint: str,
+            bucket: str,
+            access_key: str,
+            secret_key: str,
+            region: str,
+            max_bytes: int,
+            transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.max_bytes = max_bytes
+        self.host = urlsplit(self.endpoint).netloc
+        self.client = httpx.AsyncClient(timeout=60.0, transport=transport)
+
+    async def save(self, chunks: AsyncIterator[bytes], size: int | None, content_type: str) -> StoredPhoto:
+        if size is None:
+            raise ValueError("S3: для потоковой загрузки нужен размер файла")
+        if size > self.max_bytes:
+            raise PhotoTooLarge(f"Фото больше {self.max_bytes} байт")
+
+        hashing = _Hashing(chunks, self.max_bytes)
+        tmp_key = f"tmp/{uuid4().hex}"
+        await self._request(
+            "PUT", tmp_key,
+            headers={"content-length": str(size), "content-type": content_type},
+            content=hashing.__aiter__(),
+        )
+
+        try:
+            sha256 = hashing.digest.hexdigest()
+            key = content_key(sha256, content_type)
+            exists = await self._request("HEAD", key, expected=(200, 404))
+            if exists.status_code == 404:
+                await self._request(
+                    "PUT", key,
+                    headers={"x-amz-copy-source": quote(f"/{self.bucket}/{tmp_key}"), "content-type": content_type},
+                )
+        finally:
+            await self._request("DELETE", tmp_key, expected=(200, 204, 404))
+
+        return StoredPhoto(key=key, sha256=sha256, size=hashing.size, content_type=content_type)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def _request(
+            self,
+            method: str,
+            key: str,
+            headers: dict[str, str] | None = None,
+            content: AsyncIterator[bytes] | None = None,
+            expected: tuple[int, ...] = (200,),
+    ) -> httpx.Response:
+        path = quote(f"/{self.bucket}/{key}", safe="/-_.~")
+        headers = self._sign(method, path, dict(headers or {}))
+        response = await self.client.request(method, self.endpoint + path, headers=headers, content=content)
+        if response.status_code not in expected:
+            raise httpx.HTTPStatusError(
+                f"S3 {method} {key}: {response.status_code} {response.text[:200]}",
+                request=response.request,
+                response=response,
+            )
+        return response
+
+    def _sign(self, method: str, path: str, headers: dict[str, str]) -> dict[str, str]:
+        """Подпись AWS SigV4; тело не подписывается (UNSIGNED-PAYLOAD), чтобы не читать его дважды."""
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        scope = f"{now:%Y%m%d}/{self.region}/s3/aws4_request"
+
+        headers.update({"host": self.host, "x-amz-date": amz_date, "x-amz-content-sha256": "UNSIGNED-PAYLOAD"})
+        signed = {name.lower(): value.strip() for name, value in headers.items()}
+        signed_names = ";".join(sorted(signed))
+        canonical = "\n".join([
+            method,
+            path,
+            "",
+            "".join(f"{name}:{signed[name]}\n" for name in sorted(signed)),
+            signed_names,
+            "UNSIGNED-PAYLOAD",
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest(),
+        ])
+
+        key = f"AWS4{self.secret_key}".encode()
+        for part in (f"{now:%Y%m%d}", self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed_names}, Signature={signature}"
+        )
+        return headers
+
+
+class TelegramPhotoUploader:
+    """
+    Фото из Telegram — сразу в хранилище, куском за куском: файл целиком
+    не держится ни в памяти, ни на диске бота (кроме временного файла FileSystemStorage).
+    """
+
+    def __init__(self, storage: PhotoStorage, chunk_size: int, transport: httpx.AsyncBaseTransport | None = None):
+        self.storage = storage
+        self.chunk_size = chunk_size
+        self.client = httpx.AsyncClient(timeout=60.0, transport=transport)
+
+    async def save(self, file: File, content_type: str = "image/jpeg") -> StoredPhoto:
+        return await self.storage.save(self._chunks(file), file.file_size, content_type)
+
+    async def _chunks(self, file: File) -> AsyncIterator[bytes]:
+        path = file.file_path or ""
+        if not path.startswith(("http://", "https://")):
+            # свой Bot API сервер в local-режиме отдаёт путь к файлу на диске
+            async for chunk in self._local_chunks(Path(path)):
+                yield chunk
+            return
+
+        async with self.client.stream("GET", path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                yield chunk
+
+    async def _local_chunks(self, path: Path) -> AsyncIterator[bytes]:
+        file = await asyncio.to_thread(open, path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(file.read, self.chunk_size):
+                yield chunk
+        finally:
+            await asyncio.to_thread(file.close)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        await self.storage.close()
+
+
+def build_photo_uploader(settings: PhotoStorageSettings | None = None) -> TelegramPhotoUploader:
+    settings = settings or PhotoStorageSettings()
+    if settings.BACKEND == "s3":
+        if not (settings.S3_ENDPOINT and settings.S3_ACCESS_KEY and settings.S3_SECRET_KEY):
+            raise RuntimeError("PHOTOS_BACKEND=s3 требует PHOTOS_S3_ENDPOINT, PHOTOS_S3_ACCESS_KEY и PHOTOS_S3_SECRET_KEY")
+        storage: PhotoStorage = S3Storage(
+            settings.S3_ENDPOINT,
+            settings.S3_BUCKET,
+            settings.S3_ACCESS_KEY,
+            settings.S3_SECRET_KEY,
+            settings.S3_REGION,
+            settings.MAX_BYTES,
+        )
+    else:
+        storage = FileSystemStorage(settings.ROOT, settings.MAX_BYTES)
+    logger.info(f"Photo storage: {settings.BACKEND}")
+    return TelegramPhotoUploader(storage, settings.CHUNK_SIZE)
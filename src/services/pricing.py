@@ -1,27 +1,205 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, Sequence
+
 from src.enums import ServiceSlug, ServiceCyrillicSlugMap
-from datetime import datetime
-from typing import Optional
+from src.models import PriceVersion
+from src.utils.pg_listen import Reloader
 
-class Pricing:
+logger = logging.getLogger(__name__)
+
+BASE_SLUG = "base"
+
+SLUG_CYRILLIC_MAP = {v: k for k, v in ServiceCyrillicSlugMap.items()}
+
+# Порядок бит маски выбранных услуг: бит i — SERVICE_BITS[i]
+SERVICE_BITS: tuple[ServiceSlug, ...] = tuple(ServiceSlug)
+ALL_MASKS = 1 << len(SERVICE_BITS)
+
+# Стирка в базовой цене — один пакет до BAG_WEIGHT_KG; тяжелее — за каждые начатые 3 кг
+BAG_WEIGHT_KG = 3
+
+# Опции всего заказа, а не пакета: берутся один раз, в каком бы пакете ни были отмечены
+ORDER_SERVICES = frozenset({ServiceSlug.EXACT_TIME})
+
+
+def services_to_mask(services: dict[str, bool]) -> int:
+    return sum(1 << i for i, slug in enumerate(SERVICE_BITS) if services.get(slug))
+
+
+def mask_to_services(mask: int) -> dict[ServiceSlug, bool]:
+    return {slug: bool(mask >> i & 1) for i, slug in enumerate(SERVICE_BITS)}
+
+
+ORDER_SERVICES_MASK = services_to_mask({slug: True for slug in ORDER_SERVICES})
+
+
+def bag_services(mask: int) -> dict[ServiceSlug, bool]:
+    """Опции пакета по маске — без опций всего заказа (их нет в колонках пакета)."""
+    return {slug: picked for slug, picked in mask_to_services(mask).items() if slug not in ORDER_SERVICES}
+
+
+def weight_units(weight_kg: int) -> int:
+    """Сколько базовых стирок в пакете этого веса (минимум одна)."""
+    return max(1, -(-weight_kg // BAG_WEIGHT_KG))
+
+
+@dataclass(frozen=True)
+class Bag:
+    """Пакет заказа: вес и маска выбранных для него доп. услуг."""
+    mask: int = 0
+    weight_kg: int = BAG_WEIGHT_KG
+
+
+@dataclass(frozen=True)
+class BagsQuote:
+    """Расчёт заказа из нескольких пакетов."""
+    bag_prices: tuple[int, ...]  # цена каждого пакета: стирка по весу + его опции
+    order_mask: int              # объединение опций всех пакетов
+    order_extras: int            # опции заказа (ORDER_SERVICES), по одному разу
+    total: int
+
+
+@dataclass(frozen=True)
+class PriceSnapshot:
     """
-    Простая реализация прайсинга на основе констант.
-    Потом её легко будет заменить на загрузку цен из БД.
+    Неизменяемый прайс одной версии каталога (таблица price_versions).
+    Pricing подменяет снапшот целиком, поэтому расчёт никогда не видит смесь старых и новых цен.
     """
+    version: int
+    base_price: int
+    service_prices: Mapping[ServiceSlug, int] = field(default_factory=dict)
 
-    WASHING_PRICE: int = 990
+    @classmethod
+    def from_catalogue(cls, version: int, catalogue: list[dict[str, Any]]) -> PriceSnapshot:
+        prices = {item["slug"]: int(item["price_rub"]) for item in catalogue}
+        if BASE_SLUG not in prices:
+            raise ValueError(f"Price version {version}: no '{BASE_SLUG}' service")
+
+        service_prices = {slug: prices[slug] for slug in ServiceSlug if slug in prices}
+        return cls(
+            version=version,
+            base_price=prices[BASE_SLUG],
+            service_prices=MappingProxyType(service_prices),
+        )
+
+    def price(self, slug: ServiceSlug) -> int:
+        try:
+            return self.service_prices[slug]
+        except KeyError:
+            raise ValueError(f"Услуга {slug} сейчас недоступна") from None
+
+    def total(self, services: dict[ServiceSlug, bool]) -> int:
+        return self.base_price + sum(self.price(name) for name, picked in services.items() if picked)
 
-    SERVICE_PRICES: dict[ServiceSlug, int] = {
+    @cached_property
+    def bag_option_prices(self) -> tuple[int | None, ...]:
+        """
+        Сумма опций пакета на каждую маску услуг (без опций заказа).
+        None — в маске есть услуга, которой нет в этом прайсе.
+        """
+        prices = []
+        for mask in range(ALL_MASKS):
+            try:
+                prices.append(sum(
+                    self.price(slug) for i, slug in enumerate(SERVICE_BITS)
+                    if mask >> i & 1 and slug not in ORDER_SERVICES
+                ))
+            except ValueError:
+                prices.append(None)
+        return tuple(prices)
+
+    def quote(self, bags: Sequence[Bag]) -> BagsQuote:
+        """
+        Цены всех пакетов за один проход: опции пакета — готовая сумма из таблицы
+        по маске, опции заказа складываются один раз по объединению масок.
+        """
+        option_prices = self.bag_option_prices
+        base_price = self.base_price
+
+        bag_prices = []
+        order_mask = 0
+        for bag in bags:
+            options = option_prices[bag.mask]
+            if options is None:
+                raise ValueError(f"В пакете есть услуги, недоступные в прайсе {self.version}")
+            bag_prices.append(base_price * weight_units(bag.weight_kg) + options)
+            order_mask |= bag.mask
+
+        order_bits = order_mask & ORDER_SERVICES_MASK
+        order_extras = sum(
+            self.price(slug) for i, slug in enumerate(SERVICE_BITS) if order_bits >> i & 1
+        )
+        return BagsQuote(
+            bag_prices=tuple(bag_prices),
+            order_mask=order_mask,
+            order_extras=order_extras,
+            total=sum(bag_prices) + order_extras,
+        )
+
+
+# Цены из pg_init/01-schema.sql: до загрузки из БД (devtools, бенчмарки) считаем по ним
+DEFAULT_SNAPSHOT = PriceSnapshot(
+    version=0,
+    base_price=990,
+    service_prices=MappingProxyType({
         ServiceSlug.IRONING: 990,
         ServiceSlug.CONDITIONER: 200,
         ServiceSlug.VACUUM_PACK: 400,
         ServiceSlug.EXACT_TIME: 300,
         ServiceSlug.UV: 300,
         ServiceSlug.WASH_BAG: 300,
-    }
+    }),
+)
+
+
+class Pricing:
+    """
+    Прайсинг по каталогу услуг из БД (services -> price_versions).
+
+    Каталог загружается в init_db в неизменяемый PriceSnapshot; все расчёты идут
+    по текущему снапшоту без запросов к БД. При изменении services триггер
+    создаёт новую версию и шлёт NOTIFY price_changed — снапшот перечитывается
+    и подменяется одной операцией присваивания.
+    """
+
+    CHANNEL = "price_changed"
+
+    _snapshot: PriceSnapshot = DEFAULT_SNAPSHOT
+    _reloader: Reloader | None = None
+
+    # ── снапшот ────────────────────────────────────
+    @classmethod
+    def current(cls) -> PriceSnapshot:
+        """Снапшот, по которому считать. Держите ссылку, если расчёт из нескольких шагов."""
+        return cls._snapshot
 
+    @classmethod
+    async def load(cls) -> PriceSnapshot:
+        latest = await PriceVersion.all().order_by("-version").first()
+        if latest is None:
+            logger.error("Pricing: price_versions пуста, считаем по ценам по умолчанию")
+            return cls._snapshot
+
+        if latest.version != cls._snapshot.version:
+            cls._snapshot = PriceSnapshot.from_catalogue(latest.version, latest.catalogue)
+            logger.info(f"Pricing: loaded price version {latest.version}")
+        return cls._snapshot
+
+    @classmethod
+    def invalidate(cls, payload: str | None = None) -> None:
+        if cls._reloader is None:
+            cls._reloader = Reloader(cls.load, "pricing")
+        cls._reloader.invalidate(payload)
+
+    # ── расчёты ────────────────────────────────────
     @classmethod
     def get_price(cls, slug: ServiceSlug) -> int:
-        return cls.SERVICE_PRICES[slug]
+        return cls._snapshot.price(slug)
 
     @classmethod
     def services_price_message(cls, services: dict[ServiceSlug, bool]) -> str:
@@ -30,12 +208,13 @@ class Pricing:
         :param services:
         :return:
         """
-        slug_cyrillic_map = {v:k for k,v in ServiceCyrillicSlugMap.items()}
-        message = ''.join([
-            f' — {slug_cyrillic_map[name]}: {cls.SERVICE_PRICES[name]}\n' for name, picked in services.items() if picked
-        ])
+        return cls.services_message(cls._snapshot, services)
 
-        return message
+    @staticmethod
+    def services_message(snapshot: PriceSnapshot, services: dict[ServiceSlug, bool]) -> str:
+        return ''.join([
+            f' — {SLUG_CYRILLIC_MAP[name]}: {snapshot.price(name)}\n' for name, picked in services.items() if picked
+        ])
 
     @classmethod
     def total_price_message(cls, services: dict[ServiceSlug, bool]) -> str:
@@ -44,11 +223,14 @@ class Pricing:
         :param services:
         :return:
         """
+        return cls.total_message(cls._snapshot, services)
 
-        services_message = cls.services_price_message(services)
-        total_price = cls.calculate_order_price(services)
+    @classmethod
+    def total_message(cls, snapshot: PriceSnapshot, services: dict[ServiceSlug, bool]) -> str:
+        services_message = cls.services_message(snapshot, services)
+        total_price = snapshot.total(services)
 
-        message = f'Стирка: {cls.WASHING_PRICE}\n'
+        message = f'Стирка: {snapshot.base_price}\n'
         if services_message:
             message += f'Доп. услуги:\n{services_message}'
 
@@ -56,14 +238,29 @@ class Pricing:
 
         return message
 
+    @staticmethod
+    def bags_message(snapshot: PriceSnapshot, bags: Iterable[Bag]) -> str:
+        """Текст итога для заказа из нескольких пакетов: опции по пакетам, опции заказа отдельно."""
+        bags = list(bags)
+        quote = snapshot.quote(bags)
+
+        message = ''
+        for position, (bag, price) in enumerate(zip(bags, quote.bag_prices), start=1):
+            services = bag_services(bag.mask)
+            message += f'Пакет {position} ({bag.weight_kg} кг): {price}\n'
+            message += Pricing.services_message(snapshot, services)
+
+        order_services = mask_to_services(quote.order_mask & ORDER_SERVICES_MASK)
+        if any(order_services.values()):
+            message += f'На весь заказ:\n{Pricing.services_message(snapshot, order_services)}'
+
+        message += f'Итого: {quote.total}\n'
+        return message
+
     @classmethod
     def calculate_order_price(cls, services: dict[ServiceSlug, bool]) -> int:
         """
         Считает итоговую стоимость заказа по набору флагов.
         Вся формула сосредоточена здесь.
         """
-        total = cls.WASHING_PRICE
-        total += sum( cls.SERVICE_PRICES[name] for name, picked in services.items() if picked)
-
-        return total
-
+        return cls._snapshot.total(services)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F, Q
+
+from src.models import PromoCode, PromoCodeUse
+from src.services.address_index import normalize_house
+from src.utils.db_errors import violates
+
+logger = logging.getLogger(__name__)
+
+# Дешевле рубля заказ не бывает: «заказ за 1 рубль» — это 100% скидки
+MIN_ORDER_PRICE_RUB = 1
+
+
+class PromoCodeError(ValueError):
+    """Промокод нельзя применить; текст исключения показывается клиенту."""
+
+
+UNKNOWN_TEXT = "Такого промокода нет"
+EXPIRED_TEXT = "Срок действия промокода истёк"
+EXHAUSTED_TEXT = "Промокод больше не действует: все активации израсходованы"
+ALREADY_USED_TEXT = "Промокод уже использован для этого адреса"
+
+# уникальные индексы promo_code_uses (migrations/0007_promo_codes.sql)
+USE_CONSTRAINTS = {"promo_code_uses_client_uniq", "promo_code_uses_address_uniq"}
+
+
+def normalize_code(code: str) -> str:
+    """Коды хранятся в верхнем регистре без пробелов."""
+    return "".join(code.split()).upper()
+
+
+def address_house_key(house: str) -> str:
+    """Номер дома для сравнения адресов: «7 корп. 1» и «7к1» — один дом."""
+    return normalize_house(house) or "".join(house.split()).lower()
+
+
+@dataclass(frozen=True)
+class Promo:
+    id: int
+    code: str
+    discount_rub: int
+    discount_percent: int | None
+    usage_limit: int | None
+    valid_until: datetime | None
+
+    @classmethod
+    def from_model(cls, promo: PromoCode) -> Promo:
+        return cls(
+            id=promo.id,
+            code=promo.code,
+            discount_rub=promo.discount_rub or 0,
+            discount_percent=promo.discount_percent,
+            usage_limit=promo.usage_limit,
+            valid_until=promo.valid_until,
+        )
+
+    def expired(self, now: datetime | None = None) -> bool:
+        return self.valid_until is not None and self.valid_until <= (now or datetime.now(timezone.utc))
+
+    def discount(self, total: int) -> int:
+        """Скидка в рублях с суммы заказа; к оплате остаётся не меньше MIN_ORDER_PRICE_RUB."""
+        discount = self.discount_rub + total * (self.discount_percent or 0) // 100
+        return max(0, min(discount, total - MIN_ORDER_PRICE_RUB))
+
+
+class PromoCodes:
+    """
+    Проверка и погашение промокодов.
+
+    Проверка идёт по кэшу: найденные коды лежат в памяти, несуществующие —
+    в отрицательном кэше с TTL, так что перебор кодов не бьёт в БД.
+    Изменение promo_codes (кроме used_count) рассылает NOTIFY promo_changed
+    с кодом в payload (migrations/0007_promo_codes.sql) — запись выкидывается из обоих кэшей.
+
+    used_count в кэше не хранится: лимит проверяет только условный UPDATE при погашении.
+    """
+
+    CHANNEL = "promo_changed"
+
+    def __init__(self, negative_ttl: float = 300.0, negative_limit: int = 10_000):
+        self.negative_ttl = negative_ttl
+        self.negative_limit = negative_limit
+
+        self._codes: dict[str, Promo] = {}
+        self._unknown: dict[str, float] = {}  # код -> когда забыть (time.monotonic)
+        self._exhausted: set[str] = set()
+
+    # ── проверка ───────────────────────────────────
+    async def get(self, code: str) -> Promo:
+        """Действующий промокод или PromoCodeError. Лимит здесь проверяется только по кэшу."""
+        code = normalize_code(code)
+
+        promo = self._codes.get(code)
+        if promo is None:
+            promo = await self._fetch(code)
+
+        if promo.expired():
+            raise PromoCodeError(EXPIRED_TEXT)
+        if code in self._exhausted:
+            raise PromoCodeError(EXHAUSTED_TEXT)
+        return promo
+
+    async def _fetch(self, code: str) -> Promo:
+        forget_at = self._unknown.get(code)
+        if forget_at is not None:
+            if forget_at > time.monotonic():
+                raise PromoCodeError(UNKNOWN_TEXT)
+            del self._unknown[code]
+
+        model = await PromoCode.get_or_none(code=code)
+        if model is None:
+            if len(self._unknown) >= self.negative_limit:
+                self._unknown.pop(next(iter(self._unknown)))  # самая старая запись
+            self._unknown[code] = time.monotonic() + self.negative_ttl
+            raise PromoCodeError(UNKNOWN_TEXT)
+
+        promo = self._codes[code] = Promo.from_model(model)
+        return promo
+
+    def invalidate(self, payload: str | None = None) -> None:
+        """Забыть код из payload; без payload (переподключение LISTEN) — все коды."""
+        if payload is None:
+            self._codes.clear()
+            self._unknown.clear()
+            self._exhausted.clear()
+            return
+
+        code = normalize_code(payload)
+        self._codes.pop(code, None)
+        self._unknown.pop(code, None)
+        self._exhausted.discard(code)
+
+    # ── погашение ──────────────────────────────────
+    async def redeem(
+            self,
+            promo: Promo,
+            client_id: int,
+            order_id: int,
+            street_id: int | None,
+            house: str,
+            apartment: int,
+    ) -> None:
+        """
+        Погасить промокод. Вызывать внутри транзакции заказа: при ошибке откатится всё.
+
+        Сначала запись погашения — повтор для того же адреса упирается в уникальный индекс,
+        не трогая строку кода. Счётчик — последним и одним условным UPDATE: проверка лимита
+        и инкремент атомарны, а блокировка горячей строки держится только до COMMIT.
+        """
+        try:
+            await PromoCodeUse.create(
+                promo_code_id=promo.id,
+                client_id=client_id,
+                order_id=order_id,
+                street_id=street_id,
+                house_key=address_house_key(house),
+                apartment=apartment,
+            )
+        except IntegrityError as exc:
+            if violates(exc, USE_CONSTRAINTS, "promo_code_uses.promo_code_id"):
+                raise PromoCodeError(ALREADY_USED_TEXT) from None
+            raise
+
+        redeemed = await (
+            PromoCode
+            .filter(id=promo.id)
+            .filter(Q(usage_limit__isnull=True) | Q(used_count__lt=F("usage_limit")))
+            .filter(Q(valid_until__isnull=True) | Q(valid_until__gt=datetime.now(timezone.utc)))
+            .update(used_count=F("used_count") + 1)
+        )
+        if not redeemed:
+            self._exhausted.add(promo.code)
+            raise PromoCodeError(EXPIRED_TEXT if promo.expired() else EXHAUSTED_TEXT)
+
+    async def release(self, order_id: int) -> None:
+        """Вернуть погашение отменённого заказа. Вызывать внутри транзакции смены статуса."""
+        await self.release_many([order_id])
+
+    async def release_many(self, order_ids: list[int]) -> None:
+        """
+        Вернуть погашения пачки отменённых заказов: адрес снова может применить код,
+        активация снова доступна. Исчерпанный код другие процессы узнают по NOTIFY
+        на уменьшение used_count (migrations/0014_promo_release_notify.sql).
+        """
+        promo_ids = await PromoCodeUse.filter(order_id__in=order_ids).values_list("promo_code_id", flat=True)
+        if not promo_ids:
+            return
+        await PromoCodeUse.filter(order_id__in=order_ids).delete()
+        for promo_id, count in Counter(promo_ids).items():
+            await PromoCode.filter(id=promo_id, used_count__gte=count).update(used_count=F("used_count") - count)
+        self._exhausted.clear()
+        logger.info(f"Promo codes released for orders {list(order_ids)}")
+
+
+promo_codes = PromoCodes()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import logging
+
+from src.enums import OrderStatusName
+from src.models import OrderStatus, Street
+from src.services.address_index import AddressIndex
+from src.utils.pg_listen import Reloader
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCache:
+    """
+    Справочники order_statuses и streets (с индексом домов — addresses) в памяти процесса.
+
+    Загружаются в init_db, дальше горячие пути читают только отсюда.
+    Изменение таблиц рассылает NOTIFY (триггеры из migrations/0004_reference_notify.sql),
+    каждый процесс бота слушает канал (src/utils/pg_listen.py) и перечитывает
+    справочники целиком — они крошечные. invalidate() делает то же самое вручную.
+    """
+
+    CHANNEL = "reference_changed"
+
+    def __init__(self):
+        self.statuses: dict[str, OrderStatus] = {}
+        self.statuses_by_id: dict[int, OrderStatus] = {}
+        self.streets: dict[str, Street] = {}
+        self.streets_by_id: dict[int, Street] = {}
+        self.addresses = AddressIndex()
+        self.loaded = False
+
+        self._reloader = Reloader(self._reload, "reference-cache")
+
+    # ── чтение ─────────────────────────────────────
+    def _check_loaded(self) -> None:
+        if not self.loaded:
+            raise RuntimeError("ReferenceCache не загружен: вызовите init_db()")
+
+    def status(self, name: OrderStatusName | str) -> OrderStatus:
+        self._check_loaded()
+        return self.statuses[name]
+
+    def status_id(self, name: OrderStatusName | str) -> int:
+        return self.status(name).id
+
+    def status_name(self, status_id: int) -> str:
+        self._check_loaded()
+        return self.statuses_by_id[status_id].name
+
+    def street(self, name: str) -> Street:
+        self._check_loaded()
+        street = self.streets.get(name)
+        if street is None:
+            raise ValueError(f"Unknown street: {name}")
+        return street
+
+    def street_by_id(self, street_id: int) -> Street | None:
+        self._check_loaded()
+        return self.streets_by_id.get(street_id)
+
+    # ── загрузка ───────────────────────────────────
+    async def load(self) -> None:
+        statuses = await OrderStatus.all()
+        streets = await Street.all()
+
+        # новые словари целиком, чтобы читатели не увидели наполовину обновлённый справочник
+        self.statuses = {status.name: status for status in statuses}
+        self.statuses_by_id = {status.id: status for status in statuses}
+        self.streets = {street.name: street for street in streets}
+        self.streets_by_id = {street.id: street for street in streets}
+        self.addresses = AddressIndex.build(streets)
+        self.loaded = True
+
+        missing = set(OrderStatusName) - set(self.statuses)
+        if missing:
+            logger.error(f"Reference cache: в order_statuses нет статусов {sorted(missing)}")
+
+    async def _reload(self) -> None:
+        await self.load()
+        logger.info(f"Reference cache: {len(self.statuses)} statuses, {len(self.streets)} streets")
+
+    def invalidate(self, payload: str | None = None) -> None:
+        """Перечитать справочники в фоне. Повторные вызовы во время загрузки склеиваются."""
+        self._reloader.invalidate(payload)
+
+    async def close(self) -> None:
+        await self._reloader.wait()
+
+
+reference_cache = ReferenceCache()
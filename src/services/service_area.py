@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+from src.models import Building, LaundryPoint
+from src.utils.pg_listen import Reloader
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6_371_000
+METERS_PER_DEGREE = 111_320
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние по поверхности Земли (гаверсинус)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+@dataclass(frozen=True)
+class Point:
+    id: int
+    name: str
+    lat: float
+    lon: float
+    radius_m: int
+
+
+@dataclass(frozen=True)
+class GridIndex:
+    """
+    Равномерная сетка по широте/долготе. Ячейка не меньше самого большого радиуса,
+    каждая точка лежит во всех ячейках, которые задевает её круг, поэтому
+    запрос смотрит одну ячейку и проверяет расстояние только до её точек.
+    """
+    cell_deg: float = 1.0
+    cells: Mapping[tuple[int, int], tuple[Point, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, points: Iterable[Point]) -> GridIndex:
+        points = list(points)
+        if not points:
+            return cls()
+
+        # по долготе градус короче: берём ячейку с запасом для самой северной точки
+        max_lat = max(abs(point.lat) for point in points)
+        cell_deg = max(point.radius_m for point in points) / (METERS_PER_DEGREE * math.cos(math.radians(max_lat)))
+
+        cells: dict[tuple[int, int], list[Point]] = {}
+        for point in points:
+            d_lat = point.radius_m / METERS_PER_DEGREE
+            d_lon = point.radius_m / (METERS_PER_DEGREE * math.cos(math.radians(point.lat)))
+            for i in range(math.floor((point.lat - d_lat) / cell_deg), math.floor((point.lat + d_lat) / cell_deg) + 1):
+                for j in range(math.floor((point.lon - d_lon) / cell_deg), math.floor((point.lon + d_lon) / cell_deg) + 1):
+                    cells.setdefault((i, j), []).append(point)
+
+        return cls(
+            cell_deg=cell_deg,
+            cells=MappingProxyType({key: tuple(value) for key, value in cells.items()}),
+        )
+
+    def nearest(self, lat: float, lon: float) -> Point | None:
+        """Ближайшая точка, в радиус которой попадают координаты, или None."""
+        candidates = self.cells.get((math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)), ())
+
+        best, best_distance = None, math.inf
+        for point in candidates:
+            distance = distance_m(lat, lon, point.lat, point.lon)
+            if distance <= point.radius_m and distance < best_distance:
+                best, best_distance = point, distance
+        return best
+
+
+@dataclass(frozen=True)
+class AreaSnapshot:
+    points: Mapping[int, Point] = field(default_factory=dict)
+    grid: GridIndex = field(default_factory=GridIndex)
+    buildings: Mapping[tuple[int, str], tuple[float, float]] = field(default_factory=dict)
+
+
+class ServiceArea:
+    """
+    Зона обслуживания в памяти процесса: точки стирки в сеточном индексе и координаты домов.
+    Сеть не нужна — данные загружаются в БД из файлов (python -m src.geo_import)
+    и читаются целиком при старте; изменения таблиц приходят через NOTIFY geodata_changed.
+
+    Пока не заведено ни одной точки, проверка выключена (enabled = False).
+    """
+
+    CHANNEL = "geodata_changed"
+
+    def __init__(self):
+        self._snapshot = AreaSnapshot()
+        self._reloader = Reloader(self.load, "service-area")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._snapshot.points)
+
+    def point(self, point_id: int) -> Point | None:
+        return self._snapshot.points.get(point_id)
+
+    def point_at(self, lat: float, lon: float) -> Point | None:
+        return self._snapshot.grid.nearest(lat, lon)
+
+    def coordinates(self, street_id: int, house: str) -> tuple[float, float] | None:
+        """Широта и долгота дома (house — нормализованный номер) или None."""
+        return self._snapshot.buildings.get((street_id, house))
+
+    def locate(self, street_id: int, house: str) -> Point | None:
+        """
+        Точка, обслуживающая дом (house — нормализованный номер).
+        None — дома нет в справочнике или он вне радиуса всех точек.
+        """
+        coordinates = self.coordinates(street_id, house)
+        if coordinates is None:
+            return None
+        return self._snapshot.grid.nearest(*coordinates)
+
+    async def load(self) -> None:
+        points = [
+            Point(id=point.id, name=point.name, lat=point.lat, lon=point.lon, radius_m=point.radius_m)
+            for point in await LaundryPoint.filter(is_active=True)
+        ]
+        buildings = await Building.all().values_list("street_id", "house", "lat", "lon")
+
+        # новый снапшот целиком, читатели не увидят наполовину загруженную зону
+        self._snapshot = AreaSnapshot(
+            points=MappingProxyType({point.id: point for point in points}),
+            grid=GridIndex.build(points),
+            buildings=MappingProxyType({(street_id, house): (lat, lon) for street_id, house, lat, lon in buildings}),
+        )
+        logger.info(f"Service area: {len(points)} laundry points, {len(buildings)} buildings")
+
+    def invalidate(self, payload: str | None = None) -> None:
+        self._reloader.invalidate(payload)
+
+    async def close(self) -> None:
+        await self._reloader.wait()
+
+
+service_area = ServiceArea()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from tortoise.transactions import in_transaction
+
+from src.enums import KaitenColumns, KaitenColumnStatusMap, OrderStatusName
+from src.models import Order, OrderStatusHistory
+from src.services.kaiten_mirror import MirrorCard
+from src.services.capacity import capacity_scheduler
+from src.services.kaiten_scheduler import RecentMoves
+from src.services.promo import promo_codes
+from src.services.reference_cache import reference_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StatusChange:
+    order_id: int
+    status: OrderStatusName
+    telegram_chat_id: int
+    telegram_message_id: int
+
+
+class StatusSyncEngine:
+    """
+    Обратная синхронизация: перенос карточки в Kaiten -> Order.status.
+
+    Изменения карточек копятся в буфере (по карточке остаётся последнее)
+    и применяются пачкой: один SELECT заказов, по одному UPDATE на целевой статус
+    и один bulk INSERT истории — без запросов на каждую карточку.
+    Эхо собственных переносов бота отбрасывается через RecentMoves.
+    """
+
+    def __init__(
+            self,
+            recent_moves: RecentMoves,
+            notify: Callable[[list[StatusChange]], Awaitable[None]],
+            flush_interval: float = 0.5,
+            max_batch: int = 500,
+    ):
+        self.recent_moves = recent_moves
+        self.notify = notify
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._buffer: dict[int, OrderStatusName] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    # ── вход ───────────────────────────────────────
+    def on_card_changed(self, card: MirrorCard, previous: MirrorCard | None) -> None:
+        if previous is not None and previous.column_id == card.column_id:
+            return
+
+        try:
+            status = KaitenColumnStatusMap[KaitenColumns(str(card.column_id))]
+        except (KeyError, ValueError):
+            return  # колонка, не связанная со статусом заказа
+
+        if self.recent_moves.pop_echo(card.id, card.column_id, card.moved_at):
+            return
+
+        self._buffer[card.id] = status
+        if len(self._buffer) >= self.max_batch:
+            self._wakeup.set()
+
+    # ── жизненный цикл ─────────────────────────────
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="status-sync")
+
+    async def stop(self) -> None:
+        # не отменяем задачу: отмена посреди flush потеряла бы пачку — даём ей доработать
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        # не теряем то, что уже пришло
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Status sync: не удалось применить пачку, повторим")
+
+    # ── применение ─────────────────────────────────
+    async def flush(self) -> list[StatusChange]:
+        if not self._buffer:
+            return []
+
+        batch, self._buffer = self._buffer, {}
+        self.recent_moves.prune()
+        try:
+            changes = await self._apply(batch)
+        except BaseException:
+            # пачка вернётся в буфер; более свежие переносы, пришедшие во время записи, важнее
+            self._buffer = {**batch, **self._buffer}
+            raise
+
+        if changes:
+            logger.info(f"Status sync: {len(changes)} orders updated from Kaiten")
+            await self.notify(changes)
+        return changes
+
+    async def _apply(self, batch: dict[int, OrderStatusName]) -> list[StatusChange]:
+        orders = await (
+            Order.filter(kaiten_card_id__in=list(batch))
+            .only("id", "kaiten_card_id", "status_id", "telegram_chat_id", "telegram_message_id")
+        )
+
+        by_status: dict[OrderStatusName, list[Order]] = defaultdict(list)
+        for order in orders:
+            status = batch[order.kaiten_card_id]
+            if order.status_id != reference_cache.status_id(status):
+                by_status[status].append(order)
+
+        if not by_status:
+            return []
+
+        history: list[OrderStatusHistory] = []
+        changes: list[StatusChange] = []
+
+        now = datetime.now(timezone.utc)
+        async with in_transaction():
+            for status, status_orders in by_status.items():
+                status_id = reference_cache.status_id(status)
+                await Order.filter(id__in=[o.id for o in status_orders]).update(status_id=status_id, updated_at=now)
+
+                for order in status_orders:
+                    history.append(OrderStatusHistory(order_id=order.id, status_id=status_id, changed_by="kaiten"))
+                    changes.append(StatusChange(
+                        order_id=order.id,
+                        status=status,
+                        telegram_chat_id=order.telegram_chat_id,
+                        telegram_message_id=order.telegram_message_id,
+                    ))
+
+            await OrderStatusHistory.bulk_create(history)
+
+            # менеджер отменил заказ в Kaiten — машины точки и промокод освобождаются, как при отмене в боте
+            canceled = [o.id for o in by_status.get(OrderStatusName.CANCELED, [])]
+            if canceled:
+                await capacity_scheduler.release_many(canceled)
+                await promo_codes.release_many(canceled)
+
+        return changes
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -25,10 +27,126 @@ class KaitenSettings(BaseSettings):
     DOMAIN: str
     BOARD: int
     SPACE: int
+    BASE_URL: str | None = None  # вместо https://{DOMAIN}.kaiten.ru/api/latest — для заглушек
+
+    # Пул соединений долгоживущего клиента
+    HTTP2: bool = True
+    MAX_CONNECTIONS: int = 20
+    MAX_KEEPALIVE_CONNECTIONS: int = 10
+    KEEPALIVE_EXPIRY: float = 60.0
+
+    # Фоновый разбор kaiten_outbox
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_LEASE: float = 120.0  # сек: столько взятая пачка не видна другим разборщикам
+
+    # Планировщик записей: лимит запросов в секунду, запас и число параллельных карточек
+    RATE_LIMIT: float = 5.0
+    RATE_BURST: int = 10
+    PARALLELISM: int = 4
+
+    # Зеркало доски: секрет в URL вебхука и период страховочного опроса
+    WEBHOOK_SECRET: str | None = None
+    MIRROR_POLL_INTERVAL: float = 60.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         env_prefix="KAITEN_",
         extra="ignore"
-    )
\ No newline at end of file
+    )
+
+
+class ApiSettings(BaseSettings):
+    """HTTP-сервер бота (FastAPI + uvicorn): вебхуки Kaiten и т.п."""
+    ENABLED: bool = True
+    HOST: str = "0.0.0.0"
+    PORT: int = 8080
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="API_",
+        extra="ignore"
+    )
+
+
+class CapacitySettings(BaseSettings):
+    """Загрузка машин и сушилок (src/services/capacity.py)."""
+    TIMEZONE: str = "Europe/Moscow"
+    SLOT_MINUTES: int = 15
+    HORIZON_DAYS: int = 3             # на сколько дней вперёд принимаем заказы
+    DELIVERY_LEAD_MINUTES: int = 60   # от готовности до самого раннего времени доставки
+    DELIVERY_OPTIONS: int = 4         # сколько вариантов времени предлагать клиенту
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="CAPACITY_",
+        extra="ignore"
+    )
+
+
+class RouteSettings(BaseSettings):
+    """Рейсы курьеров (src/services/courier_routes.py)."""
+    COURIERS: int = 2
+    SPEED_KMH: float = 20.0           # средняя скорость по городу
+    DETOUR: float = 1.3               # дороги длиннее прямой
+    STOP_MINUTES: int = 5             # подъезд, этаж, передача пакетов
+    BAGS_PER_RUN: int = 12            # сколько пакетов курьер увозит за рейс (забор + доставка)
+    WINDOW_MINUTES: int = 15          # «точное время» — плюс-минус столько минут
+    MAX_WAIT_MINUTES: int = 30        # дольше ждать окна в рейсе нельзя — начинаем новый рейс
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="ROUTES_",
+        extra="ignore"
+    )
+
+
+class PhotoStorageSettings(BaseSettings):
+    """Фото от работников (src/services/photo_storage.py): каталог на диске или S3-совместимое хранилище."""
+    BACKEND: Literal["fs", "s3"] = "fs"
+    ROOT: str = "var/photos"
+    MAX_BYTES: int = 20 * 1024 * 1024  # больше Bot API всё равно не отдаёт
+    CHUNK_SIZE: int = 64 * 1024
+
+    # S3 / MinIO, path-style адреса: {S3_ENDPOINT}/{S3_BUCKET}/{ключ}
+    S3_ENDPOINT: str | None = None
+    S3_BUCKET: str = "photos"
+    S3_ACCESS_KEY: str | None = None
+    S3_SECRET_KEY: str | None = None
+    S3_REGION: str = "us-east-1"
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="PHOTOS_",
+        extra="ignore"
+    )
+
+
+class PaymentSettings(BaseSettings):
+    """Оплата заказов (src/services/payments.py, src/api/payments.py)."""
+    CURRENCY: str = "RUB"
+    INVOICE_TTL_HOURS: int = 24       # счета старше этого при запуске бота не поднимаются — оплатить их нельзя
+    # вебхук ЮKassa: POST /payments/yookassa/{WEBHOOK_SECRET}; не задан — вебхук выключен
+    WEBHOOK_SECRET: str | None = None
+
+    # сверка зависших оплат (src/services/payment_sweeper.py)
+    SWEEP_INTERVAL: float = 300.0     # сек между проходами
+    SWEEP_STALE_MINUTES: int = 60     # заказ без итога оплаты дольше этого — сверяем с провайдером
+    SWEEP_BATCH: int = 500
+    PROVIDER: Literal["none", "yookassa"] = "none"  # none — без провайдера: брошенные счета просто отменяются
+    PROVIDER_PARALLELISM: int = 8
+    YOOKASSA_SHOP_ID: str | None = None
+    YOOKASSA_SECRET_KEY: str | None = None
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="PAYMENTS_",
+        extra="ignore"
+    )
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from tortoise.exceptions import IntegrityError
+
+
+def violates(exc: IntegrityError, constraints: set[str], column: str) -> bool:
+    """
+    Нарушено ли одно из уникальных ограничений (или индексов) `constraints`.
+
+    Tortoise заворачивает ошибку драйвера в IntegrityError. asyncpg сообщает имя
+    ограничения; SQLite (бенчмарки) его не знает и пишет «UNIQUE constraint failed:
+    таблица.колонка, ...» — там сверяем первую колонку ограничения `column`
+    в виде «таблица.колонка».
+    """
+    cause = exc.args[0] if exc.args else exc
+    if hasattr(cause, "constraint_name"):
+        return cause.constraint_name in constraints
+    return str(cause).startswith(f"UNIQUE constraint failed: {column}")
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from datetime import datetime
+from functools import cache
+from zoneinfo import ZoneInfo
+
+from src.settings import CapacitySettings
+
+
+@cache
+def _timezone() -> ZoneInfo:
+    return ZoneInfo(CapacitySettings().TIMEZONE)
+
+
+def local_time(moment: datetime) -> datetime:
+    """Время в часовом поясе точек стирки (CAPACITY_TIMEZONE) — для показа людям."""
+    return moment.astimezone(_timezone())
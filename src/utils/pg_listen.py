@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+class Reloader:
+    """
+    Фоновая перезагрузка данных по сигналу.
+    Сигналы, пришедшие во время загрузки, склеиваются в ещё один проход.
+    """
+
+    def __init__(self, load: Callable[[], Awaitable[None]], name: str):
+        self.load = load
+        self.name = name
+        self._stale = False
+        self._task: asyncio.Task | None = None
+
+    def invalidate(self, payload: str | None = None) -> None:
+        self._stale = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"{self.name}-reload")
+
+    async def _run(self) -> None:
+        while self._stale:
+            self._stale = False
+            try:
+                await self.load()
+            except Exception:
+                logger.exception(f"{self.name}: не удалось перезагрузить данные")
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class PgListener:
+    """
+    Одно выделенное соединение asyncpg на процесс для LISTEN (пул Tortoise для этого не годится).
+    Подписчик получает payload уведомления; после переподключения — None:
+    пока соединения не было, уведомления могли потеряться.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, list[Callable[[str | None], None]]] = {}
+        self._connection: asyncpg.Connection | None = None
+        self._dsn: str | None = None
+
+    def subscribe(self, channel: str, callback: Callable[[str | None], None]) -> None:
+        callbacks = self._subscribers.setdefault(channel, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    async def connect(self, dsn: str) -> None:
+        self._dsn = dsn
+        self._connection = await asyncpg.connect(dsn)
+        for channel in self._subscribers:
+            await self._connection.add_listener(channel, self._on_notify)
+        self._connection.add_termination_listener(self._on_terminated)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        logger.info(f"NOTIFY {channel}: {payload}")
+        self._dispatch(channel, payload)
+
+    def _dispatch(self, channel: str, payload: str | None) -> None:
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(payload)
+            except Exception:
+                logger.exception(f"LISTEN {channel}: подписчик упал")
+
+    def _on_terminated(self, connection) -> None:
+        if self._dsn is None:
+            return  # закрыли сами
+        logger.warning("LISTEN: соединение потеряно, переподключаемся")
+        asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        while self._dsn is not None:
+            try:
+                await self.connect(self._dsn)
+            except Exception:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+                continue
+
+            for channel in self._subscribers:
+                self._dispatch(channel, None)
+            return
+
+    async def close(self) -> None:
+        self._dsn = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+pg_listener = PgListener()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket: `rate` токенов в секунду, не больше `capacity` в запасе.
+    acquire() ждёт ровно столько, сколько нужно до появления токена.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        # Лок выстраивает ожидающих в очередь, чтобы никто не голодал
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Взять токен без ожидания. 0.0 — взят; иначе через сколько секунд он появится
+        (токен при этом не списывается). Для множества мелких корзин без своих лок-очередей.
+        """
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    @property
+    def is_full(self) -> bool:
+        """Корзина полна — её можно выбросить и завести заново без потери точности."""
+        self._refill()
+        return self._tokens >= self.capacity
@@ -0,0 +1,57 @@
+# src/workers.py
+"""
+Сотрудники, которым доступна команда /work в боте.
+
+    python -m src.workers add TELEGRAM_ID ИМЯ   # добавить или вернуть уволенного
+    python -m src.workers disable TELEGRAM_ID   # закрыть доступ (история отметок остаётся)
+    python -m src.workers list
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+
+from src.database import init_db, close_db
+from src.models import Worker
+
+
+async def add_worker(telegram_id: int, name: str) -> Worker:
+    worker, _ = await Worker.update_or_create(
+        telegram_id=telegram_id,
+        defaults={"name": name, "is_active": True},
+    )
+    return worker
+
+
+async def disable_worker(telegram_id: int) -> bool:
+    return await Worker.filter(telegram_id=telegram_id).update(is_active=False) > 0
+
+
+async def show_workers() -> None:
+    for worker in await Worker.all().order_by("id"):
+        mark = "" if worker.is_active else " (отключён)"
+        print(f"{worker.id:>4}  {worker.telegram_id:>12}  {worker.name}{mark}")
+
+
+async def main() -> None:
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ("add", "disable", "list") or (command == "add" and len(sys.argv) < 4) \
+            or (command == "disable" and len(sys.argv) < 3):
+        print(__doc__)
+        return
+
+    await init_db()
+    try:
+        if command == "add":
+            worker = await add_worker(int(sys.argv[2]), " ".join(sys.argv[3:]))
+            print(f"Сотрудник {worker.name}: id {worker.id}")
+        elif command == "disable":
+            if not await disable_worker(int(sys.argv[2])):
+                print("Сотрудник не найден")
+        await show_workers()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())